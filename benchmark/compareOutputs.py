@@ -0,0 +1,185 @@
+#
+#  compareOutputs.py
+###########################################################################
+#
+#  Purpose:
+#
+#      This script checks that two benchmark runs (see runBenchmark.py)
+#      wrote the same reports, load-ready and coordload files and database
+#      changes, and compares their timings.
+#
+#  Usage:
+#
+#      compareOutputs.py baselineDir candidateDir
+#
+#      where each directory is a resultsDir/<label> of runBenchmark.py
+#
+#  Outputs:
+#
+#      - for each size run by both: the files that differ, with the first
+#        lines of their differences, and the files only one run wrote
+#
+#      - the wall time of each script in both runs and the speedup
+#
+#  Exit Codes:
+#
+#      0:  The outputs are the same
+#      1:  Usage error
+#      2:  An output differs, or the baseline wrote a file the candidate
+#          did not
+#
+#  Assumes:
+#
+#      Both runs used the same generated data. Paths of the run directory
+#      in the files are compared as '$RUN'. The stdout logs, metrics,
+#      database file, saved miRBase index, parsed-input cache and temp
+#      table bcp file are not compared (they hold process IDs, times or
+#      binary data, or are only written for debugging); the tables the
+#      load changes are compared through output/tables.txt.
+#
+#      A file only the candidate wrote (e.g. a new JSON twin of a report)
+#      is listed but is not a difference.
+#
+###########################################################################
+
+import sys
+import os
+import json
+import difflib
+
+#
+#  CONSTANTS
+#
+USAGE = 'compareOutputs.py baselineDir candidateDir'
+
+# directories of a size's run whose files are compared
+COMPARED_DIRS = ['output', 'reports', 'logs']
+
+# files that are not compared
+IGNORED_FILES = ['mirbase_index.txt', 'mrkcoordload_temp.bcp',
+    'mrkcoordload_load.cache', 'sanityCheck.log', 'mrkcoordQC.log',
+    'createInputFiles.log', 'mrkcoordDelete.log']
+
+# lines of a difference shown
+MAX_DIFF_LINES = 20
+
+#
+# Purpose: The files of a size's run that are compared.
+# Returns: set of paths relative to 'runDir'
+#
+def outputFiles (runDir):
+    files = set()
+    for d in COMPARED_DIRS:
+        for dirPath, dirNames, fileNames in os.walk(os.path.join(runDir, d)):
+            for f in fileNames:
+                if f not in IGNORED_FILES:
+                    files.add(os.path.relpath(os.path.join(dirPath, f), runDir))
+    return files
+
+#
+# Purpose: Read a file with the run directory replaced by '$RUN'.
+# Returns: list of lines
+#
+def readOutput (runDir, fileName):
+    fp = open(os.path.join(runDir, fileName), 'r', errors = 'surrogateescape')
+    text = fp.read().replace(runDir, '$RUN')
+    fp.close()
+    return text.splitlines(True)
+
+#
+# Purpose: Compare the outputs of one size.
+# Returns: number of differences
+#
+def compareSize (size, baselineRun, candidateRun):
+    baselineFiles = outputFiles(baselineRun)
+    candidateFiles = outputFiles(candidateRun)
+    numDiffs = 0
+
+    for f in sorted(baselineFiles - candidateFiles):
+        print('  %s: only in the baseline' % f)
+        numDiffs += 1
+
+    for f in sorted(candidateFiles - baselineFiles):
+        print('  %s: only in the candidate' % f)
+
+    for f in sorted(baselineFiles & candidateFiles):
+        baseline = readOutput(baselineRun, f)
+        candidate = readOutput(candidateRun, f)
+        if baseline == candidate:
+            continue
+        numDiffs += 1
+        print('  %s: differs' % f)
+        diff = list(difflib.unified_diff(baseline, candidate, 'baseline/' + f,
+            'candidate/' + f, n = 1))
+        for line in diff[:MAX_DIFF_LINES]:
+            print('    ' + line.rstrip('\n'))
+        if len(diff) > MAX_DIFF_LINES:
+            print('    ... %s more lines' % (len(diff) - MAX_DIFF_LINES))
+
+    if numDiffs == 0:
+        print('  %s files identical' % len(baselineFiles & candidateFiles))
+    return numDiffs
+
+#
+# Purpose: Read the timings of a run.
+# Returns: dictionary of wall seconds keyed by (rows, script)
+#
+def readTimings (labelDir):
+    timings = {}
+    fileName = os.path.join(labelDir, 'timings.json')
+    if os.path.exists(fileName):
+        for r in json.load(open(fileName))['results']:
+            timings[(r['rows'], r['step'])] = r['wallSeconds']
+    return timings
+
+#
+# Purpose: Print the timings of both runs.
+# Returns: Nothing
+#
+def compareTimings (baselineDir, candidateDir):
+    baseline = readTimings(baselineDir)
+    candidate = readTimings(candidateDir)
+    keys = sorted(set(baseline) & set(candidate))
+    if not keys:
+        return
+
+    print()
+    print('%10s  %-18s %12s %12s %8s' % ('rows', 'script', 'baseline (s)',
+        'candidate (s)', 'speedup'))
+    for rows, step in keys:
+        b = baseline[(rows, step)]
+        c = candidate[(rows, step)]
+        speedup = c > 0 and '%7.2fx' % (b / c) or ''
+        print('%10s  %-18s %12.2f %12.2f %8s' % (rows, step, b, c, speedup))
+    return
+
+#
+# Main
+#
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(USAGE)
+        sys.exit(1)
+
+    baselineDir = os.path.abspath(sys.argv[1])
+    candidateDir = os.path.abspath(sys.argv[2])
+
+    sizes = sorted([int(d) for d in os.listdir(baselineDir) \
+        if d.isdigit() and os.path.isdir(os.path.join(candidateDir, d))])
+    if not sizes:
+        print('No sizes were run by both %s and %s' % (baselineDir, candidateDir))
+        sys.exit(1)
+
+    numDiffs = 0
+    for size in sizes:
+        print('%s rows:' % size)
+        numDiffs += compareSize(size, os.path.join(baselineDir, str(size)),
+            os.path.join(candidateDir, str(size)))
+
+    compareTimings(baselineDir, candidateDir)
+
+    if numDiffs > 0:
+        print()
+        print('%s outputs differ' % numDiffs)
+        sys.exit(2)
+    sys.exit(0)
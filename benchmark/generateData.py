@@ -0,0 +1,396 @@
+#
+#  generateData.py
+###########################################################################
+#
+#  Purpose:
+#
+#      This script generates a synthetic marker coordinate load: a SQLite
+#      database for the db stand-in (benchmark/standin), a coordinate
+#      input file and a coordinate delete file that refer to it.
+#
+#  Usage:
+#
+#      generateData.py [-s seed] [-e errorRate] [-c collections]
+#                      [-m mirnaRate] [-d deleteRate] [-p] outputDir rows
+#
+#      -s  random seed (default 1); the same options give the same files
+#      -e  fraction of input rows with a QC error (default 0.01), spread
+#          over the kinds of error in ERROR_KINDS
+#      -c  number of collections (default 12)
+#      -m  fraction of markers that are miRNA genes (default 0.02)
+#      -d  rows in the delete file, as a fraction of 'rows' (default 0.1)
+#      -p  print the params.json the options give and exit, without
+#          generating anything
+#
+#  Outputs:
+#
+#      - outputDir/mgd.sqlite: ACC_Accession, ACC_MGIType, ACC_LogicalDB,
+#        MRK_Marker, MRK_Status, MRK_Chromosome, MRK_MCV_Cache,
+#        MRK_Location_Cache, MAP_Coord_Collection, MAP_Coordinate,
+#        MAP_Coord_Feature and MGI_User, with the indexes the queries of
+#        the load need
+#
+#      - outputDir/mrkcoordload.txt: build header and 'rows' lines of the
+#        8 input columns, one marker per line
+#
+#      - outputDir/mrkcoorddelete.txt: MGI ID and collection name of
+#        features in MAP_Coord_Feature
+#
+#      - outputDir/params.json: the options the files were generated with
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  Usage error
+#
+#  Assumes:  Nothing
+#
+#  Notes:
+#
+#      The collections, chromosomes and coordinate lengths follow the
+#      shape of the real load (a few large gene model collections and many
+#      small ones). All but the last collection exist in the database;
+#      when errorRate > 0 the last one is new, for the source/display
+#      report.
+#
+###########################################################################
+
+import sys
+import os
+import json
+import math
+import random
+import getopt
+import sqlite3
+
+#
+#  CONSTANTS
+#
+TAB = '\t'
+NL = '\n'
+
+USAGE = 'generateData.py [-s seed] [-e errorRate] [-c collections] ' + \
+    '[-m mirnaRate] [-d deleteRate] [-p] outputDir rows'
+
+BUILD = 'GRCm39'
+
+# (name, abbreviation) of the first collections; more are numbered
+COLLECTIONS = [
+    ('NCBI Gene Model', 'NCBI'),
+    ('Ensembl Gene Model', 'Ensembl'),
+    ('Ensembl Reg Gene Model', 'EnsemblReg'),
+    ('VISTA Enhancer', 'VISTA'),
+    ('miRBase', 'miRBase'),
+    ('MGI', 'MGI'),
+    ('Roadmap', 'Roadmap'),
+    ('Blat', 'Blat'),
+    ('NCBI UniSTS', 'UniSTS'),
+    ('QTL', 'QTL'),
+    ]
+
+# chromosome and length in Mb
+CHROMOSOMES = [('1', 195), ('2', 181), ('3', 159), ('4', 156), ('5', 151),
+    ('6', 149), ('7', 144), ('8', 130), ('9', 124), ('10', 130), ('11', 121),
+    ('12', 120), ('13', 120), ('14', 125), ('15', 104), ('16', 98),
+    ('17', 95), ('18', 90), ('19', 61), ('X', 171), ('Y', 91), ('MT', 1)]
+
+# chromosomes that are not valid for a feature
+BAD_CHROMOSOMES = ['UN', 'Z', '30', 'chr1']
+
+ERROR_KINDS = ['notInDb', 'notMarker', 'withdrawn', 'secondary', 'badChr',
+    'chrDiscrep', 'badCoord', 'startGtEnd', 'badStrand', 'nonMirna',
+    'badMirbase', 'dupMirbase', 'mirbaseOther']
+
+LDB_MGI = 1
+LDB_MIRBASE = 83
+MARKER = 2
+
+SCHEMA = '''
+create table ACC_MGIType (_MGIType_key int primary key, name text);
+create table ACC_LogicalDB (_LogicalDB_key int primary key, name text);
+create table ACC_Accession (_Accession_key int primary key, accID text,
+    prefixPart text, numericPart int, _LogicalDB_key int, _Object_key int,
+    _MGIType_key int, private int, preferred int);
+create table MRK_Status (_Marker_Status_key int primary key, status text);
+create table MRK_Marker (_Marker_key int primary key, _Organism_key int,
+    _Marker_Status_key int, symbol text, chromosome text);
+create table MRK_Chromosome (_Chromosome_key int primary key,
+    _Organism_key int, chromosome text, sequenceNum int);
+create table MRK_MCV_Cache (_Marker_key int, term text, qualifier text);
+create table MRK_Location_Cache (_Marker_key int primary key,
+    chromosome text, startCoordinate float, endCoordinate float,
+    strand text, provider text, version text);
+create table MAP_Coord_Collection (_Collection_key int primary key,
+    name text, abbreviation text);
+create table MAP_Coordinate (_Map_key int primary key, _Collection_key int,
+    _Object_key int, _MGIType_key int, version text);
+create table MAP_Coord_Feature (_Feature_key int primary key, _Map_key int,
+    _MGIType_key int, _Object_key int, startCoordinate float,
+    endCoordinate float, strand text);
+create table MGI_User (_User_key int primary key, login text);
+create table mrkcoord_temp (mgiID text not null, chromosome text null,
+    startCoordinate float null, endCoordinate float null, strand text null,
+    provider text not null, display text not null, mirbaseID text null,
+    buildValue text not null);
+'''
+
+INDEXES = '''
+create index acc_accession_idx_accid on ACC_Accession (accID);
+create index acc_accession_idx_object on ACC_Accession (_Object_key, _MGIType_key);
+create index mrk_mcv_cache_idx_marker on MRK_MCV_Cache (_Marker_key);
+create index map_coord_feature_idx_object on MAP_Coord_Feature (_Object_key);
+create index map_coord_feature_idx_map on MAP_Coord_Feature (_Map_key);
+analyze;
+'''
+
+#
+#  GLOBALS
+#
+seed = 1
+errorRate = 0.01
+numCollections = 12
+mirnaRate = 0.02
+deleteRate = 0.1
+outputDir = None
+numRows = 0
+printOnly = False
+
+#
+# Purpose: Validate the arguments to the script.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables; exits with 1 on a usage error
+# Throws: Nothing
+#
+def checkArgs ():
+    global seed, errorRate, numCollections, mirnaRate, deleteRate
+    global outputDir, numRows, printOnly
+
+    try:
+        options, args = getopt.getopt(sys.argv[1:], 's:e:c:m:d:p')
+        for option, value in options:
+            if option == '-s':
+                seed = int(value)
+            elif option == '-e':
+                errorRate = float(value)
+            elif option == '-c':
+                numCollections = int(value)
+            elif option == '-m':
+                mirnaRate = float(value)
+            elif option == '-d':
+                deleteRate = float(value)
+            elif option == '-p':
+                printOnly = True
+        outputDir, numRows = args[0], int(args[1])
+    except (getopt.GetoptError, IndexError, ValueError):
+        print(USAGE)
+        sys.exit(1)
+
+    if len(args) != 2 or numRows < 1 or numCollections < 1:
+        print(USAGE)
+        sys.exit(1)
+    return
+
+#
+# Purpose: Parameters the files are generated from.
+# Returns: dictionary
+#
+def params ():
+    return {'rows' : numRows, 'seed' : seed, 'errorRate' : errorRate,
+        'collections' : numCollections, 'mirnaRate' : mirnaRate,
+        'deleteRate' : deleteRate}
+
+#
+# Purpose: Name and abbreviation of each collection.
+# Returns: list of (name, abbreviation)
+#
+def collections ():
+    result = COLLECTIONS[:numCollections]
+    for i in range(len(result), numCollections):
+        result.append(('Collection %s' % (i + 1), 'C%s' % (i + 1)))
+    return result
+
+#
+# Purpose: Generate the database, input file and delete file.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Replaces the files in 'outputDir'
+# Throws: Nothing
+#
+def generate ():
+    rand = random.Random(seed)
+
+    os.makedirs(outputDir, exist_ok = True)
+    dbFile = os.path.join(outputDir, 'mgd.sqlite')
+    if os.path.exists(dbFile):
+        os.remove(dbFile)
+
+    conn = sqlite3.connect(dbFile)
+    conn.executescript(SCHEMA)
+    conn.executemany('insert into ACC_MGIType values (?,?)',
+        [(1, 'Reference'), (2, 'Marker'), (11, 'Allele'), (25, 'Evidence')])
+    conn.executemany('insert into ACC_LogicalDB values (?,?)',
+        [(1, 'MGI'), (59, 'Ensembl Gene Model'), (60, 'Ensembl Reg Gene Model'),
+         (83, 'miRBase'), (222, 'VISTA Enhancer'), (223, 'Roadmap')])
+    conn.executemany('insert into MRK_Status values (?,?)',
+        [(1, 'official'), (2, 'withdrawn'), (3, 'reserved')])
+    conn.executemany('insert into MRK_Chromosome values (?,?,?,?)',
+        [(i + 1, 1, c, i + 1) for i, (c, length) in enumerate(CHROMOSOMES + [('XY', 0), ('UN', 0)])] + \
+        [(100, 2, 'Z', 1)])
+    conn.execute("insert into MGI_User values (1001, 'mrkcoordload')")
+
+    # the last collection is new when there are errors
+    collectionList = collections()
+    dbCollections = collectionList
+    if errorRate > 0 and numCollections > 1:
+        dbCollections = collectionList[:-1]
+    for i, (name, abbrev) in enumerate(dbCollections):
+        conn.execute('insert into MAP_Coord_Collection values (?,?,?)', (i + 1, name, abbrev))
+        conn.execute('insert into MAP_Coordinate values (?,?,?,?,?)', (i + 1, i + 1, 1, 1, BUILD))
+
+    # a few large collections and many small ones
+    weights = [1.0 / (i + 1) ** 1.5 for i in range(numCollections)]
+    chrWeights = [length for c, length in CHROMOSOMES]
+    chrLengths = dict(CHROMOSOMES)
+
+    counters = {'acc' : 0, 'feature' : 0}
+    accRows = []
+    markerRows = []
+    mcvRows = []
+    locationRows = []
+    featureRows = []
+
+    def addAccession(accID, prefix, ldb, objectKey, mgiType, preferred):
+        counters['acc'] += 1
+        numeric = int(accID[len(prefix):]) if accID[len(prefix):].isdigit() else None
+        accRows.append((counters['acc'], accID, prefix, numeric, ldb, objectKey,
+            mgiType, 0, preferred))
+
+    fpInput = open(os.path.join(outputDir, 'mrkcoordload.txt'), 'w')
+    fpInput.write('build=%s%s' % (BUILD, NL))
+
+    deleteList = []
+    lastMirbase = None
+    secondaryBase = 10 * numRows
+
+    for i in range(1, numRows + 1):
+        markerKey = i
+        mgiID = 'MGI:%s' % (100000 + i)
+        inputID = mgiID
+        collection = rand.choices(range(numCollections), weights)[0]
+        name, abbrev = collectionList[collection]
+        chromosome = rand.choices(CHROMOSOMES, chrWeights)[0][0]
+        length = min(int(math.exp(rand.gauss(8, 1.5))), 2000000)
+        start = rand.randint(1, max(2, chrLengths[chromosome] * 1000000 - length))
+        end = start + length
+        strand = rand.choice(['+', '-'])
+        isMirna = rand.random() < mirnaRate
+        mirbase = ''
+        if isMirna:
+            mirbase = 'MI%07d' % i
+            if rand.random() < 0.1:
+                mirbase = '%s, MI%07d' % (mirbase, numRows + i)
+
+        error = None
+        if rand.random() < errorRate:
+            error = rand.choice(ERROR_KINDS)
+
+        status = 1
+        term = isMirna and 'miRNA gene' or 'protein coding gene'
+        featureChr = chromosome
+
+        if error == 'notInDb':
+            pass
+        elif error == 'notMarker':
+            addAccession(mgiID, 'MGI:', LDB_MGI, markerKey, rand.choice([1, 11]), 1)
+        else:
+            if error == 'withdrawn':
+                status = 2
+            elif error == 'secondary':
+                inputID = 'MGI:%s' % (secondaryBase + i)
+                addAccession(inputID, 'MGI:', LDB_MGI, markerKey, MARKER, 0)
+            elif error == 'nonMirna':
+                term = 'protein coding gene'
+                if mirbase == '':
+                    mirbase = 'MI%07d' % i
+            markerRows.append((markerKey, 1, status, 'Gm%s' % i, chromosome))
+            addAccession(mgiID, 'MGI:', LDB_MGI, markerKey, MARKER, 1)
+            mcvRows.append((markerKey, term, 'D'))
+            locationRows.append((markerKey, chromosome, start, end, strand, name, BUILD))
+
+            # current miRBase associations: most unchanged, some changed
+            if isMirna and error != 'mirbaseOther':
+                r = rand.random()
+                if r < 0.8:
+                    addAccession(mirbase.split(',')[0], 'MI', LDB_MIRBASE, markerKey, MARKER, 1)
+                elif r < 0.9:
+                    addAccession('MI%07d' % (2 * numRows + i), 'MI', LDB_MIRBASE, markerKey, MARKER, 1)
+
+            # features loaded by an earlier run
+            if collection < len(dbCollections):
+                counters['feature'] += 1
+                featureRows.append((counters['feature'], collection + 1, MARKER, markerKey,
+                    start, end, strand))
+                if error is None:
+                    deleteList.append((mgiID, name))
+
+        if error == 'badChr':
+            featureChr = rand.choice(BAD_CHROMOSOMES)
+        elif error == 'chrDiscrep':
+            featureChr = rand.choice([c for c, length in CHROMOSOMES if c != chromosome])
+        elif error == 'badCoord':
+            start = '%sk' % start
+        elif error == 'startGtEnd':
+            start, end = end + 1, start
+        elif error == 'badStrand':
+            strand = rand.choice(['x', '*', '.'])
+        elif error == 'badMirbase':
+            mirbase = 'mmu-mir-%s' % i
+        elif error == 'dupMirbase' and lastMirbase is not None:
+            mirbase = lastMirbase
+        elif error == 'mirbaseOther':
+            # the miRBase ID belongs to another marker in the database
+            mirbase = 'MI%07d' % i
+            addAccession(mirbase, 'MI', LDB_MIRBASE, numRows + i, MARKER, 1)
+            markerRows.append((numRows + i, 1, 1, 'Mir%s' % i, chromosome))
+            addAccession('MGI:%s' % (100000 + numRows + i), 'MGI:', LDB_MGI,
+                numRows + i, MARKER, 1)
+
+        if mirbase != '' and ',' not in mirbase:
+            lastMirbase = mirbase
+
+        fpInput.write(TAB.join([inputID, featureChr, str(start), str(end), strand,
+            name, abbrev, mirbase]) + NL)
+
+    fpInput.close()
+
+    conn.executemany('insert into ACC_Accession values (?,?,?,?,?,?,?,?,?)', accRows)
+    conn.executemany('insert into MRK_Marker values (?,?,?,?,?)', markerRows)
+    conn.executemany('insert into MRK_MCV_Cache values (?,?,?)', mcvRows)
+    conn.executemany('insert into MRK_Location_Cache values (?,?,?,?,?,?,?)', locationRows)
+    conn.executemany('insert into MAP_Coord_Feature values (?,?,?,?,?,?,?)', featureRows)
+    conn.executescript(INDEXES)
+    conn.commit()
+    conn.close()
+
+    fpDelete = open(os.path.join(outputDir, 'mrkcoorddelete.txt'), 'w')
+    numDeletes = min(len(deleteList), int(numRows * deleteRate))
+    for mgiID, name in sorted(rand.sample(deleteList, numDeletes)):
+        fpDelete.write(mgiID + TAB + name + NL)
+    fpDelete.close()
+
+    fp = open(os.path.join(outputDir, 'params.json'), 'w')
+    fp.write(json.dumps(params(), indent = 2) + NL)
+    fp.close()
+    return
+
+#
+# Main
+#
+if __name__ == '__main__':
+    checkArgs()
+    if printOnly:
+        sys.stdout.write(json.dumps(params(), indent = 2) + NL)
+        sys.exit(0)
+    generate()
+    sys.exit(0)
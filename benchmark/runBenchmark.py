@@ -0,0 +1,384 @@
+#
+#  runBenchmark.py
+###########################################################################
+#
+#  Purpose:
+#
+#      This script times the marker coordinate load scripts on generated
+#      data (see generateData.py) against the SQLite db stand-in
+#      (benchmark/standin), and keeps their outputs so compareOutputs.py
+#      can check that two revisions write the same reports and files.
+#
+#  Usage:
+#
+#      runBenchmark.py [-b binDir | -r revision] [-l label] [-n sizes]
+#                      [-g generatorOptions] resultsDir
+#
+#      -b  bin directory of the scripts to run (default: ../bin)
+#      -r  git revision to run; its bin directory is extracted with
+#          'git archive' into resultsDir/<label>/src
+#      -l  name of this run (default: the revision, else 'current')
+#      -n  comma-separated input sizes in rows (default 10000,100000,1000000)
+#      -g  options for generateData.py, e.g. '-e 0.02 -s 7'
+#
+#      Settings of the scripts that are not set here are taken from the
+#      environment, so e.g. 'QC_ENGINE=memory runBenchmark.py ...' times
+#      the in-memory QC engine.
+#
+#  Outputs:
+#
+#      - resultsDir/data/<rows>: the generated data, reused while the
+#        generator options are the same
+#
+#      - resultsDir/<label>/<rows>: the database after the run, and the
+#        output, reports, logs and metrics (coordMetrics.py) of each script
+#
+#      - resultsDir/<label>/timings.json: wall time, CPU time, peak
+#        memory and exit status of each script at each size, with the
+#        phase metrics the script wrote
+#
+#      - a table of the timings on stdout
+#
+#  Exit Codes:
+#
+#      0:  Successful completion (a script may still have failed; see
+#          its status in the table)
+#      1:  Usage error, or the data could not be generated
+#
+#  Assumes:
+#
+#      The scripts are run in the order of the load: sanityCheck.py (if
+#      the revision has it), mrkcoordQC.py live, createInputFiles.py on
+#      the load-ready file of mrkcoordQC.py and mrkcoordDelete.py, on one
+#      copy of the generated database.
+#
+#  Notes:
+#
+#      SQLite is not Postgres: the timings compare revisions of the
+#      scripts with each other, not with production.
+#
+###########################################################################
+
+import sys
+import os
+import io
+import json
+import time
+import shlex
+import getopt
+import shutil
+import sqlite3
+import tarfile
+import subprocess
+
+#
+#  CONSTANTS
+#
+NL = '\n'
+
+USAGE = 'runBenchmark.py [-b binDir | -r revision] [-l label] [-n sizes] ' + \
+    '[-g generatorOptions] resultsDir'
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+STANDIN_DIR = os.path.join(BENCHMARK_DIR, 'standin')
+
+DEFAULT_SIZES = '10000,100000,1000000'
+
+# QC report variables and file names, as in mrkcoordload.config.default
+REPORTS = [
+    ('SANITY_RPT', 'sanity.rpt'),
+    ('INVALID_MARKER_RPT', 'invalid_marker.rpt'),
+    ('SEC_MARKER_RPT', 'secondary_marker.rpt'),
+    ('INVALID_CHR_RPT', 'invalid_chr.rpt'),
+    ('CHR_DISCREP_RPT', 'chr_discrep.rpt'),
+    ('INVALID_COORD_STRAND_RPT', 'invalid_coord_strand.rpt'),
+    ('NON_MIRNA_MARKER_RPT', 'non_mirna_marker.rpt'),
+    ('MIRBASE_DELETE_RPT', 'mirbase_delete.rpt'),
+    ('MIRBASE_DUP_RPT', 'mirbase_dup.rpt'),
+    ('MIRBASE_OTHER_MKR_RPT', 'mirbase_other_mkr.rpt'),
+    ('MIRBASE_INVALID_ID_RPT', 'mirbase_invalid_id.rpt'),
+    ('SOURCE_DISPLAY_RPT', 'source_display.rpt'),
+    ('BUILD_RPT', 'build.rpt'),
+    ('RPT_NAMES_RPT', 'reportsWithDiscrepancies.rpt'),
+    ]
+
+# tables changed by the load, dumped after the run for compareOutputs.py
+DUMP_QUERIES = [
+    ('ACC_Accession (miRBase)', '''select accID, _Object_key from ACC_Accession
+        where _LogicalDB_key = 83 order by accID, _Object_key'''),
+    ('MAP_Coord_Feature', '''select _Feature_key, _Map_key, _Object_key
+        from MAP_Coord_Feature order by _Feature_key'''),
+    ]
+
+#
+#  GLOBALS
+#
+binDir = os.path.join(REPO_DIR, 'bin')
+revision = None
+label = None
+sizes = []
+generatorOptions = []
+resultsDir = None
+
+#
+# Purpose: Validate the arguments to the script.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables; exits with 1 on a usage error
+# Throws: Nothing
+#
+def checkArgs ():
+    global binDir, revision, label, sizes, generatorOptions, resultsDir
+
+    sizeList = DEFAULT_SIZES
+    try:
+        options, args = getopt.getopt(sys.argv[1:], 'b:r:l:n:g:')
+        for option, value in options:
+            if option == '-b':
+                binDir = os.path.abspath(value)
+            elif option == '-r':
+                revision = value
+            elif option == '-l':
+                label = value
+            elif option == '-n':
+                sizeList = value
+            elif option == '-g':
+                generatorOptions = shlex.split(value)
+        sizes = [int(s) for s in sizeList.split(',')]
+    except (getopt.GetoptError, ValueError):
+        print(USAGE)
+        sys.exit(1)
+
+    if len(args) != 1:
+        print(USAGE)
+        sys.exit(1)
+
+    resultsDir = os.path.abspath(args[0])
+    if label is None:
+        label = revision or 'current'
+    return
+
+#
+# Purpose: Extract the bin directory of a git revision.
+# Returns: the bin directory
+# Assumes: Nothing
+# Effects: Replaces resultsDir/<label>/src
+# Throws: subprocess.CalledProcessError if git fails
+#
+def extractRevision (labelDir):
+    srcDir = os.path.join(labelDir, 'src')
+    shutil.rmtree(srcDir, ignore_errors = True)
+    os.makedirs(srcDir)
+
+    archive = subprocess.run(['git', '-C', REPO_DIR, 'archive', '--format=tar',
+        revision, 'bin'], check = True, stdout = subprocess.PIPE).stdout
+    tar = tarfile.open(fileobj = io.BytesIO(archive))
+    tar.extractall(srcDir)
+    tar.close()
+    return os.path.join(srcDir, 'bin')
+
+#
+# Purpose: Generate the data of one size, unless it was generated with
+#          the same options.
+# Returns: the data directory
+# Assumes: Nothing
+# Effects: Exits with 1 if generateData.py fails
+# Throws: Nothing
+#
+def generateData (rows):
+    dataDir = os.path.join(resultsDir, 'data', str(rows))
+    command = [sys.executable, os.path.join(BENCHMARK_DIR, 'generateData.py')] + \
+        generatorOptions + [dataDir, str(rows)]
+
+    # the generator options in the form params.json records them
+    paramsFile = os.path.join(dataDir, 'params.json')
+    wanted = subprocess.run(command[:2] + generatorOptions + ['-p', dataDir, str(rows)],
+        stdout = subprocess.PIPE, universal_newlines = True).stdout
+    if os.path.exists(paramsFile) and open(paramsFile).read() == wanted:
+        return dataDir
+
+    print('Generating %s rows in %s' % (rows, dataDir))
+    sys.stdout.flush()
+    if subprocess.call(command) != 0:
+        print('Cannot generate the data: %s' % ' '.join(command))
+        sys.exit(1)
+    return dataDir
+
+#
+# Purpose: Environment the scripts of one size run with.
+# Returns: dictionary
+#
+def environment (runDir, dataDir):
+    outputDir = os.path.join(runDir, 'output')
+    rptDir = os.path.join(runDir, 'reports')
+    logDir = os.path.join(runDir, 'logs')
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([STANDIN_DIR] + \
+        [p for p in [os.environ.get('PYTHONPATH', '')] if p != ''])
+    env['PYTHON'] = sys.executable
+
+    # some reports list the members of a set; a fixed hash seed writes
+    # them in the same order in every run
+    env['PYTHONHASHSEED'] = '0'
+    env['BENCHMARK_DB'] = os.path.join(runDir, 'mgd.sqlite')
+    env['MGD_DBUSER'] = 'mgd_dbo'
+    env['MGD_DBPASSWORDFILE'] = os.devnull
+    env['PG_DBUTILS'] = STANDIN_DIR
+    env['LIVE_RUN'] = '1'
+    env['METRICS_DIR'] = os.path.join(runDir, 'metrics')
+    env['METRICS_TEXTFILE_DIR'] = ''
+
+    env['INPUTDIR'] = outputDir
+    env['INPUT_FILE_QC'] = os.path.join(outputDir, 'mrkcoordload_qc.txt')
+    env['INPUT_FILE_LOAD'] = os.path.join(outputDir, 'mrkcoordload_load.txt')
+    env['INPUT_FILE_BCP'] = os.path.join(outputDir, 'mrkcoordload_temp.bcp')
+    env['TEMP_TABLE'] = 'mrkcoord_temp'
+    env['MRKCOORD_FILE_COLUMNS'] = '8'
+    env['QC_SUMMARY_FILE'] = os.path.join(rptDir, 'qc_summary.json')
+    env['MIRBASE_INDEX_FILE'] = os.path.join(outputDir, 'mirbase_index.txt')
+    env['COORD_CACHE_FILE'] = os.path.join(outputDir, 'mrkcoordload_load.cache')
+    env['INFILE_NAME'] = os.path.join(outputDir, 'mrkcoordload')
+    env['COORD_FILES'] = os.path.join(outputDir, 'coordinateFileList.txt')
+    env['MIRBASE_ASSOC_FILE'] = os.path.join(outputDir, 'mirbase_assocload.txt')
+    env['COORD_DELTA_LOAD'] = 'false'
+    env['LOG_DIAG'] = os.path.join(logDir, 'mrkcoorddelete.diag.log')
+    env['LOG_ERROR'] = os.path.join(logDir, 'mrkcoorddelete.error.log')
+    # the pause between delete chunks is for the web readers, not work
+    env['DELETE_PAUSE'] = '0'
+    # sent with each delete as in production; the stand-in ignores it
+    env['DELETE_STATEMENT_TIMEOUT'] = '300000'
+    for name, fileName in REPORTS:
+        env[name] = os.path.join(rptDir, fileName)
+    return env
+
+#
+# Purpose: Run one script and measure it.
+# Returns: dictionary of the step, exit status, wall time, CPU time and
+#          peak memory (kilobytes) of the script
+# Assumes: Nothing
+# Effects: Writes the stdout and stderr of the script to logs/<step>.log
+# Throws: Nothing
+#
+def runStep (step, command, env, runDir):
+    logFile = os.path.join(runDir, 'logs', step + '.log')
+    fpLog = open(logFile, 'w')
+
+    start = time.monotonic()
+    process = subprocess.Popen(command, env = env, cwd = runDir,
+        stdout = fpLog, stderr = subprocess.STDOUT)
+    pid, status, usage = os.wait4(process.pid, 0)
+    wall = time.monotonic() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    fpLog.close()
+
+    return {
+        'step' : step,
+        'status' : process.returncode,
+        'wallSeconds' : round(wall, 3),
+        'cpuSeconds' : round(usage.ru_utime + usage.ru_stime, 3),
+        'maxRssKb' : usage.ru_maxrss,
+        }
+
+#
+# Purpose: Dump the tables the load changes.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Writes output/tables.txt
+# Throws: Nothing
+#
+def dumpTables (runDir):
+    conn = sqlite3.connect(os.path.join(runDir, 'mgd.sqlite'))
+    fp = open(os.path.join(runDir, 'output', 'tables.txt'), 'w')
+    for name, query in DUMP_QUERIES:
+        fp.write('# %s%s' % (name, NL))
+        for row in conn.execute(query):
+            fp.write('\t'.join([str(v) for v in row]) + NL)
+    fp.close()
+    conn.close()
+    return
+
+#
+# Purpose: Run the scripts on the data of one size.
+# Returns: list of the measured steps
+# Assumes: Nothing
+# Effects: Replaces resultsDir/<label>/<rows>
+# Throws: Nothing
+#
+def runSize (rows, labelDir):
+    dataDir = generateData(rows)
+
+    runDir = os.path.join(labelDir, str(rows))
+    shutil.rmtree(runDir, ignore_errors = True)
+    for d in ('output', 'reports', 'logs', 'metrics'):
+        os.makedirs(os.path.join(runDir, d))
+    shutil.copyfile(os.path.join(dataDir, 'mgd.sqlite'), os.path.join(runDir, 'mgd.sqlite'))
+
+    env = environment(runDir, dataDir)
+    inputFile = os.path.join(dataDir, 'mrkcoordload.txt')
+    deleteFile = os.path.join(dataDir, 'mrkcoorddelete.txt')
+
+    steps = [
+        ('sanityCheck', 'sanityCheck.py', [inputFile]),
+        ('mrkcoordQC', 'mrkcoordQC.py', [inputFile]),
+        ('createInputFiles', 'createInputFiles.py', []),
+        ('mrkcoordDelete', 'mrkcoordDelete.py', [deleteFile, 'load']),
+        ]
+
+    results = []
+    for step, script, args in steps:
+        script = os.path.join(binDir, script)
+        if not os.path.exists(script):
+            continue
+        print('Running %s on %s rows' % (step, rows))
+        sys.stdout.flush()
+        result = runStep(step, [sys.executable, script] + args, env, runDir)
+        result['rows'] = rows
+
+        # the phases the script recorded itself, if it records them
+        metricsFile = os.path.join(runDir, 'metrics', 'mrkcoordload_%s.json' % step)
+        if os.path.exists(metricsFile):
+            result['metrics'] = json.load(open(metricsFile))
+        results.append(result)
+
+    dumpTables(runDir)
+    return results
+
+#
+# Purpose: Print the timings as a table.
+# Returns: Nothing
+#
+def printTimings (results):
+    print('%10s  %-18s %6s %10s %10s %10s %12s' % \
+        ('rows', 'script', 'status', 'wall (s)', 'cpu (s)', 'rss (MB)', 'rows/s'))
+    for r in results:
+        rate = r['wallSeconds'] > 0 and r['rows'] / r['wallSeconds'] or 0
+        print('%10s  %-18s %6s %10.2f %10.2f %10.1f %12.0f' % \
+            (r['rows'], r['step'], r['status'], r['wallSeconds'], r['cpuSeconds'],
+             r['maxRssKb'] / 1024.0, rate))
+    return
+
+#
+# Main
+#
+if __name__ == '__main__':
+    checkArgs()
+
+    labelDir = os.path.join(resultsDir, label)
+    os.makedirs(labelDir, exist_ok = True)
+    if revision is not None:
+        binDir = extractRevision(labelDir)
+
+    results = []
+    for rows in sizes:
+        results.extend(runSize(rows, labelDir))
+
+    fp = open(os.path.join(labelDir, 'timings.json'), 'w')
+    json.dump({'label' : label, 'binDir' : binDir, 'revision' : revision,
+        'generatorOptions' : generatorOptions, 'results' : results}, fp, indent = 2)
+    fp.write(NL)
+    fp.close()
+
+    printTimings(results)
+    sys.exit(0)
@@ -0,0 +1,172 @@
+'''
+  Module: db.py (benchmark stand-in)
+
+  Purpose: SQLite stand-in for the MGI db module, so the load scripts can
+           be run and timed against a generated database (see
+           generateData.py) without a Postgres server
+
+  Usage:
+        PYTHONPATH=benchmark/standin python bin/mrkcoordQC.py ...
+
+  Env Vars:
+        BENCHMARK_DB  the SQLite database file
+
+  Assumes:
+        Only the Postgres constructs the load scripts use are rewritten
+        for SQLite (see translate()). Results are lists of rows with
+        case-insensitive column names, as the db module returns them.
+        Session settings (set, reset) are ignored, also when they are
+        sent ahead of a statement in the same call.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import os
+import re
+import sqlite3
+
+dbFile = os.environ.get('BENCHMARK_DB', 'mgd.sqlite')
+
+conn = None
+trace = 0
+sqlLogFunction = None
+
+#
+# Result row with case-insensitive column names.
+#
+class Row(dict):
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self, key.lower())
+
+#
+# Purpose: Open the database on first use.
+# Returns: sqlite3 connection
+#
+def connection():
+    global conn
+
+    if conn is None:
+        conn = sqlite3.connect(dbFile)
+    return conn
+
+def set_sqlUser(user):
+    return
+
+def set_sqlPassword(password):
+    return
+
+def set_sqlPasswordFromFile(fileName):
+    return
+
+def set_sqlServer(server):
+    return
+
+def set_sqlDatabase(database):
+    return
+
+def get_sqlServer():
+    return 'benchmark'
+
+def get_sqlDatabase():
+    return os.path.basename(dbFile)
+
+def useOneConnection(flag = 0):
+    return
+
+def setTrace(flag = 1):
+    global trace
+
+    trace = flag
+    return
+
+def set_sqlLogFunction(function):
+    global sqlLogFunction
+
+    sqlLogFunction = function
+    return
+
+def sqlLogAll(cmd):
+    return
+
+def commit():
+    connection().commit()
+    return
+
+def rollback():
+    connection().rollback()
+    return
+
+#
+# Purpose: Rewrite the Postgres constructs of a statement for SQLite.
+# Returns: statement
+#
+def translate(cmd):
+    cmd = cmd.strip()
+
+    # set local ...; before the statement
+    cmd = re.sub(r'^(set\s[^;]*;\s*)+', '', cmd, flags = re.I)
+
+    # x = any(array[...]::text[]) and x = any(array[...])
+    cmd = re.sub(r'=\s*any\s*\(\s*array\[(.*?)\](::\w+\[\])?\s*\)', r'in (\1)', cmd,
+        flags = re.S | re.I)
+    cmd = re.sub(r'::\w+(\[\])?', '', cmd)
+
+    cmd = re.sub(r'^create\s+unlogged\s+table', 'create table', cmd, flags = re.I)
+
+    # (select ... union select ...) order by ...
+    match = re.match(r'^\((.*)\)\s*(order by .*)$', cmd, re.S | re.I)
+    if match:
+        cmd = '%s %s' % match.groups()
+
+    # with deleted as (delete ... returning x) select count(*) as deleted
+    # from deleted
+    match = re.match(r'^with\s+(\w+)\s+as\s*\(\s*(delete\s+.*?)\s+returning\s+\S+\s*\)' \
+        r'\s*select\s+count\(\*\)\s+as\s+(\w+)\s+from\s+\1\s*$', cmd, re.S | re.I)
+    if match:
+        cmd = (match.group(2), match.group(3))
+
+    return cmd
+
+#
+# Purpose: Run one statement, or several separated by ';'.
+# Returns: list of Row; for a delete rewritten from a 'returning' query,
+#          one row with the number of rows deleted
+#
+def execute(cmd):
+    cmd = translate(cmd)
+
+    if isinstance(cmd, tuple):
+        cursor = connection().execute(cmd[0])
+        return [Row([(cmd[1].lower(), cursor.rowcount)])]
+
+    if re.match(r'^((begin|start)\s+transaction|set\s|reset\s)', cmd, re.I):
+        return []
+
+    if sqlLogFunction is not None:
+        sqlLogFunction(cmd)
+
+    try:
+        cursor = connection().execute(cmd)
+    except sqlite3.ProgrammingError:
+        # more than one statement; executescript commits first, as the
+        # scripts that send these do right after
+        connection().executescript(cmd)
+        return []
+
+    if cursor.description is None:
+        return []
+    columns = [d[0].lower() for d in cursor.description]
+    return [Row(zip(columns, r)) for r in cursor.fetchall()]
+
+#
+# Purpose: Run a statement or a list of statements.
+# Returns: list of Row, or a list of those for a list of statements
+#
+def sql(cmd, parser = 'auto'):
+    if isinstance(cmd, list):
+        return [execute(c) for c in cmd]
+    return execute(cmd)
@@ -0,0 +1,11 @@
+'''
+  Module: loadlib.py (benchmark stand-in)
+
+  Purpose: Stand-in for the MGI loadlib module; mrkcoordDelete.py only
+           imports it.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
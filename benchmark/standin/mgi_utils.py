@@ -0,0 +1,18 @@
+'''
+  Module: mgi_utils.py (benchmark stand-in)
+
+  Purpose: Stand-in for the MGI mgi_utils module. date() returns a fixed
+           time so the reports of two benchmark runs can be compared.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import os
+
+FIXED_DATE = os.environ.get('BENCHMARK_DATE', '01/01/2026 00:00')
+
+def date(format = '%m/%d/%Y %H:%M'):
+    return FIXED_DATE
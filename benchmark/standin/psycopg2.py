@@ -0,0 +1,174 @@
+'''
+  Module: psycopg2.py (benchmark stand-in)
+
+  Purpose: SQLite stand-in for the psycopg2 calls of coordDb.py (COPY,
+           snapshot queries, parameters, named cursors and prepared
+           statements), on the database of the db stand-in
+
+  Assumes:
+        Snapshots are not exported; every connection reads the committed
+        state of the SQLite file, which the benchmark does not change
+        while the snapshot queries run. Named cursors are ordinary
+        cursors; prepared statements are kept by the connection and run
+        as SQLite statements. 'set' statements are ignored.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import re
+import sqlite3
+
+import db
+
+class Error(Exception):
+    pass
+
+class Cursor:
+
+    def __init__(self, connection, name = None):
+        self.connection = connection
+        self.conn = connection.conn
+        self.name = name
+        self.itersize = 2000
+        self.cursor = None
+        self.description = None
+        self.rowcount = -1
+
+    #
+    # Purpose: COPY text-format rows from a file-like object into a table.
+    # Returns: Nothing
+    #
+    def copy_expert(self, cmd, fp, size = 8192):
+        match = re.match(r'\s*copy\s+(\S+)\s*\((.*?)\)\s+from\s+stdin', cmd, re.I | re.S)
+        if match is None:
+            raise Error('unsupported COPY: %s' % cmd)
+        table, columns = match.groups()
+        numColumns = len(columns.split(','))
+
+        def rows():
+            buffer = ''
+            while True:
+                data = fp.read(size)
+                if not data:
+                    break
+                lines = (buffer + data).split('\n')
+                buffer = lines.pop()
+                for line in lines:
+                    yield [None if v == '\\N' else unescape(v) for v in line.split('\t')]
+            if buffer != '':
+                yield [None if v == '\\N' else unescape(v) for v in buffer.split('\t')]
+
+        self.conn.executemany('insert into %s (%s) values (%s)' % \
+            (table, columns, ','.join('?' * numColumns)), rows())
+        return
+
+    def execute(self, cmd, params = None):
+        prepared = self.connection.prepared
+
+        match = re.match(r'\s*(prepare|execute|deallocate)\s+(\w+)\s*(.*)$', cmd, re.I | re.S)
+        if re.search(r'pg_export_snapshot', cmd, re.I):
+            cmd, params = "select 'benchmark'", ()
+        elif re.match(r'\s*set\s', cmd, re.I):
+            return
+        elif match and match.group(1).lower() == 'prepare':
+            prepared[match.group(2)] = re.sub(r'^as\s+', '', match.group(3), flags = re.I)
+            return
+        elif match and match.group(1).lower() == 'deallocate':
+            del prepared[match.group(2)]
+            return
+        elif match and match.group(1).lower() == 'execute' and match.group(2) in prepared:
+            # $1, $2, ... become %s, so lists are bound as by bind()
+            text = prepared[match.group(2)]
+            params = [params[int(n) - 1] for n in re.findall(r'\$(\d+)', text)]
+            cmd, params = bind(re.sub(r'\$\d+', '%s', text.replace('%', '%%')), params)
+        else:
+            cmd, params = bind(cmd, params)
+
+        self.cursor = self.conn.execute(cmd, params)
+        self.description = self.cursor.description
+        self.rowcount = self.cursor.rowcount
+        return
+
+    def executemany(self, cmd, paramsList):
+        for params in paramsList:
+            self.execute(cmd, params)
+        return
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchmany(self, size = None):
+        return self.cursor.fetchmany(size or self.itersize)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def close(self):
+        return
+
+class Connection:
+
+    def __init__(self):
+        self.conn = sqlite3.connect(db.dbFile, check_same_thread = False)
+
+        # {name: statement} of the prepared statements
+        self.prepared = {}
+
+    def set_session(self, **kwargs):
+        return
+
+    def cursor(self, name = None):
+        return Cursor(self, name)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+#
+# Purpose: Bind psycopg2 parameters to a SQLite statement. A list bound
+#          to '= any(%s)' becomes 'in (?, ...)'.
+# Returns: (statement, parameters)
+#
+def bind(cmd, params):
+    if params is None:
+        return db.translate(cmd), ()
+    if isinstance(params, dict):
+        return db.translate(re.sub(r'%\((\w+)\)s', r':\1', cmd).replace('%%', '%')), params
+
+    parts = cmd.split('%s')
+    text = [parts[0]]
+    values = []
+    for part, value in zip(parts[1:], params):
+        if isinstance(value, (list, tuple)):
+            text[-1] = re.sub(r'=\s*any\s*\(\s*$', 'in (', text[-1], flags = re.I)
+            text.append(','.join('?' * len(value)) or 'null')
+            values.extend(value)
+        else:
+            text.append('?')
+            values.append(value)
+        text.append(part)
+    return db.translate(''.join(text).replace('%%', '%')), tuple(values)
+
+#
+# Purpose: Undo the COPY text-format escapes.
+# Returns: string
+#
+def unescape(value):
+    if '\\' not in value:
+        return value
+    return re.sub(r'\\(.)', lambda m: {'t' : '\t', 'n' : '\n', 'r' : '\r'}.get(m.group(1),
+        m.group(1)), value)
+
+def connect(**kwargs):
+    return Connection()
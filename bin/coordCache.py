@@ -0,0 +1,311 @@
+'''
+  Module: coordCache.py
+
+  Purpose: Binary cache of the parsed coordinate input file, written by
+           mrkcoordQC.py and read by createInputFiles.py instead of
+           parsing the load-ready file again
+
+  Usage:
+        import coordCache
+
+        writer = coordCache.Writer()
+        writer.add(rawLine, mgiID, collection, mirbaseID)  for each input line
+        writer.save(fileName, sourceFile, loadFile, lineStarts, accept)
+
+        cache = coordCache.load(fileName, loadFile)
+        if cache is not None:
+            for mgiID, start, length in cache.records(['mgiID',
+                    'lineStart', 'lineLength']):
+                cache.string(mgiID), cache.text(start, length), ...
+            cache.close()
+
+  Assumes:
+        The cache describes one input file (the source) and the
+        load-ready file mrkcoordQC.py created from it. Each column is an
+        array with one value per input line, holding only what
+        createInputFiles.py reads: text columns hold codes into one table
+        of distinct strings (MGI ID, provider~display collection key,
+        miRBase IDs), 'accept' is 1 for the lines copied to the
+        load-ready file. 'lineStart' and 'lineLength' give the bytes of
+        the source line up to the display column, which
+        createInputFiles.py writes to the coordload file.
+
+        The writer runs inside the QC read loop, so add() does as little
+        as it can: the values are the fields QC has already stripped,
+        the line offsets are the ones QC records anyway, and the source
+        is hashed once by save() rather than line by line.
+
+        The file is a header line (tab-delimited: tag, version, the
+        source file name, SHA-256 digest, size and mtime, the load-ready
+        file name, size and mtime, the number of rows and of strings),
+        then the columns in native byte order, each padded to 8 bytes,
+        then the strings, newline-separated. load() maps it into memory
+        and returns None - the caller parses the text - if it is missing,
+        of another version, or either file changed since it was written.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import os
+import mmap
+import array
+import hashlib
+
+TAB = '\t'
+NL = '\n'
+
+# first field of the header line, and the format version
+HEADER = '#coordCache'
+VERSION = '2'
+
+# the columns, in file order, and their array type codes
+COLUMNS = [
+    ('accept', 'B'),
+    ('lineStart', 'q'),
+    ('lineLength', 'I'),
+    ('mgiID', 'I'),
+    ('collection', 'I'),
+    ('mirbaseID', 'I'),
+    ]
+
+ALIGN = 8
+
+#
+# Purpose: Round a byte offset up to the column alignment.
+# Returns: integer
+#
+def aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+#
+# Purpose: Hash a file.
+# Returns: SHA-256 hex digest
+#
+def fileDigest(fileName):
+    digest = hashlib.sha256()
+    fp = open(fileName, 'rb')
+    for block in iter(lambda: fp.read(1 << 20), b''):
+        digest.update(block)
+    fp.close()
+    return digest.hexdigest()
+
+class Writer:
+
+    def __init__(self):
+        # {string: code, ...}
+        self.codes = {}
+
+        # {column name: array, ...}, without 'accept' and 'lineStart'
+        # (see save())
+        self.columns = {}
+        for name, typeCode in COLUMNS[2:]:
+            self.columns[name] = array.array(typeCode)
+
+        # add() appends to the columns in this order
+        self.appends = [self.columns[name].append for name, typeCode in COLUMNS[2:]]
+
+        # false once a line is found that the text parser of
+        # createInputFiles.py would split differently (a carriage return
+        # inside it)
+        self.usable = True
+
+    #
+    # Purpose: Add an input line.
+    # Returns: Nothing
+    # Assumes: 'rawLine' (bytes) is the next line of the source; the
+    #          others are its stripped MGI ID, 'provider~display' and
+    #          miRBase IDs
+    #
+    def add(self, rawLine, mgiID, collection, mirbaseID):
+        if b'\r' in rawLine and b'\r' in rawLine[:-2]:
+            self.usable = False
+
+        codes = self.codes
+        appendLength, appendMgiID, appendCollection, appendMirbaseID = self.appends
+
+        # the line up to the tab before its last two fields
+        appendLength(rawLine.rfind(b'\t', 0, rawLine.rfind(b'\t')))
+        appendMgiID(codes.setdefault(mgiID, len(codes)))
+        appendCollection(codes.setdefault(collection, len(codes)))
+        appendMirbaseID(codes.setdefault(mirbaseID, len(codes)))
+        return
+
+    #
+    # Purpose: Write the cache.
+    # Returns: True if it was written
+    # Assumes: 'lineStarts' holds the byte offset and 'accept' 1 or 0 for
+    #          each line added; 'loadFile' is complete
+    #
+    def save(self, fileName, sourceFile, loadFile, lineStarts, accept):
+        if not self.usable:
+            print('Not writing the coordinate cache %s: the input has carriage returns' % \
+                fileName)
+            if os.path.exists(fileName):
+                os.remove(fileName)
+            return False
+
+        numRows = len(self.columns['lineLength'])
+        accept = array.array('B', accept)
+        lineStarts = array.array('q', lineStarts)
+        if len(accept) != numRows or len(lineStarts) != numRows:
+            raise ValueError('%s accept flags and %s offsets for %s rows' % \
+                (len(accept), len(lineStarts), numRows))
+
+        sourceStat = os.stat(sourceFile)
+        loadStat = os.stat(loadFile)
+        header = TAB.join([HEADER, VERSION, os.path.abspath(sourceFile),
+            fileDigest(sourceFile), str(sourceStat.st_size), str(sourceStat.st_mtime_ns),
+            os.path.abspath(loadFile), str(loadStat.st_size),
+            str(loadStat.st_mtime_ns), str(numRows), str(len(self.codes))]) + NL
+
+        tmpFileName = '%s.%s' % (fileName, os.getpid())
+        fp = open(tmpFileName, 'wb')
+        fp.write(header.encode())
+        offset = len(header.encode())
+        for name, typeCode in COLUMNS:
+            fp.write(b'\0' * (aligned(offset) - offset))
+            if name == 'accept':
+                data = accept.tobytes()
+            elif name == 'lineStart':
+                data = lineStarts.tobytes()
+            else:
+                data = self.columns[name].tobytes()
+            fp.write(data)
+            offset = aligned(offset) + len(data)
+        fp.write(b'\0' * (aligned(offset) - offset))
+
+        # dictionaries keep their insertion order, i.e. the codes
+        fp.write(NL.join(self.codes).encode())
+        fp.close()
+        os.replace(tmpFileName, fileName)
+
+        print('Wrote the coordinate cache %s: %s rows, %s strings' % \
+            (fileName, numRows, len(self.codes)))
+        return True
+
+class CoordCache:
+
+    def __init__(self, fields, data, source):
+        self.sourceFile = fields[2]
+        self.sourceDigest = fields[3]
+        self.numRows = int(fields[9])
+
+        # mapped cache and source files
+        self.data = data
+        self.source = source
+
+        # {column name: memoryview of the column, ...}
+        self.columns = {}
+        view = memoryview(data)
+        offset = data.find(NL.encode()) + 1
+        for name, typeCode in COLUMNS:
+            offset = aligned(offset)
+            size = array.array(typeCode).itemsize * self.numRows
+            if offset + size > len(data):
+                view.release()
+                self.close()
+                raise ValueError('the file is truncated')
+            self.columns[name] = view[offset:offset + size].cast(typeCode)
+            offset += size
+        offset = aligned(offset)
+        view.release()
+
+        self.codes = []
+        if int(fields[10]) > 0:
+            self.codes = data[offset:].decode().split(NL)
+        if len(self.codes) != int(fields[10]):
+            self.close()
+            raise ValueError('%s strings, expected %s' % (len(self.codes), fields[10]))
+
+    #
+    # Purpose: Read columns of the rows copied to the load-ready file.
+    # Returns: generator of a tuple of the values of the 'names' columns
+    #          per row, in input order; codes for the string columns
+    #
+    def records(self, names):
+        columns = [self.columns[n] for n in names]
+        for row in zip(self.columns['accept'], *columns):
+            if row[0]:
+                yield row[1:]
+
+    #
+    # Purpose: Get the string of a code.
+    # Returns: string
+    #
+    def string(self, code):
+        return self.codes[code]
+
+    #
+    # Purpose: Get the bytes of the source file at a row's 'lineStart'
+    #          and 'lineLength', i.e. the line up to the display column.
+    # Returns: string, without a newline
+    #
+    def text(self, start, length):
+        return self.source[start:start + length].decode()
+
+    #
+    # Purpose: Unmap the files.
+    # Returns: Nothing
+    #
+    def close(self):
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+        self.data.close()
+        self.source.close()
+        return
+
+#
+# Purpose: Check that a file has the size and mtime of the header.
+# Returns: boolean
+#
+def unchanged(fileName, size, mtime):
+    if not os.path.exists(fileName):
+        return False
+    stat = os.stat(fileName)
+    return stat.st_size == int(size) and stat.st_mtime_ns == int(mtime)
+
+#
+# Purpose: Map a file into memory.
+# Returns: mmap
+#
+def mapFile(fileName):
+    fp = open(fileName, 'rb')
+    try:
+        return mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+    finally:
+        fp.close()
+
+#
+# Purpose: Map a cache written by Writer.save() into memory.
+# Returns: CoordCache, or None if 'fileName' is empty or does not exist,
+#          is of another version, is not for 'loadFile', or the source
+#          or load-ready file changed since it was written
+#
+def load(fileName, loadFile):
+    if fileName == '' or not os.path.exists(fileName):
+        return None
+
+    fp = open(fileName, 'rb')
+    fields = fp.readline().decode(errors = 'replace').rstrip(NL).split(TAB)
+    fp.close()
+
+    if len(fields) != 11 or fields[0] != HEADER or fields[1] != VERSION or \
+            fields[6] != os.path.abspath(loadFile) or \
+            not unchanged(fields[2], fields[4], fields[5]) or \
+            not unchanged(fields[6], fields[7], fields[8]):
+        print('Not using the coordinate cache %s' % fileName)
+        return None
+
+    try:
+        cache = CoordCache(fields, mapFile(fileName), mapFile(fields[2]))
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        print('Not using the coordinate cache %s: %s' % (fileName, e))
+        return None
+
+    print('Read the coordinate cache %s: %s rows, %s strings' % \
+        (fileName, cache.numRows, len(cache.codes)))
+    return cache
@@ -0,0 +1,502 @@
+'''
+  Module: coordDb.py
+
+  Purpose: Database helpers shared by the marker coordinate load scripts
+
+  Usage:
+        import coordDb
+
+        with coordDb.pool().connection() as conn:
+            rows = coordDb.query(conn, 'select ... where accID = %s', (mgiID,))
+            for r in coordDb.stream(conn, 'select ... from MAP_Coord_Feature'):
+                ...
+
+  Env Vars:
+        DB_POOL_SIZE   connections kept open by pool() (default 4)
+        DB_FETCH_SIZE  rows per fetch of stream() (default 10000)
+
+  Assumes:
+        The caller has set up the db module (user, password file,
+        useOneConnection) and owns the transaction.
+        connect(), copyIn() and snapshotQueries() work on psycopg2
+        connections of their own, for work the db module cannot do
+        (COPY, concurrent queries).
+
+        The psycopg2 helpers (query, execute, executeMany, stream,
+        Statement) take the values of a statement as parameters, never
+        interpolated into the SQL, and return rows like the db module.
+        The caller commits or rolls back the connection.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import os
+import re
+import sys
+import time
+import queue
+import atexit
+import itertools
+import contextlib
+import concurrent.futures
+import db
+
+poolSize = int(os.environ.get('DB_POOL_SIZE', '4'))
+fetchSize = int(os.environ.get('DB_FETCH_SIZE', '10000'))
+
+# the pool shared by the scripts of a process; see pool()
+sharedPool = None
+
+# numbers the names of server-side cursors and prepared statements
+nameCounter = itertools.count(1)
+
+# COPY text format escapes
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+#
+# Purpose: Split a list into consecutive chunks.
+# Returns: generator of lists of at most 'size' items
+#
+def chunks(items, size):
+    size = max(1, size)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+#
+# Purpose: Delete rows of 'table' whose integer 'keyColumn' is in 'keys'
+#          using one '= any(array[...])' statement per chunk.
+# Returns: total number of rows deleted
+# Assumes: the db module is in one-connection mode (useOneConnection(1)),
+#          so the chunks and commits run on one connection; the caller
+#          commits, unless 'commit' is true, and rolls back if a chunk
+#          fails
+# Effects: prints the number of rows deleted by each batch when
+#          'label' is given. With 'commit', each chunk is committed and
+#          'pause' seconds are slept before the next one, so readers of
+#          the table are not blocked for the whole delete. A 'timeout'
+#          (milliseconds) is set with 'set local' in the same call as
+#          each delete, so it holds for that delete whatever connection
+#          runs it, and ends with its transaction.
+#
+def deleteByKeys(table, keyColumn, keys, chunkSize, label = None,
+        commit = False, pause = 0, timeout = 0):
+    keys = sorted(set(keys))
+    numBatches = (len(keys) + max(1, chunkSize) - 1) // max(1, chunkSize)
+    total = 0
+    batch = 0
+
+    setTimeout = ''
+    if timeout > 0:
+        setTimeout = 'set local statement_timeout = %d;\n' % timeout
+
+    for chunk in chunks(keys, chunkSize):
+        if batch > 0 and commit and pause > 0:
+            time.sleep(pause)
+
+        batch += 1
+        results = db.sql('''%swith deleted as (
+            delete from %s
+            where %s = any(array[%s])
+            returning %s)
+            select count(*) as deleted from deleted
+            ''' % (setTimeout, table, keyColumn, ','.join(map(str, chunk)), keyColumn),
+            'auto')
+        numDeleted = results[0]['deleted']
+        total += numDeleted
+
+        if commit:
+            db.commit()
+
+        if label is not None:
+            print('Deleted %s of %s %s in batch %s of %s' % \
+                (numDeleted, len(chunk), label, batch, numBatches))
+            sys.stdout.flush()
+
+    # the caller's transaction goes on without the timeout
+    if timeout > 0 and not commit:
+        db.sql('reset statement_timeout', None)
+
+    return total
+
+#
+# Purpose: Open a psycopg2 connection to the database the db module uses.
+# Returns: connection, not in autocommit mode
+# Assumes: MGD_DBUSER is set; the password is read from
+#          MGD_DBPASSWORDFILE if readable, else libpq finds it (.pgpass)
+#
+def connect():
+    import psycopg2
+
+    password = None
+    passwordFileName = os.environ.get('MGD_DBPASSWORDFILE', '')
+    if passwordFileName != '' and os.access(passwordFileName, os.R_OK):
+        fp = open(passwordFileName, 'r')
+        password = fp.readline().strip()
+        fp.close()
+
+    return psycopg2.connect(host = db.get_sqlServer(),
+        dbname = db.get_sqlDatabase(),
+        user = os.environ['MGD_DBUSER'],
+        password = password)
+
+#
+# Purpose: Format one row in COPY text format.
+# Returns: line including the newline; None is written as NULL
+#
+def copyLine(row):
+    return '\t'.join(['\\N' if v is None else str(v).translate(COPY_ESCAPES) \
+        for v in row]) + '\n'
+
+#
+# File-like reader that formats rows for COPY as they are read, so the
+# rows can come from a generator and are sent while they are produced.
+#
+class CopyReader:
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = ''
+        self.count = 0
+
+    def read(self, size = -1):
+        lines = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            try:
+                line = copyLine(next(self.rows))
+            except StopIteration:
+                break
+            lines.append(line)
+            length += len(line)
+            self.count += 1
+        data = ''.join(lines)
+        if size < 0:
+            self.buffer = ''
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+#
+# Purpose: COPY rows into a table.
+# Returns: number of rows copied
+# Assumes: the caller commits
+#
+def copyIn(cursor, table, columns, rows):
+    reader = CopyReader(rows)
+    cursor.copy_expert('copy %s (%s) from stdin' % (table, ', '.join(columns)),
+        reader)
+    return reader.count
+
+#
+# Purpose: Find the COPY data line an error was raised for.
+# Returns: line number (1 = first row copied) or None
+#
+def copyErrorLine(error):
+    context = None
+    diag = getattr(error, 'diag', None)
+    if diag is not None:
+        context = diag.context
+    match = re.search(r'COPY \S+, line (\d+)', context or str(error))
+    if match is None:
+        return None
+    return int(match.group(1))
+
+#
+# Result row with case-insensitive column names, as the db module returns
+# them (r['mgiID'] for column mgiid).
+#
+class Row(dict):
+
+    def __init__(self, columns, values):
+        dict.__init__(self, zip([c.lower() for c in columns], values))
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self, key.lower())
+
+#
+# Small pool of psycopg2 connections. A connection is opened when one is
+# asked for and none is free, and is kept for the next caller when it is
+# given back, up to 'size' connections.
+#
+class Pool:
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.free = queue.LifoQueue()
+        self.opened = []
+
+    #
+    # Purpose: Get a connection.
+    # Returns: connection
+    #
+    def get(self):
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            conn = connect()
+            self.opened.append(conn)
+            return conn
+
+    #
+    # Purpose: Give back a connection.
+    # Returns: Nothing
+    # Effects: Rolls back what was not committed; closes the connection
+    #          if the pool already keeps 'size' connections
+    #
+    def put(self, conn):
+        conn.rollback()
+        if self.free.qsize() >= self.size:
+            self.opened.remove(conn)
+            conn.close()
+        else:
+            self.free.put(conn)
+        return
+
+    #
+    # Purpose: Borrow a connection for a 'with' block.
+    # Returns: context manager yielding the connection
+    #
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.get()
+        try:
+            yield conn
+        finally:
+            self.put(conn)
+
+    #
+    # Purpose: Close every connection of the pool.
+    # Returns: Nothing
+    #
+    def closeAll(self):
+        for conn in self.opened:
+            try:
+                conn.close()
+            except:
+                pass
+        self.opened = []
+        self.free = queue.LifoQueue()
+        return
+
+#
+# Purpose: The connection pool of the process, of ${DB_POOL_SIZE}.
+# Returns: Pool
+# Effects: The connections are closed when the process exits
+#
+def pool():
+    global sharedPool
+
+    if sharedPool is None:
+        sharedPool = Pool(poolSize)
+        atexit.register(sharedPool.closeAll)
+    return sharedPool
+
+#
+# Purpose: Rows of a cursor after a query.
+# Returns: list of Row
+#
+def fetchRows(cursor):
+    if cursor.description is None:
+        return []
+    columns = [d[0] for d in cursor.description]
+    return [Row(columns, r) for r in cursor.fetchall()]
+
+#
+# Purpose: Run a query with parameters.
+# Returns: list of Row
+# Assumes: 'params' is a tuple or dictionary for the %s or %(name)s
+#          placeholders of 'cmd'
+#
+def query(conn, cmd, params = None):
+    cursor = conn.cursor()
+    cursor.execute(cmd, params)
+    rows = fetchRows(cursor)
+    cursor.close()
+    return rows
+
+#
+# Purpose: Run a statement with parameters.
+# Returns: number of rows affected
+#
+def execute(conn, cmd, params = None):
+    cursor = conn.cursor()
+    cursor.execute(cmd, params)
+    count = cursor.rowcount
+    cursor.close()
+    return count
+
+#
+# Purpose: Run a statement once for each set of parameters.
+# Returns: Nothing
+# Effects: With psycopg2.extras, 'pageSize' statements are sent per
+#          round trip; otherwise one per round trip
+#
+def executeMany(conn, cmd, paramsList, pageSize = 1000):
+    cursor = conn.cursor()
+    try:
+        import psycopg2.extras
+        psycopg2.extras.execute_batch(cursor, cmd, paramsList, page_size = pageSize)
+    except ImportError:
+        cursor.executemany(cmd, paramsList)
+    cursor.close()
+    return
+
+#
+# Purpose: Stream the rows of a query from a named server-side cursor.
+# Returns: generator of Row
+# Assumes: The connection is not in autocommit mode and stays open, and
+#          the transaction is not ended, until the rows are read
+# Effects: The server keeps the result; 'size' rows (${DB_FETCH_SIZE})
+#          are fetched per round trip, so memory does not grow with the
+#          size of the result
+#
+def stream(conn, cmd, params = None, size = None):
+    cursor = conn.cursor(name = 'coorddb_cursor_%s' % next(nameCounter))
+    cursor.itersize = size or fetchSize
+    try:
+        cursor.execute(cmd, params)
+        columns = None
+        while True:
+            rows = cursor.fetchmany(cursor.itersize)
+            if not rows:
+                break
+            if columns is None:
+                columns = [d[0] for d in cursor.description]
+            for r in rows:
+                yield Row(columns, r)
+    finally:
+        cursor.close()
+
+#
+# Statement prepared once on a connection and run many times with
+# different parameters, so the server parses and plans it once.
+#
+#       lookup = coordDb.Statement(conn, 'select ... where accID = %s')
+#       rows = lookup.query((mgiID,))
+#
+class Statement:
+
+    def __init__(self, conn, cmd):
+        self.conn = conn
+        self.name = 'coorddb_stmt_%s' % next(nameCounter)
+
+        # %s placeholders become $1, $2, ...
+        count = itertools.count(1)
+        self.cmd, self.numParams = re.subn('%s', lambda m: '$%s' % next(count),
+            cmd.replace('%%', '%'))
+        self.prepared = False
+
+    #
+    # Purpose: Prepare the statement, once.
+    # Returns: Nothing
+    #
+    def prepare(self):
+        if not self.prepared:
+            cursor = self.conn.cursor()
+            cursor.execute('prepare %s as %s' % (self.name, self.cmd))
+            cursor.close()
+            self.prepared = True
+        return
+
+    #
+    # Purpose: Run the prepared statement.
+    # Returns: cursor
+    #
+    def run(self, params):
+        self.prepare()
+        cursor = self.conn.cursor()
+        if self.numParams == 0:
+            cursor.execute('execute %s' % self.name)
+        else:
+            cursor.execute('execute %s (%s)' % (self.name,
+                ', '.join(['%s'] * self.numParams)), params)
+        return cursor
+
+    #
+    # Purpose: Run the prepared query.
+    # Returns: list of Row
+    #
+    def query(self, params = ()):
+        cursor = self.run(params)
+        rows = fetchRows(cursor)
+        cursor.close()
+        return rows
+
+    #
+    # Purpose: Run the prepared statement.
+    # Returns: number of rows affected
+    #
+    def execute(self, params = ()):
+        cursor = self.run(params)
+        count = cursor.rowcount
+        cursor.close()
+        return count
+
+    #
+    # Purpose: Deallocate the statement on the server.
+    # Returns: Nothing
+    #
+    def close(self):
+        if self.prepared:
+            cursor = self.conn.cursor()
+            cursor.execute('deallocate %s' % self.name)
+            cursor.close()
+            self.prepared = False
+        return
+
+#
+# Purpose: Run read-only queries concurrently on 'numConnections'
+#          connections that all see the same snapshot of the database.
+# Returns: dictionary of result rows (list of Row) keyed like 'queries'
+# Assumes: the queries only read; anything they read must be committed
+# Effects: A leader connection exports a repeatable read snapshot that
+#          the other connections import before running any query.
+#
+def snapshotQueries(queries, numConnections):
+    numConnections = max(1, min(numConnections, len(queries)))
+    connections = []
+
+    try:
+        leader = connect()
+        connections.append(leader)
+        leader.set_session(isolation_level = 'REPEATABLE READ', readonly = True)
+        cursor = leader.cursor()
+        cursor.execute('select pg_export_snapshot()')
+        snapshot = cursor.fetchone()[0]
+
+        pool = queue.Queue()
+        for i in range(numConnections):
+            conn = connect()
+            connections.append(conn)
+            conn.set_session(isolation_level = 'REPEATABLE READ', readonly = True)
+            conn.cursor().execute('set transaction snapshot %s', (snapshot,))
+            pool.put(conn)
+
+        def run(cmd):
+            conn = pool.get()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(cmd)
+                columns = [d[0] for d in cursor.description]
+                return [Row(columns, r) for r in cursor.fetchall()]
+            finally:
+                pool.put(conn)
+
+        executor = concurrent.futures.ThreadPoolExecutor(numConnections)
+        futures = {}
+        for name in queries:
+            futures[name] = executor.submit(run, queries[name])
+        executor.shutdown()
+
+        results = {}
+        for name in queries:
+            results[name] = futures[name].result()
+        return results
+
+    finally:
+        for conn in connections:
+            conn.rollback()
+            conn.close()
@@ -0,0 +1,264 @@
+'''
+  Module: coordDelta.py
+
+  Purpose: Reduce the coordload file of a collection to the rows that
+           differ from the features already in MAP_Coord_Feature
+
+  Usage:
+        import coordDelta
+        isDelta, rows = coordDelta.reduceCollection(fileName, collection, build)
+
+        coordDelta.py delete coordload_file
+            (runCoordload.sh, after the load of the file succeeded)
+
+  Inputs:
+        coordload file written by createInputFiles.py:
+        1. MGI ID
+        2. Chr
+        3. start coordinate
+        4. end coordinate
+        5. strand
+        6. collection name
+
+  Outputs:
+        The coordload file is rewritten in place with only the rows of
+        markers whose features are new or changed. The feature keys of
+        markers no longer in the file are written to <coordload file>.delete,
+        one per line; 'delete' removes them from MAP_Coord_Feature once the
+        coordload of the file has succeeded. When no marker is new or
+        changed there is no coordload, and reduceCollection() deletes them
+        in the caller's transaction instead.
+
+  Assumes:
+        The caller owns the transaction (createInputFiles.py). The
+        features are read from a pool connection (see coordDb.py), which
+        sees what is committed; the caller's transaction changes no
+        feature of a collection before that collection is read.
+
+  Failure and recovery:
+        If the coordload of a reduced file fails, 'delete' is not run, so
+        MAP_Coord_Feature still holds the features of the collection as
+        before the load, apart from what the failed load itself committed.
+        If 'delete' fails after the load, the loaded markers are current
+        and the dropped markers keep their old features. In both cases
+        run the load again (mrkcoordload.sh, or --resume): the delta is
+        computed again from MAP_Coord_Feature and the deletes are
+        repeated by feature key, which is harmless for keys already gone.
+
+  Implementation:
+        Markers are compared by MGI ID on the set of
+        (chromosome, start, end, strand) of their features:
+        - insert: MGI ID in the file, not in the database
+        - update: MGI ID in both, features differ
+        - delete: MGI ID in the database, not in the file
+        - unchanged: MGI ID in both, features identical
+        Inserted and updated markers are loaded by the java coordload in
+        reload_by_object mode, which replaces the features of each marker
+        in the file. Unchanged markers are dropped from the file.
+
+        A collection that is not in the database yet, or whose map has a
+        different genome build than the input, is left as is and loaded
+        with COORD_LOAD_MODE.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import sys
+import os
+import coordDb
+
+USAGE = 'Usage: coordDelta.py delete coordload_file'
+
+TAB = '\t'
+CRT = '\n'
+
+# number of feature keys per delete statement
+DELETE_CHUNK = 5000
+
+#
+# Purpose: Name the file of the feature keys to delete after the load.
+# Returns: file name
+#
+def deleteFileName(fileName):
+    return fileName + '.delete'
+
+#
+# Purpose: Normalize the columns of a feature for comparison.
+# Returns: (chromosome, start, end, strand)
+#
+def normalize(chromosome, startCoordinate, endCoordinate, strand):
+    if strand is None:
+        strand = ''
+    return (str(chromosome).strip(), int(float(startCoordinate)),
+        int(float(endCoordinate)), str(strand).strip())
+
+#
+# Purpose: Fetch the features of all markers in a collection.
+# Returns: (set of map versions,
+#           {mgiID: set of normalized features},
+#           {mgiID: [feature keys]})
+# Assumes: the committed features are read, on a connection of the pool
+#
+def getFeatures(collection):
+    versions = set()
+    featureDict = {}
+    keyDict = {}
+
+    with coordDb.pool().connection() as conn:
+        results = coordDb.query(conn, '''
+            select a.accID as mgiID, c.chromosome, mc.version,
+                f._Feature_key, f.startCoordinate, f.endCoordinate, f.strand
+            from MAP_Coord_Collection cc, MAP_Coordinate mc, MRK_Chromosome c,
+                MAP_Coord_Feature f, ACC_Accession a
+            where cc.name = %s
+            and cc._Collection_key = mc._Collection_key
+            and mc._Object_key = c._Chromosome_key
+            and mc._Map_key = f._Map_key
+            and f._MGIType_key = 2
+            and f._Object_key = a._Object_key
+            and a._MGIType_key = 2
+            and a._LogicalDB_key = 1
+            and a.preferred = 1
+            and a.prefixPart = 'MGI:'
+            ''', (collection,))
+
+    for r in results:
+        mgiID = r['mgiID']
+        versions.add(r['version'])
+        if mgiID not in featureDict:
+            featureDict[mgiID] = set()
+            keyDict[mgiID] = []
+        featureDict[mgiID].add(normalize(r['chromosome'],
+            r['startCoordinate'], r['endCoordinate'], r['strand']))
+        keyDict[mgiID].append(r['_Feature_key'])
+
+    return versions, featureDict, keyDict
+
+#
+# Purpose: Read a coordload file.
+# Returns: ({mgiID: set of normalized features}, {mgiID: [lines]})
+#
+def readCoordFile(fileName):
+    featureDict = {}
+    lineDict = {}
+
+    fp = open(fileName, 'r')
+    for line in fp:
+        columns = line.split(TAB)
+        mgiID = columns[0].strip()
+        if mgiID not in featureDict:
+            featureDict[mgiID] = set()
+            lineDict[mgiID] = []
+        featureDict[mgiID].add(normalize(columns[1], columns[2], \
+            columns[3], columns[4]))
+        lineDict[mgiID].append(line)
+    fp.close()
+
+    return featureDict, lineDict
+
+#
+# Purpose: Reduce the coordload file of 'collection' to its changed rows
+#          and list the features of markers no longer in the file.
+# Returns: (isDelta, rows)
+#          isDelta is True if the file now holds a delta to be loaded in
+#          reload_by_object mode, False if the collection must be loaded
+#          in full; rows is the number of rows left in the file
+# Effects: rewrites 'fileName'; writes the keys of the features to delete
+#          to deleteFileName(fileName) if rows > 0, else deletes them
+#          from MAP_Coord_Feature
+#
+def reduceCollection(fileName, collection, build):
+    if os.path.exists(deleteFileName(fileName)):
+        os.remove(deleteFileName(fileName))
+
+    versions, dbFeatureDict, dbKeyDict = getFeatures(collection)
+
+    if not dbFeatureDict or versions != set([build]):
+        print('%s: no features for build %s in the database, full load' % \
+            (collection, build))
+        return False, None
+
+    fileFeatureDict, lineDict = readCoordFile(fileName)
+
+    inserts = 0
+    updates = 0
+    unchanged = 0
+    deleteKeys = []
+
+    fp = open(fileName, 'w')
+    for mgiID in lineDict:
+        if mgiID not in dbFeatureDict:
+            inserts += len(lineDict[mgiID])
+        elif fileFeatureDict[mgiID] != dbFeatureDict[mgiID]:
+            updates += len(lineDict[mgiID])
+        else:
+            unchanged += len(lineDict[mgiID])
+            continue
+        for line in lineDict[mgiID]:
+            fp.write(line)
+    fp.close()
+
+    for mgiID in dbFeatureDict:
+        if mgiID not in fileFeatureDict:
+            deleteKeys.extend(dbKeyDict[mgiID])
+
+    # the deletes wait for the coordload, so a failed load leaves the
+    # collection as it was; without a coordload they are done now
+    if inserts + updates > 0:
+        if deleteKeys:
+            fp = open(deleteFileName(fileName), 'w')
+            for key in deleteKeys:
+                fp.write('%s%s' % (key, CRT))
+            fp.close()
+        print('%s: %s inserts, %s updates, %s deletes after the load, %s unchanged' % \
+            (collection, inserts, updates, len(deleteKeys), unchanged))
+    else:
+        deletes = coordDb.deleteByKeys('MAP_Coord_Feature', '_Feature_key', \
+            deleteKeys, DELETE_CHUNK)
+        print('%s: %s deletes, %s unchanged' % (collection, deletes, unchanged))
+
+    return True, inserts + updates
+
+#
+# Purpose: Delete the features listed for a coordload file by
+#          reduceCollection(), in one transaction.
+# Returns: exit code
+#
+def deleteFeatures(fileName):
+    if not os.path.exists(deleteFileName(fileName)):
+        return 0
+
+    fp = open(deleteFileName(fileName), 'r')
+    keys = [int(line) for line in fp if line.strip() != '']
+    fp.close()
+
+    conn = coordDb.connect()
+    try:
+        total = 0
+        for chunk in coordDb.chunks(keys, DELETE_CHUNK):
+            total += coordDb.execute(conn,
+                'delete from MAP_Coord_Feature where _Feature_key = any(%s)',
+                (chunk,))
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    os.remove(deleteFileName(fileName))
+    print('Deleted %s features of markers no longer in %s' % (total, fileName))
+    return 0
+
+#
+# Main
+#
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'delete':
+        print(USAGE)
+        sys.exit(1)
+
+    sys.exit(deleteFeatures(sys.argv[2]))
@@ -0,0 +1,238 @@
+#
+#  coordFastLoad.py
+###########################################################################
+#
+#  Purpose:
+#
+#      Load a small collection file created by createInputFiles.py
+#      directly into MAP_Coord_Feature with COPY, without starting the
+#      java coordload.
+#
+#  Usage:
+#
+#      coordFastLoad.py  coordload_file  load_mode
+#
+#      where:
+#          coordload_file = path to the collection file
+#          load_mode = delete_reload, reload_by_object or add
+#                      (see COORD_LOAD_MODE)
+#
+#  Env Vars:
+#
+#      MGD_DBUSER
+#      MGD_DBPASSWORDFILE
+#      COORD_COLLECTION_NAME
+#      COORD_VERSION
+#      COORD_REPEATS_OK
+#      JOBSTREAM
+#
+#  Inputs:
+#
+#      - Tab-delimited coordload file:
+#
+#      1) MGI ID
+#      2) Chromosome
+#      3) Start Coordinate
+#      4) End Coordinate
+#      5) Strand
+#
+#  Outputs:
+#
+#      - MAP_Coord_Feature rows for the collection
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An exception occurred
+#      2:  The collection cannot take the fast path; run the java coordload
+#
+#  Implementation:
+#
+#      The fast path only loads features. It returns 2 and leaves the
+#      collection to the java coordload when anything needs more than
+#      that: a new collection or chromosome map, a map for another build,
+#      an MGI ID that does not resolve to a marker, or a repeated marker
+#      when repeats are not allowed.
+#
+#      Otherwise, in a single transaction:
+#      1) delete the existing features of the collection (delete_reload)
+#         or of the markers in the file (reload_by_object)
+#      2) COPY the new features, keyed from max(_Feature_key) + 1 under
+#         a table lock
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import coordDb
+
+USAGE = 'Usage: coordFastLoad.py  coordload_file  load_mode'
+TAB = '\t'
+
+# not eligible for the fast path
+FALLBACK = 2
+
+collectionName = os.environ['COORD_COLLECTION_NAME']
+version = os.environ.get('COORD_VERSION', '')
+repeatsOk = os.environ.get('COORD_REPEATS_OK', 'false')
+jobStream = os.environ['JOBSTREAM']
+
+FEATURE_COLUMNS = ['_Feature_key', '_Map_key', '_MGIType_key', '_Object_key',
+    'startCoordinate', 'endCoordinate', 'strand',
+    '_CreatedBy_key', '_ModifiedBy_key']
+
+#
+# Purpose: Read the coordload file.
+# Returns: list of (mgiID, chromosome, start, end, strand)
+#
+def readCoordFile(fileName):
+    rows = []
+    fp = open(fileName, 'r')
+    for line in fp:
+        columns = line.rstrip('\n').split(TAB)
+        rows.append((columns[0].strip(), columns[1].strip(),
+            int(columns[2]), int(columns[3]), columns[4].strip()))
+    fp.close()
+    return rows
+
+#
+# Purpose: Fetch the first column of a one-row query.
+# Returns: value or None
+#
+def fetchValue(cursor, cmd, params):
+    cursor.execute(cmd, params)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row[0]
+
+#
+# Purpose: Load the collection file.
+# Returns: exit code
+#
+def load(fileName, loadMode):
+    rows = readCoordFile(fileName)
+
+    mgiIDs = [r[0] for r in rows]
+    if repeatsOk != 'true' and len(set(mgiIDs)) != len(mgiIDs):
+        print('Repeated markers in %s' % fileName)
+        return FALLBACK
+
+    conn = coordDb.connect()
+    cursor = conn.cursor()
+
+    try:
+        collectionKey = fetchValue(cursor, '''
+            select _Collection_key from MAP_Coord_Collection where name = %s
+            ''', (collectionName,))
+        if collectionKey is None:
+            print('New collection: %s' % collectionName)
+            return FALLBACK
+
+        userKey = fetchValue(cursor, '''
+            select _User_key from MGI_User where login = %s
+            ''', (jobStream,))
+        if userKey is None:
+            print('Unknown user: %s' % jobStream)
+            return FALLBACK
+
+        # chromosome maps of the collection
+        mapDict = {}
+        cursor.execute('''
+            select c.chromosome, mc._Map_key, mc.version
+            from MAP_Coordinate mc, MRK_Chromosome c
+            where mc._Collection_key = %s
+            and mc._Object_key = c._Chromosome_key
+            ''', (collectionKey,))
+        for chromosome, mapKey, mapVersion in cursor.fetchall():
+            if mapVersion != version:
+                print('Map for chromosome %s is build %s' % (chromosome, mapVersion))
+                return FALLBACK
+            mapDict[chromosome] = mapKey
+
+        for r in rows:
+            if r[1] not in mapDict:
+                print('New map for chromosome %s' % r[1])
+                return FALLBACK
+
+        # marker keys
+        markerDict = {}
+        cursor.execute('''
+            select accID, _Object_key
+            from ACC_Accession
+            where accID = any(%s)
+            and _MGIType_key = 2
+            and _LogicalDB_key = 1
+            and preferred = 1
+            ''', (list(set(mgiIDs)),))
+        for mgiID, markerKey in cursor.fetchall():
+            markerDict[mgiID] = markerKey
+
+        for mgiID in mgiIDs:
+            if mgiID not in markerDict:
+                print('MGI ID does not resolve to a marker: %s' % mgiID)
+                return FALLBACK
+
+        cursor.execute('lock table MAP_Coord_Feature in share row exclusive mode')
+
+        if loadMode == 'delete_reload':
+            cursor.execute('''
+                delete from MAP_Coord_Feature f
+                using MAP_Coordinate mc
+                where f._Map_key = mc._Map_key
+                and mc._Collection_key = %s
+                ''', (collectionKey,))
+            print('Deleted %s features of %s' % (cursor.rowcount, collectionName))
+        elif loadMode == 'reload_by_object':
+            cursor.execute('''
+                delete from MAP_Coord_Feature f
+                using MAP_Coordinate mc
+                where f._Map_key = mc._Map_key
+                and mc._Collection_key = %s
+                and f._MGIType_key = 2
+                and f._Object_key = any(%s)
+                ''', (collectionKey, list(markerDict.values())))
+            print('Deleted %s features of %s markers' % (cursor.rowcount, len(markerDict)))
+
+        featureKey = fetchValue(cursor,
+            'select coalesce(max(_Feature_key), 0) from MAP_Coord_Feature', None)
+
+        features = []
+        for mgiID, chromosome, startCoordinate, endCoordinate, strand in rows:
+            featureKey += 1
+            if strand == '':
+                strand = None
+            features.append((featureKey, mapDict[chromosome], 2,
+                markerDict[mgiID], startCoordinate, endCoordinate, strand,
+                userKey, userKey))
+
+        count = coordDb.copyIn(cursor, 'MAP_Coord_Feature', FEATURE_COLUMNS, features)
+
+        # keep the key sequence, if there is one, ahead of the new keys
+        if fetchValue(cursor, "select to_regclass('map_coord_feature_seq')", None):
+            cursor.execute("select setval('map_coord_feature_seq', %s)", (featureKey,))
+
+        conn.commit()
+        print('Loaded %s features into %s' % (count, collectionName))
+
+    except:
+        conn.rollback()
+        raise
+
+    finally:
+        # closing discards the open transaction of a fallback
+        conn.close()
+
+    return 0
+
+#
+# Main
+#
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(USAGE)
+        sys.exit(1)
+
+    sys.exit(load(sys.argv[1], sys.argv[2]))
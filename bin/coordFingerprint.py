@@ -0,0 +1,248 @@
+#
+#  coordFingerprint.py
+###########################################################################
+#
+#  Purpose:
+#
+#      Keep a content fingerprint of each collection in the marker
+#      coordinate input file so the load only runs for collections whose
+#      rows have changed since the last successful load.
+#
+#  Usage:
+#
+#      coordFingerprint.py  check | filter | save  filename
+#
+#      where:
+#          check = compute the fingerprints of 'filename' and compare them
+#                  with the stored fingerprints of the last load
+#          filter = remove the files of unchanged collections from the
+#                   list of coordload files (${COORD_FILES})
+#          save = store the fingerprints computed by 'check' after a
+#                 successful load
+#          filename = path to the input file
+#
+#  Env Vars:
+#
+#      COORD_FINGERPRINT_FILE
+#      COORD_FILES
+#      INFILE_NAME
+#
+#  Inputs:
+#
+#      - Marker coordinate input file (see mrkcoordQC.sh)
+#
+#      - Stored fingerprints (${COORD_FINGERPRINT_FILE})
+#
+#  Outputs:
+#
+#      - Fingerprints of the current input (${COORD_FINGERPRINT_FILE}.new),
+#        moved over ${COORD_FINGERPRINT_FILE} by 'save'
+#
+#  Exit Codes:
+#
+#      0:  Successful completion; for 'check', at least one collection
+#          changed
+#      1:  An exception occurred
+#      2:  'check' found no changed collection
+#
+#  Implementation:
+#
+#      Rows are normalized the way mrkcoordQC.sh cleans the input (first
+#      8 columns, no blank or comment lines, no Ctrl-M, fields stripped)
+#      and grouped by collection~abbreviation, the key createInputFiles.py
+#      uses to name the coordload files. The fingerprint of a collection
+#      is the sum of the SHA-256 digests of its rows, so it does not
+#      depend on row order, hashed together with the build and strain
+#      from the header and the number of rows.
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import re
+import hashlib
+
+USAGE = 'Usage: coordFingerprint.py  check | filter | save  filename'
+TAB = '\t'
+NL = '\n'
+
+fingerprintFile = os.environ['COORD_FINGERPRINT_FILE']
+newFingerprintFile = fingerprintFile + '.new'
+
+# the rows are summed modulo 2^256
+MODULUS = 2 ** 256
+
+#
+# Purpose: Parse the build and strain from the header line.
+# Returns: (build, strain)
+#
+def parseHeader(header):
+    build = ''
+    strain = ''
+    for t in header.split(';'):
+        a = t.split('=')
+        key = a[0].strip().lower()
+        if key == 'build' and len(a) > 1:
+            build = a[1].strip()
+        elif key == 'strain' and len(a) > 1:
+            strain = a[1].strip()
+    return build, strain
+
+#
+# Purpose: Compute the fingerprint of each collection in the input file.
+# Returns: {collection~abbrev: (fingerprint, number of rows), ...}
+#
+def computeFingerprints(inputFile):
+    sums = {}
+    counts = {}
+
+    fp = open(inputFile, 'r', encoding='latin-1')
+    build, strain = parseHeader(fp.readline())
+    for line in fp:
+        line = line.rstrip('\n').rstrip('\r')
+        if not re.search('[0-9A-Za-z]', line) or line.startswith('#'):
+            continue
+        columns = [c.strip() for c in line.split(TAB)[:8]]
+        if len(columns) < 8:
+            columns.extend([''] * (8 - len(columns)))
+
+        # miRBase IDs are a comma-separated list
+        columns[7] = ','.join([m.strip() for m in columns[7].split(',')])
+
+        key = '%s~%s' % (columns[5], columns[6])
+        digest = hashlib.sha256(TAB.join(columns).encode('latin-1')).digest()
+        sums[key] = (sums.get(key, 0) + int.from_bytes(digest, 'big')) % MODULUS
+        counts[key] = counts.get(key, 0) + 1
+    fp.close()
+
+    fingerprints = {}
+    for key in sums:
+        h = hashlib.sha256()
+        h.update(('%s%s%s%s%s%s' % (build, TAB, strain, TAB, counts[key], TAB)).encode('latin-1'))
+        h.update(sums[key].to_bytes(32, 'big'))
+        fingerprints[key] = (h.hexdigest(), counts[key])
+    return fingerprints
+
+#
+# Purpose: Read a fingerprint file.
+# Returns: {collection~abbrev: (fingerprint, number of rows), ...}
+#
+def readFingerprints(fileName):
+    fingerprints = {}
+    if not os.path.exists(fileName):
+        return fingerprints
+    fp = open(fileName, 'r', encoding='latin-1')
+    for line in fp:
+        key, fingerprint, count = line.rstrip(NL).split(TAB)
+        fingerprints[key] = (fingerprint, int(count))
+    fp.close()
+    return fingerprints
+
+#
+# Purpose: Write a fingerprint file.
+# Returns: Nothing
+#
+def writeFingerprints(fileName, fingerprints):
+    fp = open(fileName, 'w', encoding='latin-1')
+    for key in sorted(fingerprints):
+        fingerprint, count = fingerprints[key]
+        fp.write('%s%s%s%s%s%s' % (key, TAB, fingerprint, TAB, count, NL))
+    fp.close()
+
+#
+# Purpose: Find the collections whose fingerprint changed.
+# Returns: list of collection~abbrev keys in the current input that
+#          are new or changed
+#
+def changedCollections(current, stored):
+    return [key for key in current if current[key] != stored.get(key)]
+
+#
+# Purpose: Compute and compare the fingerprints of the input file.
+# Returns: 0 if the load should run, 2 if nothing changed
+#
+def check(inputFile):
+    current = computeFingerprints(inputFile)
+    stored = readFingerprints(fingerprintFile)
+    writeFingerprints(newFingerprintFile, current)
+
+    changed = changedCollections(current, stored)
+    for key in changed:
+        print('Collection changed: %s (%s rows)' % (key, current[key][1]))
+
+    # a collection was dropped from the input
+    removed = set(stored).difference(set(current))
+
+    if changed or removed:
+        return 0
+    return 2
+
+#
+# Purpose: Find the coordload files of the collections whose fingerprint
+#          changed.
+# Returns: set of file names, named as createInputFiles.py names them
+#
+def changedFiles(inputFile):
+    coordFileRoot = os.environ['INFILE_NAME']
+
+    current = readFingerprints(newFingerprintFile)
+    if not current:
+        current = computeFingerprints(inputFile)
+    stored = readFingerprints(fingerprintFile)
+
+    fileNames = set()
+    for key in changedCollections(current, stored):
+        fileNames.add('%s.%s' % (coordFileRoot, key.replace(' ', '_')))
+    return fileNames
+
+#
+# Purpose: Remove the files of unchanged collections from ${COORD_FILES}.
+# Returns: 0
+#
+def filterFiles(inputFile):
+    coordFileListFile = os.environ['COORD_FILES']
+
+    fileNames = changedFiles(inputFile)
+
+    fp = open(coordFileListFile, 'r')
+    fileList = [l.rstrip(NL) for l in fp if l.strip() != '']
+    fp.close()
+
+    fp = open(coordFileListFile, 'w')
+    for f in fileList:
+        if f in fileNames:
+            fp.write(f + NL)
+        else:
+            print('Collection unchanged, skipping: %s' % f)
+    fp.close()
+    return 0
+
+#
+# Purpose: Store the fingerprints of the input that was loaded.
+# Returns: 0
+#
+def save(inputFile):
+    if not os.path.exists(newFingerprintFile):
+        writeFingerprints(newFingerprintFile, computeFingerprints(inputFile))
+    os.replace(newFingerprintFile, fingerprintFile)
+    return 0
+
+#
+# Main
+#
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] not in ('check', 'filter', 'save'):
+        print(USAGE)
+        sys.exit(1)
+
+    action = sys.argv[1]
+    inputFile = sys.argv[2]
+
+    if action == 'check':
+        sys.exit(check(inputFile))
+    elif action == 'filter':
+        sys.exit(filterFiles(inputFile))
+    else:
+        sys.exit(save(inputFile))
@@ -0,0 +1,221 @@
+#
+#  coordJournal.py
+###########################################################################
+#
+#  Purpose:
+#
+#      Keep a checkpoint journal of a load run: the stages (QC,
+#      createInputFiles.py, each collection coordload, the association
+#      load) that finished, for the input file they ran on, so a run
+#      that failed part of the way can be resumed (mrkcoordload.sh
+#      --resume) without redoing the work that is done.
+#
+#  Usage:
+#
+#      coordJournal.py  start filename [--resume]
+#      coordJournal.py  done stage [name]
+#      coordJournal.py  check stage [name]
+#      coordJournal.py  pending listfile
+#
+#      where:
+#          start = begin the journal of a run on input 'filename'; with
+#                  --resume the existing journal is kept if it is for
+#                  the same input content, else a new one is started
+#          done = record that 'stage' (for a coordload, 'name' is the
+#                 coordload file) finished successfully
+#          check = exit 0 if 'stage' is done and its output is still
+#                  there, 1 if it has to run
+#          pending = print the files of 'listfile' whose coordload is
+#                    not done
+#
+#  Env Vars:
+#
+#      COORD_JOURNAL_FILE (empty = no journal; every stage runs)
+#      INPUT_FILE_LOAD
+#      COORD_FILES
+#      MIRBASE_ASSOC_FILE
+#      COORD_DELTA_LOAD
+#      COORD_DELTA_FILES
+#
+#  Outputs:
+#
+#      - Journal (${COORD_JOURNAL_FILE}): a header line with the SHA-256
+#        digest and name of the input file, then a line per stage done
+#        (stage, name, time), tab-delimited. Each line is synced to disk
+#        before the command returns.
+#
+#  Exit Codes:
+#
+#      0:  Successful completion; for 'check', the stage is done
+#      1:  An exception occurred; for 'check', the stage has to run
+#
+#  Notes:
+#
+#      A stage whose output files are gone (e.g. the output directory
+#      was cleaned) is not done, whatever the journal says.
+#
+###########################################################################
+
+import sys
+import os
+import time
+import hashlib
+
+USAGE = '''Usage: coordJournal.py  start filename [--resume]
+       coordJournal.py  done | check  stage [name]
+       coordJournal.py  pending listfile'''
+TAB = '\t'
+NL = '\n'
+
+journalFile = os.environ.get('COORD_JOURNAL_FILE', '')
+
+# header line tag
+INPUT_TAG = 'input'
+
+#
+# Purpose: Compute the digest of a file.
+# Returns: hex SHA-256 digest
+#
+def digest(fileName):
+    h = hashlib.sha256()
+    fp = open(fileName, 'rb')
+    for block in iter(lambda: fp.read(1024 * 1024), b''):
+        h.update(block)
+    fp.close()
+    return h.hexdigest()
+
+#
+# Purpose: Read the journal.
+# Returns: (input digest, set of (stage, name) done); (None, set()) if
+#          there is no journal
+#
+def readJournal():
+    if journalFile == '' or not os.path.exists(journalFile):
+        return None, set()
+
+    inputDigest = None
+    doneSet = set()
+    fp = open(journalFile, 'r', encoding='latin-1')
+    for line in fp:
+        fields = line.rstrip(NL).split(TAB)
+        if len(fields) < 2:
+            # a line cut short when the run was killed
+            continue
+        if fields[0] == INPUT_TAG:
+            inputDigest = fields[1]
+        else:
+            doneSet.add((fields[0], fields[1]))
+    fp.close()
+    return inputDigest, doneSet
+
+#
+# Purpose: Write a line to a file and sync it to disk.
+# Returns: Nothing
+#
+def appendLine(fileName, mode, line):
+    fp = open(fileName, mode, encoding='latin-1')
+    fp.write(line + NL)
+    fp.flush()
+    os.fsync(fp.fileno())
+    fp.close()
+    return
+
+#
+# Purpose: Begin the journal of a run.
+# Returns: 0
+#
+def start(inputFile, resume):
+    if journalFile == '':
+        return 0
+
+    inputDigest = digest(inputFile)
+
+    if resume:
+        journalDigest, doneSet = readJournal()
+        if journalDigest == inputDigest:
+            print('Resuming; done: %s' % \
+                (', '.join(sorted([n or s for s, n in doneSet])) or 'nothing'))
+            return 0
+        if journalDigest is not None:
+            print('The input file changed since the journal was started; starting over')
+
+    appendLine(journalFile, 'w', '%s%s%s%s%s%s%s' % (INPUT_TAG, TAB, inputDigest,
+        TAB, inputFile, TAB, time.strftime('%Y-%m-%d %H:%M:%S')))
+    return 0
+
+#
+# Purpose: Record a stage as done.
+# Returns: 0
+#
+def done(stage, name = ''):
+    if journalFile == '':
+        return 0
+    appendLine(journalFile, 'a', '%s%s%s%s%s' % (stage, TAB, name, TAB,
+        time.strftime('%Y-%m-%d %H:%M:%S')))
+    return 0
+
+#
+# Purpose: Check that the files a stage wrote are still there.
+# Returns: boolean
+#
+def outputsExist(stage):
+    if stage == 'qc':
+        return os.path.exists(os.environ['INPUT_FILE_LOAD'])
+
+    if stage == 'createInputFiles':
+        fileList = [os.environ['COORD_FILES'], os.environ['MIRBASE_ASSOC_FILE']]
+        if os.environ.get('COORD_DELTA_LOAD', 'false') == 'true':
+            fileList.append(os.environ['COORD_DELTA_FILES'])
+        if not os.path.exists(os.environ['COORD_FILES']):
+            return False
+        fp = open(os.environ['COORD_FILES'], 'r')
+        fileList += [l.rstrip(NL) for l in fp if l.strip() != '']
+        fp.close()
+        return not [f for f in fileList if not os.path.exists(f)]
+
+    return True
+
+#
+# Purpose: Check whether a stage is done.
+# Returns: boolean
+#
+def isDone(stage, name = ''):
+    journalDigest, doneSet = readJournal()
+    return (stage, name) in doneSet and outputsExist(stage)
+
+#
+# Purpose: Print the files of a coordload file list whose load is not
+#          done; the files skipped are reported on stderr.
+# Returns: 0
+#
+def pending(listFile):
+    journalDigest, doneSet = readJournal()
+    fp = open(listFile, 'r')
+    for line in fp:
+        f = line.rstrip(NL)
+        if f.strip() == '':
+            continue
+        if ('coordload', f) in doneSet:
+            sys.stderr.write('Collection already loaded, skipping: %s%s' % (f, NL))
+        else:
+            print(f)
+    fp.close()
+    return 0
+
+#
+# Main
+#
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    if len(args) in (2, 3) and args[0] == 'start' and args[2:] in ([], ['--resume']):
+        sys.exit(start(args[1], args[2:] == ['--resume']))
+    elif len(args) in (2, 3) and args[0] == 'done':
+        sys.exit(done(*args[1:]))
+    elif len(args) in (2, 3) and args[0] == 'check':
+        sys.exit(not isDone(*args[1:]) and 1 or 0)
+    elif len(args) == 2 and args[0] == 'pending':
+        sys.exit(pending(args[1]))
+
+    print(USAGE)
+    sys.exit(1)
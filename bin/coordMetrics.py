@@ -0,0 +1,332 @@
+'''
+  Module: coordMetrics.py
+
+  Purpose: Record the wall time, CPU time, rows in and out, SQL round
+           trips and bytes written of each phase of a load script, and
+           export them as a Prometheus textfile-collector file and a
+           JSON run summary
+
+  Usage:
+        import coordMetrics
+
+        metrics = coordMetrics.Metrics('mrkcoordQC')
+        metrics.instrumentDb(db)
+        metrics.writeAtExit()
+
+        with metrics.phase('invMarker') as p:
+            ...
+            p.rowsOut += n
+
+        or, to time a program (the java coordload):
+
+        coordMetrics.py run script collection phase rowsInFile command ...
+
+        which runs 'command', records the phase for 'script'/'collection'
+        with the CPU time and blocks written of the command and the rows
+        of 'rowsInFile', and exits with the exit status of 'command'
+
+  Env Vars:
+        METRICS_DIR           directory of the JSON run summaries;
+                              empty = no metrics are written
+        METRICS_TEXTFILE_DIR  directory of the Prometheus .prom files
+                              (default ${METRICS_DIR})
+
+  Assumes:
+        SQL round trips are counted for db.sql() calls once
+        instrumentDb() is called; a script counts its own psycopg2
+        statements with countSql(). Counters go to the innermost phase
+        that is running and to the run totals.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import sys
+import os
+import re
+import json
+import time
+import atexit
+import resource
+import subprocess
+import contextlib
+
+NL = '\n'
+
+METRIC_PREFIX = 'mrkcoordload'
+
+metricsDir = os.environ.get('METRICS_DIR', '')
+textfileDir = os.environ.get('METRICS_TEXTFILE_DIR', '') or metricsDir
+
+# (attribute, metric name, help text)
+METRICS = [
+    ('wall', 'wall_seconds', 'Wall time'),
+    ('cpu', 'cpu_seconds', 'CPU time'),
+    ('rowsIn', 'rows_in', 'Rows read'),
+    ('rowsOut', 'rows_out', 'Rows written or reported'),
+    ('sqlCalls', 'sql_round_trips', 'SQL statements sent to the server'),
+    ('bytesWritten', 'bytes_written', 'Bytes written'),
+    ]
+
+class Phase:
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rowsIn = 0
+        self.rowsOut = 0
+        self.sqlCalls = 0
+        self.bytesWritten = 0
+
+    def asDict(self):
+        return {
+            'phase' : self.name,
+            'wallSeconds' : round(self.wall, 3),
+            'cpuSeconds' : round(self.cpu, 3),
+            'rowsIn' : self.rowsIn,
+            'rowsOut' : self.rowsOut,
+            'sqlRoundTrips' : self.sqlCalls,
+            'bytesWritten' : self.bytesWritten,
+            }
+
+class Metrics:
+
+    def __init__(self, script, collection = ''):
+        self.script = script
+        self.collection = collection
+
+        # {name: Phase} in the order the phases first ran
+        self.phases = {}
+
+        # phases running, innermost last
+        self.running = []
+
+        self.total = Phase('total')
+        self.started = time.time()
+        self.startWall = time.monotonic()
+        self.startCpu = time.process_time()
+
+    #
+    # Purpose: Get a phase, adding it if it has not run yet.
+    # Returns: Phase
+    #
+    def get(self, name):
+        if name not in self.phases:
+            self.phases[name] = Phase(name)
+        return self.phases[name]
+
+    #
+    # Purpose: Time a phase; nested phases are timed on their own.
+    # Returns: context manager yielding the Phase
+    #
+    @contextlib.contextmanager
+    def phase(self, name):
+        p = self.get(name)
+        self.running.append(p)
+        startWall = time.monotonic()
+        startCpu = time.process_time()
+        try:
+            yield p
+        finally:
+            p.wall += time.monotonic() - startWall
+            p.cpu += time.process_time() - startCpu
+            self.running.remove(p)
+
+    #
+    # Purpose: Count SQL round trips.
+    # Returns: Nothing
+    #
+    def countSql(self, count = 1):
+        self.total.sqlCalls += count
+        if self.running:
+            self.running[-1].sqlCalls += count
+        return
+
+    #
+    # Purpose: Count the round trips of every db.sql() call.
+    # Returns: Nothing
+    # Effects: Replaces dbModule.sql with a wrapper; a list of commands
+    #          counts as one round trip per command
+    #
+    def instrumentDb(self, dbModule):
+        sql = dbModule.sql
+
+        def countedSql(cmd, *args, **kwargs):
+            if isinstance(cmd, list):
+                self.countSql(len(cmd))
+            else:
+                self.countSql(1)
+            return sql(cmd, *args, **kwargs)
+
+        dbModule.sql = countedSql
+        return
+
+    #
+    # Purpose: Labels of the run.
+    # Returns: list of (name, value)
+    #
+    def labels(self):
+        labels = [('script', self.script)]
+        if self.collection != '':
+            labels.append(('collection', self.collection))
+        return labels
+
+    #
+    # Purpose: Base name of the metrics files of the run.
+    # Returns: string
+    #
+    def fileName(self):
+        name = '%s_%s' % (METRIC_PREFIX, self.script)
+        if self.collection != '':
+            name = '%s_%s' % (name, self.collection)
+        return re.sub('[^A-Za-z0-9_.-]', '_', name)
+
+    #
+    # Purpose: Update the run totals.
+    # Returns: Nothing
+    # Assumes: No two phases count the same rows or bytes
+    #
+    def finish(self):
+        self.total.wall = time.monotonic() - self.startWall
+        self.total.cpu = max(self.total.cpu, time.process_time() - self.startCpu)
+        for attr in ('rowsIn', 'rowsOut', 'bytesWritten'):
+            setattr(self.total, attr,
+                sum([getattr(p, attr) for p in self.phases.values()]))
+        return
+
+    #
+    # Purpose: Render the metrics in the Prometheus text format.
+    # Returns: string
+    #
+    def prometheus(self):
+        lines = []
+        for attr, name, text in METRICS:
+            for scope, phases in (('phase', list(self.phases.values())),
+                                  ('run', [self.total])):
+                metric = '%s_%s_%s' % (METRIC_PREFIX, scope, name)
+                lines.append('# HELP %s %s of a %s' % (metric, text,
+                    'load phase' if scope == 'phase' else 'load script run'))
+                lines.append('# TYPE %s gauge' % metric)
+                for p in phases:
+                    labels = self.labels()
+                    if scope == 'phase':
+                        labels.append(('phase', p.name))
+                    lines.append('%s{%s} %s' % (metric, formatLabels(labels),
+                        getattr(p, attr)))
+
+        metric = '%s_run_timestamp_seconds' % METRIC_PREFIX
+        lines.append('# HELP %s End time of a load script run' % metric)
+        lines.append('# TYPE %s gauge' % metric)
+        lines.append('%s{%s} %d' % (metric, formatLabels(self.labels()),
+            int(time.time())))
+        return NL.join(lines) + NL
+
+    #
+    # Purpose: Render the JSON run summary.
+    # Returns: dictionary
+    #
+    def summary(self):
+        summary = dict(self.labels())
+        summary['started'] = time.strftime('%Y-%m-%dT%H:%M:%S',
+            time.localtime(self.started))
+        summary['finished'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        summary['total'] = self.total.asDict()
+        summary['phases'] = [p.asDict() for p in self.phases.values()]
+        return summary
+
+    #
+    # Purpose: Write the Prometheus file and the JSON run summary.
+    # Returns: Nothing
+    # Effects: Nothing if ${METRICS_DIR} is not set. The files are
+    #          replaced atomically so a collector never reads half a file.
+    #
+    def write(self):
+        if metricsDir == '':
+            return
+
+        self.finish()
+        name = self.fileName()
+        writeFile(os.path.join(textfileDir, name + '.prom'), self.prometheus())
+        writeFile(os.path.join(metricsDir, name + '.json'),
+            json.dumps(self.summary(), indent = 2) + NL)
+        return
+
+    #
+    # Purpose: Write the metrics when the script exits, however it exits.
+    # Returns: Nothing
+    #
+    def writeAtExit(self):
+        atexit.register(self.write)
+        return
+
+#
+# Purpose: Format Prometheus labels.
+# Returns: string
+#
+def formatLabels(labels):
+    return ','.join(['%s="%s"' % (name, str(value).replace('\\', '\\\\') \
+        .replace('"', '\\"').replace(NL, '\\n')) for name, value in labels])
+
+#
+# Purpose: Write a file atomically.
+# Returns: Nothing
+#
+def writeFile(fileName, text):
+    os.makedirs(os.path.dirname(fileName) or '.', exist_ok = True)
+    tmpFileName = '%s.%s' % (fileName, os.getpid())
+    fp = open(tmpFileName, 'w')
+    fp.write(text)
+    fp.close()
+    os.replace(tmpFileName, fileName)
+    return
+
+#
+# Purpose: Count the lines of a file.
+# Returns: integer; 0 if the file cannot be read
+#
+def countLines(fileName):
+    count = 0
+    try:
+        fp = open(fileName, 'rb')
+    except:
+        return 0
+    for block in iter(lambda: fp.read(1024 * 1024), b''):
+        count += block.count(b'\n')
+    fp.close()
+    return count
+
+#
+# Purpose: Run a command as a phase of 'script'/'collection'.
+# Returns: exit status of the command
+# Effects: The CPU time and bytes written are those of the command and
+#          its children (getrusage); bytes written is the block output
+#          count, which Linux reports in 512-byte units.
+#
+def runCommand(script, collection, phaseName, rowsInFile, command):
+    metrics = Metrics(script, collection)
+
+    with metrics.phase(phaseName) as p:
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        status = subprocess.call(command)
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    p.cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    p.bytesWritten = (after.ru_oublock - before.ru_oublock) * 512
+    p.rowsIn = countLines(rowsInFile)
+    metrics.total.cpu = p.cpu
+    metrics.write()
+
+    # a signal is reported the way the shell would
+    if status < 0:
+        status = 128 - status
+    return status
+
+if __name__ == '__main__':
+    if len(sys.argv) < 7 or sys.argv[1] != 'run':
+        print('Usage: coordMetrics.py run script collection phase rowsInFile command ...')
+        sys.exit(1)
+    sys.exit(runCommand(sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5],
+        sys.argv[6:]))
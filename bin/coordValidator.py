@@ -0,0 +1,144 @@
+'''
+  Module: coordValidator.py
+
+  Purpose: Validate the coordinates and strands of a block of input rows
+           at once, for mrkcoordQC.py
+
+  Usage:
+        import coordValidator
+
+        masks = coordValidator.validate(columns)
+
+        where columns is a dictionary of equal-length lists of stripped
+        field values keyed by 'start', 'end' and 'strand'; masks is a
+        list with one reason bitmask per row (0 = valid)
+
+  Assumes:
+        NumPy is optional. With it, each check is a few array operations
+        over the block; without it, the same checks run as a plain loop
+        of str methods.
+
+        The checks are those of the invalid coordinate and strand report
+        as before: empty required columns are left to the sanity check
+        (sanityCheck.py), and a column of only white space passes here
+        as an empty one.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# reason bits, in the order the reasons are reported
+BAD_START = 1
+BAD_END = 2
+START_GT_END = 4
+BAD_STRAND = 8
+
+REASONS = [
+    (BAD_START, 'Invalid start coordinate'),
+    (BAD_END, 'Invalid end coordinate'),
+    (START_GT_END, 'Start coordinate > end coordinate'),
+    (BAD_STRAND, 'Invalid strand'),
+    ]
+
+STRANDS = ('+', '-', '')
+
+#
+# Purpose: Render the reasons in a bitmask.
+# Returns: list of reason strings
+#
+def reasons(mask):
+    return [reason for bit, reason in REASONS if mask & bit]
+
+#
+# Purpose: Check a coordinate is empty or all 0-9 (re '[^0-9]').
+# Returns: True if valid
+#
+def isCoordinate(value):
+    return value == '' or (value.isascii() and value.isdigit())
+
+#
+# Purpose: Validate a block of rows with plain Python.
+# Returns: list of bitmasks
+#
+def validateLoop(columns):
+    masks = []
+    for i in range(len(columns['start'])):
+        start = columns['start'][i]
+        end = columns['end'][i]
+        mask = 0
+        if not isCoordinate(start):
+            mask |= BAD_START
+        if not isCoordinate(end):
+            mask |= BAD_END
+        if mask == 0 and start != '' and end != '' and int(start) > int(end):
+            mask |= START_GT_END
+        if columns['strand'][i] not in STRANDS:
+            mask |= BAD_STRAND
+        masks.append(mask)
+    return masks
+
+#
+# Purpose: Find the coordinates that are not empty or all 0-9.
+# Returns: boolean array
+# Assumes: 'values' is a numpy unicode array; its UCS-4 code points are
+#          viewed as a 2-d integer array, padded with 0
+#
+def badCoordinates(values):
+    if values.dtype.itemsize == 0:
+        return numpy.zeros(len(values), dtype = bool)
+    codes = values.view(numpy.uint32).reshape(len(values), -1)
+    return ((codes != 0) & ((codes < 48) | (codes > 57))).any(axis = 1)
+
+#
+# Purpose: Compare two arrays of digit strings as numbers, without
+#          converting them (they may not fit in 64 bits).
+# Returns: boolean array, True where start > end
+#
+def greaterThan(starts, ends):
+    starts = numpy.char.lstrip(starts, '0')
+    ends = numpy.char.lstrip(ends, '0')
+    startLen = numpy.char.str_len(starts)
+    endLen = numpy.char.str_len(ends)
+    return (startLen > endLen) | ((startLen == endLen) & (starts > ends))
+
+#
+# Purpose: Validate a block of rows with numpy array operations.
+# Returns: list of bitmasks
+#
+def validateArrays(columns):
+    arrays = {}
+    for c in ('start', 'end', 'strand'):
+        arrays[c] = numpy.array(columns[c], dtype = str)
+
+    starts = arrays['start']
+    ends = arrays['end']
+
+    badStart = badCoordinates(starts)
+    badEnd = badCoordinates(ends)
+    compare = ~badStart & ~badEnd & (starts != '') & (ends != '')
+
+    masks = numpy.where(badStart, BAD_START, 0)
+    masks |= numpy.where(badEnd, BAD_END, 0)
+    masks |= numpy.where(compare & greaterThan(starts, ends), START_GT_END, 0)
+    masks |= numpy.where(numpy.isin(arrays['strand'], STRANDS, invert = True),
+        BAD_STRAND, 0)
+
+    return masks.tolist()
+
+#
+# Purpose: Validate a block of rows.
+# Returns: list of bitmasks, one per row
+#
+def validate(columns):
+    if len(columns['start']) == 0:
+        return []
+    if numpy is not None:
+        return validateArrays(columns)
+    return validateLoop(columns)
@@ -45,6 +45,10 @@
     1:  An exception occurred
 
   Implementation:
+        With COORD_CACHE=true the rows are read from the parsed-input
+        cache mrkcoordQC.py writes (${COORD_CACHE_FILE}, see
+        coordCache.py) when it is there and current, else from the text
+        of the load-ready file.
 
   Notes:
 
@@ -56,7 +60,13 @@
 
 import sys
 import os
+from collections import OrderedDict
 import db
+import coordDb
+import coordDelta
+import mirbaseIndex
+import coordCache
+import coordMetrics
 
 TAB = '\t'
 CRT = '\n'
@@ -73,18 +83,115 @@ coordFileRoot = os.environ['INFILE_NAME']
 # name of file containing all coordload input files
 coordFileListFile = os.environ['COORD_FILES']
 
-# mapping of collections to their rows of coordinates
+# bulk = collect the miRBase accession keys of every input marker and
+#        purge them in chunked statements, committed once at the end
+# row  = delete and commit per input row
+mirbaseDeleteMode = os.environ.get('MIRBASE_DELETE_MODE', 'bulk')
 
-# {collectionName~collectionAbbrev: [list of coordload format rows], ...}
-inputDict = {}
+# number of accession keys per bulk delete statement
+mirbaseDeleteChunk = int(os.environ.get('MIRBASE_DELETE_CHUNK', '5000'))
 
-# the set of collections found in 'inputFile'
+# input = look up miRBase accessions only for the MGI IDs in 'inputFile'
+# all   = look up every marker with a miRBase accession
+mirbaseLookupScope = os.environ.get('MIRBASE_LOOKUP_SCOPE', 'input')
+
+# temp table of the distinct MGI IDs in 'inputFile', on a pool connection
+inputIdTable = 'mirbase_input_ids'
+
+# miRBase index saved by mrkcoordQC.py during this run; reused when it
+# is for this database and at most 'mirbaseIndexMaxAge' seconds old
+mirbaseIndexFile = os.environ.get('MIRBASE_INDEX_FILE', '')
+mirbaseIndexMaxAge = int(os.environ.get('MIRBASE_INDEX_MAX_AGE', '3600'))
+
+# number of MGI IDs per round trip of the inserts into 'inputIdTable'
+STAGE_CHUNK = 1000
+
+# true = reduce each coordload file to the rows that differ from
+#        MAP_Coord_Feature (see coordDelta.py)
+coordDeltaLoad = os.environ.get('COORD_DELTA_LOAD', 'false')
+
+# name of file listing the coordload files that hold a delta, to be
+# loaded in reload_by_object mode
+coordDeltaListFile = os.environ.get('COORD_DELTA_FILES', '')
+
+# parsed-input cache written by mrkcoordQC.py when COORD_CACHE is true;
+# None = parse 'inputFile'
+useCache = os.environ.get('COORD_CACHE', 'false')
+coordCacheFile = os.environ.get('COORD_CACHE_FILE', '')
+cache = None
+
+# genome build from the input file header
+build = ''
+
+# maximum number of coordload files held open at once while splitting
+maxOpenCoordFiles = int(os.environ.get('MAX_OPEN_COORD_FILES', '32'))
+
+# true = the rows of each collection are counted first, and a coordload
+#        file is closed and written to 'coordFileListFile' as soon as
+#        the last row of its collection is written, so a reader of the
+#        list (mrkcoordPipeline.py) can start loading it
+# false = the list is written once every row is read
+streamCoordFiles = os.environ.get('COORD_STREAM_FILES', 'false')
+
+# 'coordFileListFile' and 'coordDeltaListFile', once opened
+fpCoordList = None
+fpDeltaList = None
+
+# the collections whose coordload file is complete and listed
+finishedSet = set()
+
+# mapping of collections to their coordload file
+
+# {collectionName~collectionAbbrev: coordload file name, ...}
+coordFileDict = {}
+
+# the set of collections found in 'inputFile', in input order
 collectionList = []
 
 # lookup of mouse markers with mirbase ids
 # {mgiID: [list of accession keys], ...}
 mirbaseDict = {}
 
+# accession keys to be deleted by purgeMirbase() in bulk mode
+purgeKeyList = []
+
+# timing and counts of each step (see coordMetrics.py)
+metrics = coordMetrics.Metrics('createInputFiles')
+
+# map the parsed-input cache, if it is there and current
+def openCache():
+    global cache
+
+    if useCache == 'true':
+        cache = coordCache.load(coordCacheFile, inputFile)
+
+# the rows of 'inputFile' after the header: (MGI ID, miRBase IDs,
+# collection~abbrev key, coordload line)
+def inputRows(fpInput):
+    if cache is not None:
+        for mgiID, mbIDs, key, start, length in cache.records(
+                ['mgiID', 'mirbaseID', 'collection', 'lineStart', 'lineLength']):
+            yield cache.string(mgiID), cache.string(mbIDs), cache.string(key), \
+                cache.text(start, length) + CRT
+        return
+
+    for r in fpInput:
+        # create list of columns
+        columnList = r.split(TAB)
+        if len(columnList) < 8:
+            sys.exit ('error in input line: %s' % r)
+
+        # US 175 - mgID column no multivalued. New requirement: delete 
+        # all 
+        mgiID = columnList[0].strip()
+        mbIDs = columnList[7].strip()
+
+        # the collection and abbrev
+        key = '%s~%s' % (columnList[5].strip(), columnList[6].strip())
+
+        # remove the collection and abbrev columns from the list
+        yield mgiID, mbIDs, key, TAB.join(columnList[:-2]) + CRT
+
 # (MGI ID:_Marker_key
 # US 35 - initialize lookup of markers with mirbase IDs
 def init():
@@ -99,24 +206,55 @@ def init():
     db.set_sqlUser(user)
     db.set_sqlPasswordFromFile(passwordFileName)
 
-    results = db.sql('''select a1._Accession_key as aKey, a2.accid as mgiID
-    from ACC_Accession a1, ACC_Accession a2
-    where a1._MGIType_key = 2
-    and a1._LogicalDB_key = 83
-    and a1._object_key = a2._object_key
-    and a2._MGIType_key = 2
-    and a2._LogicalDB_key = 1
-    and a2. preferred = 1
-    and a2.prefixPart = 'MGI:'
-    order by a2.accid
-        ''', 'auto')
-
-    for r in results:
-        mgiID = r['mgiID']
-        accessionKey = r['aKey']
-        if mgiID not in mirbaseDict:
-            mirbaseDict[mgiID] = []
-        mirbaseDict[mgiID].append(accessionKey)
+    index = mirbaseIndex.load(mirbaseIndexFile, mirbaseIndexMaxAge)
+
+    if index is None and mirbaseLookupScope == 'input':
+        # limit the lookup to the markers in the input file; nothing is
+        # purged yet, so a pool connection sees the same accessions
+        with coordDb.pool().connection() as conn:
+            stageInputIDs(conn)
+            index = mirbaseIndex.build(', %s i' % inputIdTable,
+                'and a2.accid = i.mgiID', conn)
+            metrics.countSql()
+    elif index is None:
+        index = mirbaseIndex.build()
+
+    for mgiID in index.byMgi:
+        mirbaseDict[mgiID] = [accessionKey for mbID, accessionKey in index.byMgi[mgiID]]
+    return
+
+# stage the distinct MGI IDs of 'inputFile' into a temp table of 'conn'
+# so the miRBase lookup in init() only returns the input markers; the
+# IDs are sent as parameters. The table goes away when the connection
+# is given back to the pool (rollback).
+def stageInputIDs(conn):
+    mgiIDs = set()
+
+    if cache is not None:
+        codes = set([r[0] for r in cache.records(['mgiID'])])
+        mgiIDs = set([cache.string(c) for c in codes])
+        mgiIDs.discard('')
+    else:
+        fpInput = open(inputFile, 'r')
+
+        # discard the header line
+        junk = fpInput.readline()
+        for r in fpInput:
+            mgiID = r.split(TAB, 1)[0].strip()
+            if mgiID != '':
+                mgiIDs.add(mgiID)
+        fpInput.close()
+
+    coordDb.execute(conn, 'create temporary table %s (mgiID text primary key)' % \
+        inputIdTable)
+
+    mgiIDs = sorted(mgiIDs)
+    coordDb.executeMany(conn, 'insert into %s values (%%s)' % inputIdTable,
+        [(m,) for m in mgiIDs], STAGE_CHUNK)
+
+    coordDb.execute(conn, 'analyze %s' % inputIdTable)
+    metrics.countSql(2 + (len(mgiIDs) + STAGE_CHUNK - 1) // STAGE_CHUNK)
+    print('Staged %s input MGI IDs for the miRBase lookup' % len(mgiIDs))
     return
 
 # US 35 - create assocload file for mirbase id/marker associations
@@ -132,82 +270,202 @@ def processMirbase(mgiID, mbIDs):
 
     if mgiID in mirbaseDict:
         aKeyList = mirbaseDict[mgiID]
-        for aKey  in aKeyList:
-            deleteAccession(aKey)
+        if mirbaseDeleteMode == 'bulk':
+            purgeKeyList.extend(aKeyList)
+        else:
+            for aKey  in aKeyList:
+                deleteAccession(aKey)
 
     # write out to assocload input file
     if mbIDs != '':
         fpMirbaseAssoc.write('%s%s%s%s' % (mgiID, TAB, mbIDs, CRT))
 
-    db.commit()
+    if mirbaseDeleteMode != 'bulk':
+        db.commit()
 
 def deleteAccession(aKey):
     print("Deleting _accession_key = %s" % aKey)
     db.sql('''delete from ACC_Accession
         where _Accession_key = %s''' % aKey, None)
 
+# bulk mode - delete all accession keys collected by processMirbase()
+#	      in chunks of 'mirbaseDeleteChunk'; the single commit is
+#	      done by main
+def purgeMirbase():
+    total = coordDb.deleteByKeys('ACC_Accession', '_Accession_key', \
+        purgeKeyList, mirbaseDeleteChunk, 'miRBase accessions')
+
+    print('Deleted %s miRBase accessions in total' % total)
+    metrics.get('purgeMirbase').rowsOut = total
+    sys.stdout.flush()
+
+# Bounded pool of open coordload files, one per collection.
+# When the pool is full the least recently used file is closed; it is
+# re-opened in append mode the next time its collection is seen, so rows
+# go straight to disk as they are read and memory does not grow with
+# the size of the input file.
+class CoordFilePool:
+
+    def __init__(self, maxOpen):
+        self.maxOpen = max(1, maxOpen)
+
+        # {collectionName~collectionAbbrev: file pointer, ...}
+        # ordered least to most recently used
+        self.openFiles = OrderedDict()
+
+    def write(self, key, line):
+        fp = self.openFiles.get(key)
+
+        if fp is None:
+            if len(self.openFiles) >= self.maxOpen:
+                lruKey, lruFp = self.openFiles.popitem(last=False)
+                lruFp.close()
+
+            # first time we see the collection - create the file
+            if key not in coordFileDict:
+                coordFileDict[key] = getCoordFileName(key)
+                collectionList.append(key)
+                mode = 'w'
+            else:
+                mode = 'a'
+
+            fp = open(coordFileDict[key], mode)
+            self.openFiles[key] = fp
+        else:
+            self.openFiles.move_to_end(key)
+
+        fp.write(line)
+
+    def closeFile(self, key):
+        fp = self.openFiles.pop(key, None)
+        if fp is not None:
+            fp.close()
+
+    def close(self):
+        for fp in self.openFiles.values():
+            fp.close()
+        self.openFiles.clear()
+
+# e.g. key: MGI QTL~MGI
+def getCoordFileName(key):
+    suffix = key.replace(' ', '_')
+    return '%s.%s' % (coordFileRoot, suffix)
+
+# count the rows of each collection~abbrev key of 'inputFile'
+def countCollections():
+    counts = {}
+
+    if cache is not None:
+        for (key,) in cache.records(['collection']):
+            counts[key] = counts.get(key, 0) + 1
+        return dict([(cache.string(key), n) for key, n in counts.items()])
+
+    fpInput = open(inputFile, 'r')
+
+    # discard the header line
+    junk = fpInput.readline()
+    for r in fpInput:
+        columnList = r.split(TAB)
+        if len(columnList) < 8:
+            continue
+        key = '%s~%s' % (columnList[5].strip(), columnList[6].strip())
+        counts[key] = counts.get(key, 0) + 1
+
+    fpInput.close()
+    return counts
+
+def openFileLists():
+    global fpCoordList, fpDeltaList
+
+    fpCoordList = open(coordFileListFile, 'w')
+    if coordDeltaListFile != '':
+        fpDeltaList = open(coordDeltaListFile, 'w')
+
+# the coordload file of collection 'c' is complete: reduce it to its
+# delta if asked, and list it for the wrapper, which passes each file
+# listed to the coordload
+def finishCollection(c):
+    fileName = coordFileDict[c]
+    finishedSet.add(c)
+
+    if coordDeltaLoad == 'true':
+        # the wrapper turns '_' back into ' '
+        collection = c.split('~')[0].replace('_', ' ')
+        isDelta, rows = coordDelta.reduceCollection(fileName, \
+            collection, build)
+        if isDelta:
+            # nothing changed - no need to run the coordload
+            if rows == 0:
+                return
+            if fpDeltaList is not None:
+                fpDeltaList.write(fileName + CRT)
+                fpDeltaList.flush()
+
+    fpCoordList.write(fileName + CRT)
+    fpCoordList.flush()
 
 # US 35 - input file now has 8 columns, the 8th being MiRBase ID, optional
 # US 175: column 8 now comma delimited list of miRBase IDs, optional
 def readInput():
-    global inputDict, collectionList
+    global coordFilePool, build
+
+    coordFilePool = CoordFilePool(maxOpenCoordFiles)
+
+    # rows still to be written per collection, when streaming
+    remainingDict = {}
+    if streamCoordFiles == 'true':
+        remainingDict = countCollections()
+        openFileLists()
 
     # open the input file
     fpInput = open(inputFile, 'r')
 
-    # discard the header line
-    junk = fpInput.readline()
-    for r in fpInput.readlines():
-        # create list of columns
-        columnList = r.split(TAB)
-        if len(columnList) < 8:
-            sys.exit ('error in input line: %s' % r)
+    # get the build from the header line
+    header = fpInput.readline()
+    for t in header.split(';'):
+        a = t.split('=')
+        if a[0].strip().lower() == 'build':
+            build = a[1].strip()
 
-        # US 175 - mgID column no multivalued. New requirement: delete 
-        # all 
-        mgiID = columnList[0].strip()
-        mbIDs = columnList[7].strip()
+    numRows = 0
+    for mgiID, mbIDs, key, line in inputRows(fpInput):
         processMirbase(mgiID, mbIDs)
 
-        # add the coordinates to dictionary by collectin and abbrev
-        # for later processing
-        collection = columnList[5].strip()
-        abbrev = columnList[6].strip()
-
-        key = '%s~%s' % (collection, abbrev)
+        # write the coordinates to the file for the collection and abbrev
+        coordFilePool.write(key, line)
+        numRows += 1
 
-        # remove the collection and abbrev columns from the list
-        columnList = columnList[:-2]
+        if key in remainingDict:
+            remainingDict[key] -= 1
+            if remainingDict[key] == 0:
+                coordFilePool.closeFile(key)
+                finishCollection(key)
 
-        if key not in inputDict:
-            inputDict[key] = []
-        inputDict[key].append(columnList)
+    fpInput.close()
 
-    # get the set of collections found in the input file
-    collectionList = list(inputDict.keys())
+    metrics.get('readInput').rowsIn = numRows
+    metrics.get('readInput').rowsOut = numRows
 
 def writeFiles():
-    fp1 = open(coordFileListFile, 'w')
+    if fpCoordList is None:
+        openFileLists()
 
     try:
+        # close the coordload files still open in the pool
+        coordFilePool.close()
+
+        # save the filenames of the collections not listed yet
         for c in collectionList:
-            # e.g. c: MGI QTL~MGI
-            suffix = c.replace(' ', '_')
-            fileName = '%s.%s' % (coordFileRoot, suffix)
-            fp2 = open(fileName, 'w')
-
-            try:
-                # save the filename to a file for access by the wrapper
-                # which will iterate through them passing to coordload
-                fp1.write(fileName + CRT)
-                coordList = inputDict[c]
-                for l in coordList:
-                    fp2.write('\t'.join(l) + CRT)
-            finally:
-                fp2.close()
+            if c not in finishedSet:
+                finishCollection(c)
 
     finally:
-        fp1.close()
+        fpCoordList.close()
+        if fpDeltaList is not None:
+            fpDeltaList.close()
+
+    metrics.get('writeFiles').bytesWritten = sum([os.path.getsize(coordFileDict[c]) \
+        for c in collectionList])
 
 def postprocess():
     global fpMirbaseAssoc
@@ -220,12 +478,30 @@ def postprocess():
 
 if __name__ == '__main__':
 
+    metrics.instrumentDb(db)
+    metrics.writeAtExit()
+
     db.useOneConnection(1)
     db.sql("begin transaction")
 
-    init()
-    readInput()
-    writeFiles()
+    with metrics.phase('openCache'):
+        openCache()
+    with metrics.phase('init'):
+        init()
+    with metrics.phase('readInput'):
+        readInput()
+    if mirbaseDeleteMode == 'bulk':
+        with metrics.phase('purgeMirbase'):
+            purgeMirbase()
+    with metrics.phase('writeFiles'):
+        writeFiles()
     postprocess()
+    if cache is not None:
+        cache.close()
+
+    with metrics.phase('commit'):
+        db.commit()
 
-    db.commit()
+    # the miRBase accessions have changed; the saved index is out of date
+    if mirbaseIndexFile != '' and os.path.exists(mirbaseIndexFile):
+        os.remove(mirbaseIndexFile)
@@ -0,0 +1,152 @@
+'''
+  Module: mirbaseIndex.py
+
+  Purpose: Index of the miRBase/marker associations in the database,
+           shared by mrkcoordQC.py and createInputFiles.py
+
+  Usage:
+        import mirbaseIndex
+
+        index = mirbaseIndex.build()
+        index = mirbaseIndex.build(fromClause, whereClause, conn)
+        index.byMgi[mgiID]      -> [(miRBase ID, accession key), ...]
+        index.symbols[mgiID]    -> marker symbol
+        index.byMb[miRBase ID]  -> [MGI ID, ...]
+
+        index.save(fileName)
+        index = mirbaseIndex.load(fileName, maxAge)
+
+  Assumes:
+        The caller has set up the db module. build() runs its query on
+        a psycopg2 connection instead when one is given (e.g. one of
+        coordDb.pool() that holds a temp table the query joins).
+
+        A saved index is only as current as the time it was built.
+        load() only returns an index built from the same server and
+        database within the last 'maxAge' seconds; createInputFiles.py
+        removes the file once it changes the miRBase accessions.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import os
+import time
+import db
+import coordDb
+
+TAB = '\t'
+NL = '\n'
+
+# first field of the header line of a saved index
+HEADER = '#mirbaseIndex'
+
+class MirbaseIndex:
+
+    def __init__(self, built = None):
+        # time the index was built, in seconds since the epoch
+        self.built = built or int(time.time())
+
+        # {mgiID: [(mbID, accession key), ...], ...}
+        self.byMgi = {}
+
+        # {mgiID: symbol, ...}
+        self.symbols = {}
+
+        # {mbID: [mgiID, ...], ...}
+        self.byMb = {}
+
+    #
+    # Purpose: Add one miRBase accession of a marker.
+    # Returns: Nothing
+    #
+    def add(self, mgiID, symbol, mbID, accessionKey):
+        self.byMgi.setdefault(mgiID, []).append((mbID, accessionKey))
+        self.symbols[mgiID] = symbol
+        self.byMb.setdefault(mbID, []).append(mgiID)
+        return
+
+    #
+    # Purpose: Write the index to a tab-delimited file.
+    # Returns: Nothing
+    #
+    def save(self, fileName):
+        tmpFileName = '%s.%s' % (fileName, os.getpid())
+        fp = open(tmpFileName, 'w')
+        fp.write(TAB.join([HEADER, db.get_sqlServer(), db.get_sqlDatabase(),
+            str(self.built)]) + NL)
+        for mgiID in sorted(self.byMgi):
+            for mbID, accessionKey in self.byMgi[mgiID]:
+                fp.write(TAB.join([mgiID, self.symbols[mgiID], mbID,
+                    str(accessionKey)]) + NL)
+        fp.close()
+        os.replace(tmpFileName, fileName)
+        return
+
+#
+# Purpose: Build the index with a single query.
+# Returns: MirbaseIndex
+# Assumes: 'fromClause' and 'whereClause' may restrict the markers; they
+#          refer to the marker's MGI ID accession as a2
+#
+def build(fromClause = '', whereClause = '', conn = None):
+    index = MirbaseIndex()
+
+    cmd = '''
+        select a1._Accession_key as aKey, a1.accid as mbID,
+            a2.accid as mgiID, m.symbol
+        from ACC_Accession a1, ACC_Accession a2, MRK_Marker m %s
+        where a1._MGIType_key = 2
+        and a1._LogicalDB_key = 83
+        and a1._object_key = a2._object_key
+        and a2._MGIType_key = 2
+        and a2._LogicalDB_key = 1
+        and a2.preferred = 1
+        and a2.prefixPart = 'MGI:'
+        and a1._object_key = m._marker_key
+        %s
+        order by a2.accid, a1._Accession_key
+        ''' % (fromClause, whereClause)
+
+    if conn is None:
+        results = db.sql(cmd, 'auto')
+    else:
+        results = coordDb.query(conn, cmd)
+
+    for r in results:
+        index.add(r['mgiID'], r['symbol'], r['mbID'], r['aKey'])
+
+    print('Built the miRBase index: %s markers, %s miRBase IDs' % \
+        (len(index.byMgi), len(index.byMb)))
+    return index
+
+#
+# Purpose: Read an index saved by MirbaseIndex.save().
+# Returns: MirbaseIndex, or None if the file does not exist, is for
+#          another server or database, or is older than 'maxAge' seconds
+#
+def load(fileName, maxAge):
+    if fileName == '' or not os.path.exists(fileName):
+        return None
+
+    fp = open(fileName, 'r')
+    header = fp.readline().rstrip(NL).split(TAB)
+    if len(header) != 4 or header[0] != HEADER or \
+            header[1] != db.get_sqlServer() or \
+            header[2] != db.get_sqlDatabase() or \
+            int(time.time()) - int(header[3]) > maxAge:
+        fp.close()
+        print('Not using the miRBase index %s' % fileName)
+        return None
+
+    index = MirbaseIndex(int(header[3]))
+    for line in fp:
+        mgiID, symbol, mbID, accessionKey = line.rstrip(NL).split(TAB)
+        index.add(mgiID, symbol, mbID, int(accessionKey))
+    fp.close()
+
+    print('Read the miRBase index %s: %s markers, %s miRBase IDs' % \
+        (fileName, len(index.byMgi), len(index.byMb)))
+    return index
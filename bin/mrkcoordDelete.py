@@ -20,6 +20,8 @@ import os
 import db
 import mgi_utils
 import loadlib
+import coordDb
+import coordMetrics
 
 #db.setTrace()
 
@@ -37,7 +39,16 @@ inputFile = os.environ['INPUTDIR']
 diagFile = ''
 errorFile = ''
 
-deleteSQL = ''
+# _feature_keys to delete; deleted ${DELETE_CHUNK_SIZE} at a time, each
+# chunk committed, ${DELETE_PAUSE} seconds apart, with a statement timeout
+# of ${DELETE_STATEMENT_TIMEOUT} milliseconds (0 = none)
+deleteKeyList = []
+deleteChunkSize = int(os.environ.get('DELETE_CHUNK_SIZE', '1000'))
+deletePause = float(os.environ.get('DELETE_PAUSE', '0.5'))
+deleteTimeout = int(os.environ.get('DELETE_STATEMENT_TIMEOUT', '0'))
+
+# timing and counts (see coordMetrics.py); not written for a preview
+metrics = coordMetrics.Metrics('mrkcoordDelete')
 
 # Purpose: prints error message and exits
 # Returns: nothing
@@ -116,6 +127,13 @@ def init():
     # Log all SQL
     db.set_sqlLogFunction(db.sqlLogAll)
 
+    # the deletes and their per-chunk commits run on one connection
+    db.useOneConnection(1)
+
+    metrics.instrumentDb(db)
+    if isSanityCheck == 0:
+        metrics.writeAtExit()
+
     diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
     diagFile.write('Server: %s\n' % (db.get_sqlServer()))
     diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
@@ -124,18 +142,18 @@ def init():
 
     return
 
-# Purpose:  processes data
-# Returns:  nothing
+# Purpose:  reads the (MGI ID, collection) pair of each line
+# Returns:  list of (line number, MGI ID, collection), and the line
+#           number and text of the first line without a collection
+#           (None, None if every line has one)
 # Assumes:  nothing
-# Effects:  verifies and processes each line in the input file
+# Effects:  stops reading at the first line without a collection
 # Throws:   nothing
-def processFile():
+def readPairs():
 
     global lineNum
-    global deleteSQL
-    global hasFatalError, hasWarningError
 
-    # For each line in the input file
+    pairList = []
 
     for line in inputFile.readlines():
 
@@ -151,15 +169,41 @@ def processFile():
             mgiId = tokens[0]
             collection = tokens[1]
         except:
-            exit(1, 'Invalid Line (%d): %s\n' % (lineNum, line))
-
-        results = db.sql('''
-            select ma.accid, m.symbol, ma._object_key, l.provider,
-                mcf._feature_key, mcf.startcoordinate, mcf.endcoordinate,
-                mcc._collection_key, mcc.name
-            from acc_accession ma, mrk_marker m, mrk_location_cache l, 
-                map_coord_feature mcf, map_coordinate mc, map_coord_collection mcc
-            where ma.accid = '%s'
+            return pairList, lineNum, line
+
+        pairList.append((lineNum, mgiId, collection))
+
+    return pairList, None, None
+
+# Purpose:  looks up the coordinate feature of each (MGI ID, collection)
+#           pair with one query: the distinct pairs are copied into a
+#           temp table that is joined to the marker and coordinate tables
+# Returns:  dictionary of _feature_key keyed by (MGI ID, collection);
+#           pairs with no feature are not in it
+# Assumes:  nothing
+# Effects:  the temp table is dropped when the connection is given back
+# Throws:   nothing
+def lookupFeatures(pairList):
+
+    featureDict = {}
+    pairs = sorted(set([(mgiId, collection) for n, mgiId, collection in pairList]))
+    if len(pairs) == 0:
+        return featureDict
+
+    with coordDb.pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('create temp table mrkcoorddelete_input (mgiID text, collection text)')
+        coordDb.copyIn(cursor, 'mrkcoorddelete_input', ['mgiID', 'collection'], pairs)
+        cursor.execute('analyze mrkcoorddelete_input')
+        cursor.close()
+        metrics.countSql(3)
+
+        results = coordDb.query(conn, '''
+            select i.mgiID, i.collection, mcf._feature_key
+            from mrkcoorddelete_input i, acc_accession ma, mrk_marker m, 
+                mrk_location_cache l, map_coord_feature mcf, map_coordinate mc, 
+                map_coord_collection mcc
+            where i.mgiID = ma.accid
             and ma._mgitype_key = 2
             and ma._logicaldb_key = 1
             and ma.preferred = 1
@@ -168,12 +212,40 @@ def processFile():
             and mcf._mgitype_key = 2
             and mcf._map_key = mc._map_key
             and mc._collection_key = mcc._collection_key
-            and mcc.name = '%s'
+            and mcc.name = i.collection
             and ma._object_key = l._marker_key
-            ''' % (mgiId, collection), 'auto')
+            ''')
+        metrics.countSql()
+
+        coordDb.execute(conn, 'drop table mrkcoorddelete_input')
+        metrics.countSql()
+
+    # the first feature found for a pair is deleted
+    for r in results:
+        featureDict.setdefault((r['mgiID'], r['collection']), r['_feature_key'])
+
+    return featureDict
 
-        if len(results) == 0:
-            errorFile.write('Invalid Mapping Coordinate (row %d) %s %s\n' % (lineNum, mgiId, collection))
+# Purpose:  processes data
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  verifies and processes each line in the input file
+# Throws:   nothing
+def processFile():
+
+    global hasFatalError, hasWarningError
+
+    # all lines are looked up at once; the lines before a line without a
+    # collection are still verified and reported before the exit
+    pairList, badLineNum, badLine = readPairs()
+    featureDict = lookupFeatures(pairList)
+
+    for n, mgiId, collection in pairList:
+
+        key = featureDict.get((mgiId, collection))
+
+        if key is None:
+            errorFile.write('Invalid Mapping Coordinate (row %d) %s %s\n' % (n, mgiId, collection))
             hasFatalError += 1
 
         # if no errors, process
@@ -184,16 +256,26 @@ def processFile():
         if hasFatalError > 0:
             continue
 
-        key = results[0]['_feature_key']
-        deleteSQL = deleteSQL + ''' delete from MAP_Coord_Feature where _feature_key = %s;\n ''' % (key)
-        #print(results)
+        deleteKeyList.append(key)
+        metrics.get('processFile').rowsOut += 1
 
-    #	end of "for line in inputFile.readlines():"
+    if badLineNum is not None:
+        exit(1, 'Invalid Line (%d): %s\n' % (badLineNum, badLine))
 
-    if deleteSQL != "":
-        db.setTrace()
-        db.sql(deleteSQL, None)
-        db.commit()
+    metrics.get('processFile').rowsIn = lineNum
+
+    if len(deleteKeyList) > 0:
+        # a chunk that fails (e.g. times out) is rolled back; the chunks
+        # before it stay committed
+        try:
+            total = coordDb.deleteByKeys('MAP_Coord_Feature', '_feature_key', \
+                deleteKeyList, deleteChunkSize, 'coordinate features', \
+                commit = True, pause = deletePause, timeout = deleteTimeout)
+        except Exception as e:
+            errorFile.write('Cannot delete the coordinate features: %s\n' % str(e).strip())
+            hasFatalError += 1
+            exit(1, 'Cannot delete the coordinate features: %s\n' % str(e).strip())
+        print('Deleted %s coordinate features in total' % total)
 
     return
 
@@ -202,6 +284,7 @@ def processFile():
 #
 
 init()
-processFile()
+with metrics.phase('processFile'):
+    processFile()
 exit(0)
 
@@ -2,28 +2,180 @@
 # Program: mrkcoordDeleteAuto.py
 #
 # use same SQL as the qcreports_db/MRK_C4AM_GeneModel.py
-# select _feature_key for each Marker Feature Coorindate that exists for Collection 131,256,257:
+# select _feature_key for each Marker Feature Coorindate that exists for the
+# collections in ${DELETE_AUTO_COLLECTIONS} (default 131,256,257):
 #   131/MGI, 256/MGI Curation, 257/gff3blat
 #
-# and contains a Marker/Gene Model for:
+# and contains a Marker/Gene Model for the logical DBs in
+# ${DELETE_AUTO_LOGICALDBS} (default 223,222,60,59):
 #   223/VISTA Enhancer Element, 222/Ensembl Regulatory Feature, 60/Ensembl Gene Model, 59/NCBI Gene Model
 #
-# delete MAP_Coord_Feature based on _feature_key
+# delete MAP_Coord_Feature based on _feature_key, ${DELETE_CHUNK_SIZE} keys
+# per statement, each chunk committed, ${DELETE_PAUSE} seconds apart, with a
+# statement timeout of ${DELETE_STATEMENT_TIMEOUT} milliseconds (0 = none)
+#
+# Usage: mrkcoordDeleteAuto.py [--server] [--preview]
+#
+#   --server   delete the features with one DELETE ... USING ... RETURNING
+#              on the server, in one transaction, instead of selecting them
+#              to the client (each row printed) and deleting them in chunks
+#
+#   --preview  delete nothing; count the features that would be deleted
+#
+# With --server or --preview, the number of features per collection and
+# per gene model logical DB is written to ${DELETE_AUTO_SUMMARY_FILE}
+# instead of the rows being printed.
 #
 
 import sys
 import os
 import db
+import mgi_utils
+import coordDb
+import coordMetrics
+
+USAGE = 'Usage: mrkcoordDeleteAuto.py [--server] [--preview]'
 
 db.setTrace()
 
-results = db.sql('''
-select mcf._feature_key, mcf._Object_key as markerKey, a.accid as mgiID, m.symbol, 
+deleteChunkSize = int(os.environ.get('DELETE_CHUNK_SIZE', '1000'))
+deletePause = float(os.environ.get('DELETE_PAUSE', '0.5'))
+deleteTimeout = int(os.environ.get('DELETE_STATEMENT_TIMEOUT', '0'))
+
+collectionKeys = [int(k) for k in \
+    os.environ.get('DELETE_AUTO_COLLECTIONS', '131,256,257').split(',')]
+logicalDBKeys = [int(k) for k in \
+    os.environ.get('DELETE_AUTO_LOGICALDBS', '223,222,60,59').split(',')]
+summaryFileName = os.environ.get('DELETE_AUTO_SUMMARY_FILE',
+    'mrkcoordDeleteAuto.summary.txt')
+
+keyParams = {'collections' : collectionKeys, 'logicalDBs' : logicalDBKeys}
+
+# the features to delete: MAP_Coord_Feature mcf joined to these tables, with
+# this condition (the gene model is checked with 'exists', so a feature
+# whose marker has several gene models is one row)
+FEATURE_TABLES = 'MAP_Coordinate mc, ACC_Accession a, MRK_Marker m'
+
+FEATURE_WHERE = '''mcf._Map_key = mc._Map_key
+and mc._Collection_key = any(%(collections)s)
+and mcf._Object_key = a._Object_key
+and a._MGIType_key = 2
+and a._LogicalDB_key = 1
+and a.preferred = 1
+and a.prefixPart = 'MGI:'
+and mcf._Object_key = m._Marker_key
+and exists (select 1 from ACC_Accession gm, ACC_LogicalDB l
+    where a._Object_key = gm._Object_key
+    and gm._mgitype_key = 2
+    and gm._logicaldb_key = any(%(logicalDBs)s)
+    and gm._Logicaldb_key = l._logicaldb_key)'''
+
+# number of features per collection and per gene model logical DB of the
+# 'matched' rows (_feature_key, _object_key, _collection_key)
+SUMMARY_SELECT = '''
+select 'collection' as kind, mcc.name, count(distinct d._feature_key) as features
+from matched d, MAP_Coord_Collection mcc
+where d._collection_key = mcc._Collection_key
+group by mcc.name
+union all
+select 'logicaldb' as kind, l.name, count(distinct d._feature_key) as features
+from matched d, ACC_Accession gm, ACC_LogicalDB l
+where d._object_key = gm._Object_key
+and gm._mgitype_key = 2
+and gm._logicaldb_key = any(%(logicalDBs)s)
+and gm._Logicaldb_key = l._logicaldb_key
+group by l.name
+order by kind, name
+'''
+
+# timing and counts (see coordMetrics.py)
+metrics = coordMetrics.Metrics('mrkcoordDeleteAuto')
+metrics.instrumentDb(db)
+
+# Purpose: Write the counts of the summary query.
+# Returns: total number of features
+# Assumes: nothing
+# Effects: writes ${DELETE_AUTO_SUMMARY_FILE}
+# Throws: nothing
+def writeSummary(results, isPreview):
+    total = sum([r['features'] for r in results if r['kind'] == 'collection'])
+
+    fp = open(summaryFileName, 'w')
+    fp.write('Marker Coordinate Auto Delete (%s)\n' % \
+        (isPreview and 'preview, nothing deleted' or 'deleted'))
+    fp.write('Date: %s\n' % mgi_utils.date())
+    fp.write('Collection keys: %s\n' % ','.join(map(str, collectionKeys)))
+    fp.write('Logical DB keys: %s\n\n' % ','.join(map(str, logicalDBKeys)))
+
+    for kind, title in (('collection', 'Collection'),
+            ('logicaldb', 'Gene Model Logical DB')):
+        fp.write('%s\tFeatures\n' % title)
+        for r in results:
+            if r['kind'] == kind:
+                fp.write('%s\t%s\n' % (r['name'], r['features']))
+        fp.write('\n')
+
+    fp.write('Total features: %s\n' % total)
+    fp.write('(a feature whose marker has gene models of several logical DBs\n')
+    fp.write(' is counted for each of them)\n')
+    fp.close()
+
+    print('%s %s features; see %s' % \
+        (isPreview and 'Would delete' or 'Deleted', total, summaryFileName))
+    return total
+
+# Purpose: Count, or delete, the features on the server.
+# Returns: nothing
+# Assumes: nothing
+# Effects: without 'isPreview', deletes the features in one transaction
+# Throws: nothing
+def runServer(isPreview):
+    if isPreview:
+        cmd = '''with matched as (
+            select mcf._feature_key, mcf._object_key, mc._collection_key
+            from MAP_Coord_Feature mcf, %s
+            where %s)''' % (FEATURE_TABLES, FEATURE_WHERE)
+    else:
+        cmd = '''with matched as (
+            delete from MAP_Coord_Feature mcf
+            using %s
+            where %s
+            returning mcf._feature_key, mcf._object_key, mc._collection_key)''' % \
+            (FEATURE_TABLES, FEATURE_WHERE)
+
+    with metrics.phase(isPreview and 'preview' or 'delete') as p:
+        with coordDb.pool().connection() as conn:
+            if deleteTimeout > 0:
+                coordDb.execute(conn, 'set statement_timeout = %s', (deleteTimeout,))
+            results = coordDb.query(conn, cmd + SUMMARY_SELECT, keyParams)
+            metrics.countSql()
+            if not isPreview:
+                conn.commit()
+        p.rowsOut = writeSummary(results, isPreview)
+
+    return
+
+# Purpose: Select the features to the client, print them and delete them
+#          in chunks.
+# Returns: nothing
+# Assumes: nothing
+# Effects: deletes the features
+# Throws: nothing
+def runClient():
+    # the features are streamed from a server-side cursor, ${DB_FETCH_SIZE}
+    # rows at a time, instead of being read into memory at once
+    deleteKeyList = []
+
+    with metrics.phase('select') as p:
+        conn = coordDb.pool().get()
+        metrics.countSql()
+        for r in coordDb.stream(conn, '''
+select mcf._feature_key, mcf._Object_key as markerKey, a.accid as mgiID, m.symbol,
     mcc.name, gm.accid as gmID, gm._logicaldb_key, l.name
-from MAP_Coord_Feature mcf, MAP_Coordinate mc, MAP_Coord_Collection mcc, ACC_Accession a, 
+from MAP_Coord_Feature mcf, MAP_Coordinate mc, MAP_Coord_Collection mcc, ACC_Accession a,
     MRK_Marker m, ACC_Accession gm, ACC_LogicalDB l
 where mcf._Map_key = mc._Map_key
-and mc._Collection_key in (131,256,257)
+and mc._Collection_key = any(%(collections)s)
 and mc._Collection_key = mcc._Collection_key
 and mcf._Object_key = a._Object_key
 and a._MGIType_key = 2
@@ -33,17 +185,42 @@ and a.prefixPart = 'MGI:'
 and mcf._Object_key = m._Marker_key
 and a._Object_key = gm._Object_key
 and gm._mgitype_key = 2
-and gm._logicaldb_key in (223,222,60,59)
+and gm._logicaldb_key = any(%(logicalDBs)s)
 and gm._Logicaldb_key = l._logicaldb_key
-''', 'auto')
+''', keyParams):
+            print(r)
+            deleteKeyList.append(r['_feature_key'])
+        coordDb.pool().put(conn)
+        p.rowsOut = len(deleteKeyList)
+
+    with metrics.phase('delete') as p:
+        p.rowsOut = coordDb.deleteByKeys('MAP_Coord_Feature', '_feature_key', \
+            deleteKeyList, deleteChunkSize, 'coordinate features', \
+            commit = True, pause = deletePause, timeout = deleteTimeout)
+        print('Deleted %s coordinate features in total' % p.rowsOut)
+
+    return
+
+#
+# Main
+#
+
+options = sys.argv[1:]
+if [o for o in options if o not in ('--server', '--preview')]:
+    print(USAGE)
+    sys.exit(1)
+
+isPreview = '--preview' in options
 
-deleteSQL = ''
-for r in results:
-        print(r)
-        deleteSQL += ''' delete from MAP_Coord_Feature where _feature_key = %s;\n''' % (r['_feature_key'])
+if not isPreview:
+    metrics.writeAtExit()
 
-if deleteSQL != "":
-    db.sql(deleteSQL, None)
-    db.commit()
+# the deletes and their per-chunk commits run on one connection
+db.useOneConnection(1)
 
+if isPreview or '--server' in options:
+    runServer(isPreview)
+else:
+    runClient()
 
+db.useOneConnection(0)
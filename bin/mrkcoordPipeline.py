@@ -0,0 +1,413 @@
+#
+#  mrkcoordPipeline.py
+###########################################################################
+#
+#  Purpose:
+#
+#      Run the steps of the load that follow the QC reports as a
+#      dependency graph instead of one after another:
+#
+#          createInputFiles.py --(each collection file, once complete)-->
+#              coordload of the collection (runCoordload.sh)
+#
+#          createInputFiles.py --(successful exit)-->
+#              miRBase association load (${ASSOCLOADER_SH})
+#
+#      so a collection is loaded as soon as createInputFiles.py has
+#      written its file, and the association load runs alongside the
+#      coordloads. The window is the longest path through the graph
+#      instead of the sum of the steps.
+#
+#  Usage:
+#
+#      mrkcoordPipeline.py
+#
+#  Env Vars:
+#
+#      The configuration file is sourced and the following are exported
+#      by mrkcoordload.sh:
+#
+#      CONFIG_LOAD
+#      COORD_VERSION
+#      JOBKEY
+#      MAX_PARALLEL_COORDLOADS
+#
+#      and, from the configuration file:
+#
+#      COORD_FILES
+#      COORD_FINGERPRINT_FILE
+#      COORD_PIPELINE_STATUS
+#      INPUT_FILE_DEFAULT
+#      MIRBASE_ASSOC_FILE
+#      ASSOCLOADER_SH
+#      ASSOCLOADCONFIG
+#
+#  Inputs:
+#
+#      - The coordload files listed in ${COORD_FILES} by createInputFiles.py,
+#        which is run with COORD_STREAM_FILES=true so it lists each file as
+#        soon as the last row of its collection is written
+#
+#  Outputs:
+#
+#      - Status file (${COORD_PIPELINE_STATUS}) with a line per step: the
+#        tab-delimited step, exit status, duration in seconds and message,
+#        createInputFiles.py first, then the coordloads in the order their
+#        files were listed, then the association load. mrkcoordload.sh
+#        calls checkStatus for each line. A step that did not run because
+#        an earlier step failed has exit status 1.
+#
+#      - Metrics (${METRICS_DIR}): the wall time of each step as a phase
+#
+#  Exit Codes:
+#
+#      0:  The steps ran; their exit status is in the status file
+#      1:  An exception occurred
+#
+#  Assumes:
+#
+#      Once a step fails no other step is started, as checkStatus would
+#      stop the sequential load there; the steps running are waited for.
+#      When coordloads run in parallel (MAX_PARALLEL_COORDLOADS > 1) a
+#      failed coordload does not stop the other collections, as with
+#      xargs in the sequential load.
+#
+#      A collection may be loaded before createInputFiles.py commits its
+#      miRBase accession purge; the coordload does not touch those rows.
+#
+#      Steps done according to the checkpoint journal (see coordJournal.py)
+#      are not run again: if createInputFiles.py is done, the coordloads of
+#      the files it listed start at once. A step skipped has no line in
+#      the status file.
+#
+###########################################################################
+
+import sys
+import os
+import time
+import subprocess
+import coordMetrics
+import coordJournal
+
+#
+#  CONSTANTS
+#
+TAB = '\t'
+NL = '\n'
+
+# seconds between checks of the running steps and of ${COORD_FILES}
+POLL_SECONDS = 0.2
+
+# the order of the step groups in the status file
+GROUP_ORDER = ['createInputFiles', 'coordload', 'assocload']
+
+#
+#  GLOBALS
+#
+binDir = os.path.join(os.environ['MRKCOORDLOAD'], 'bin')
+python = os.environ.get('PYTHON', sys.executable)
+outputDir = os.environ['OUTPUTDIR']
+logDir = os.environ['LOGDIR']
+coordFileListFile = os.environ['COORD_FILES']
+statusFileName = os.environ['COORD_PIPELINE_STATUS']
+maxParallel = int(os.environ.get('MAX_PARALLEL_COORDLOADS', '1'))
+
+# steps in the order they were added
+stepList = []
+
+# true = a step failed; no other step is started
+stopped = False
+
+# metrics of the run (see coordMetrics.py)
+metrics = coordMetrics.Metrics('mrkcoordPipeline')
+
+#
+# A program run by the pipeline.
+#
+class Step:
+
+    def __init__(self, name, group, command, env = None, statusFile = None):
+        self.name = name
+        self.group = group
+        self.command = command
+        self.env = env
+
+        # status file the program writes (runCoordload.sh); its exit
+        # status, duration and message are used instead of the program's
+        self.statusFile = statusFile
+
+        # log of the program, if it writes one of its own
+        self.logFile = None
+
+        self.process = None
+        self.start = None
+        self.status = None
+        self.duration = 0
+        self.message = name
+
+    def isRunning(self):
+        return self.process is not None and self.status is None
+
+    #
+    # Purpose: Start the program.
+    # Returns: Nothing
+    #
+    def run(self):
+        print('%s%sRunning %s' % (time.ctime(), NL, self.name))
+        sys.stdout.flush()
+        self.start = time.monotonic()
+        self.process = subprocess.Popen(self.command, env = self.env)
+        return
+
+    #
+    # Purpose: Check whether the program has finished.
+    # Returns: true if it finished since the last check
+    # Effects: sets status, duration and message when it has finished
+    #
+    def poll(self):
+        if not self.isRunning() or self.process.poll() is None:
+            return False
+
+        self.status = self.process.returncode
+        self.duration = int(time.monotonic() - self.start)
+        if self.statusFile is not None:
+            self.readStatusFile()
+        metrics.get(self.name).wall = time.monotonic() - self.start
+        return True
+
+    #
+    # Purpose: Read the exit status, duration and message the program
+    #          wrote to its status file.
+    # Returns: Nothing
+    #
+    def readStatusFile(self):
+        if not os.path.exists(self.statusFile):
+            self.status = 1
+            self.message = '%s did not complete' % self.message
+            return
+
+        fp = open(self.statusFile, 'r')
+        fields = fp.readline().rstrip(NL).split(TAB)
+        fp.close()
+        self.status = int(fields[0])
+        self.duration = int(fields[1])
+        self.message = fields[2]
+        return
+
+#
+# Purpose: Create the step that loads a coordload file.
+# Returns: Step
+#
+def coordloadStep(fileName):
+    # same naming as runCoordload.sh
+    suffix = os.path.basename(fileName).split('.')[1]
+    collection = suffix.split('~')[0].replace('_', ' ')
+
+    step = Step(collection, 'coordload',
+        [os.path.join(binDir, 'runCoordload.sh'), fileName],
+        statusFile = os.path.join(outputDir, os.path.basename(fileName) + '.status'))
+    step.message = '%s mrkcoordload java load' % collection
+    step.logFile = os.path.join(logDir, 'mrkcoordload.%s.log' % suffix)
+    return step
+
+#
+# Reads the coordload files createInputFiles.py lists in ${COORD_FILES}
+# while it runs; only complete lines are returned.
+#
+class FileListReader:
+
+    def __init__(self, fileName, changedFiles):
+        self.fileName = fileName
+        self.offset = 0
+        self.buffer = ''
+
+        # None = every file is loaded, else the files of the collections
+        # whose fingerprint changed
+        self.changedFiles = changedFiles
+
+    #
+    # Purpose: Read the files listed since the last call.
+    # Returns: list of file names to load
+    #
+    def read(self):
+        if not os.path.exists(self.fileName):
+            return []
+
+        fp = open(self.fileName, 'r')
+        fp.seek(self.offset)
+        data = fp.read()
+        self.offset = fp.tell()
+        fp.close()
+
+        lines = (self.buffer + data).split(NL)
+        self.buffer = lines.pop()
+
+        fileList = []
+        for f in lines:
+            if f.strip() == '':
+                continue
+            if self.changedFiles is not None and f not in self.changedFiles:
+                print('Collection unchanged, skipping: %s' % f)
+                continue
+            fileList.append(f)
+        return fileList
+
+#
+# Purpose: Whether the miRBase association file has associations.
+# Returns: boolean
+#
+def hasAssociations():
+    return coordMetrics.countLines(os.environ['MIRBASE_ASSOC_FILE']) > 1
+
+#
+# Purpose: Start the association load, unless it is done.
+# Returns: Nothing
+#
+def startAssocload():
+    if coordJournal.isDone('assocload'):
+        print('Association load already done - skipping')
+        return
+
+    assocStep = Step('association load', 'assocload',
+        [os.environ['ASSOCLOADER_SH'], os.environ['CONFIG_LOAD'],
+         os.environ['ASSOCLOADCONFIG']])
+    assocStep.message = os.environ['ASSOCLOADER_SH']
+    stepList.append(assocStep)
+    assocStep.run()
+    return
+
+#
+# Purpose: A step has finished; report it, record it in the journal and
+#          stop the pipeline if it failed.
+# Returns: Nothing
+#
+def finished(step):
+    global stopped
+
+    if step.group == 'coordload':
+        print('%s mrkcoordload: exit status %s, %s seconds (see %s)' % \
+            (step.name, step.status, step.duration, step.logFile))
+    else:
+        print('%s%s%s: exit status %s, %s seconds' % \
+            (time.ctime(), NL, step.name, step.status, step.duration))
+    sys.stdout.flush()
+
+    # runCoordload.sh records the coordloads itself
+    if step.status == 0 and step.group != 'coordload':
+        coordJournal.done(step.group)
+
+    if step.status == 0:
+        return
+
+    # parallel coordloads go on without the failed collection
+    if step.group == 'coordload' and maxParallel > 1:
+        return
+
+    stopped = True
+    return
+
+#
+# Purpose: Start the coordloads that can run.
+# Returns: Nothing
+#
+def startCoordloads():
+    running = len([s for s in stepList if s.group == 'coordload' and s.isRunning()])
+    for step in stepList:
+        if stopped or running >= maxParallel:
+            return
+        if step.group == 'coordload' and step.process is None:
+            step.run()
+            running += 1
+    return
+
+#
+# Purpose: Write the status of each step.
+# Returns: Nothing
+#
+def writeStatusFile():
+    fp = open(statusFileName, 'w')
+    for group in GROUP_ORDER:
+        for step in stepList:
+            if step.group != group:
+                continue
+            if step.status is None:
+                step.status = 1
+                step.message = '%s did not run' % step.message
+            fp.write('%s%s%s%s%s%s%s%s' % (step.name, TAB, step.status, TAB,
+                step.duration, TAB, step.message, NL))
+    fp.close()
+    return
+
+#
+# Purpose: Run the steps.
+# Returns: Nothing
+#
+def run():
+    changedFiles = None
+    if os.environ.get('COORD_FINGERPRINT_FILE', '') != '':
+        import coordFingerprint
+        changedFiles = coordFingerprint.changedFiles(os.environ['INPUT_FILE_DEFAULT'])
+
+    print('Running the coordloads, %s at a time' % maxParallel)
+
+    if coordJournal.isDone('createInputFiles'):
+        # the list and the association file are complete
+        print('createInputFiles.py already done - skipping')
+        createStep = None
+        if hasAssociations():
+            startAssocload()
+    else:
+        # the list is written again by this run's createInputFiles.py
+        if os.path.exists(coordFileListFile):
+            os.remove(coordFileListFile)
+
+        env = dict(os.environ)
+        env['COORD_STREAM_FILES'] = 'true'
+        createStep = Step('createInputFiles', 'createInputFiles',
+            [python, os.path.join(binDir, 'createInputFiles.py')], env = env)
+        createStep.message = os.path.join(binDir, 'createInputFiles.py')
+        stepList.append(createStep)
+        createStep.run()
+
+    reader = FileListReader(coordFileListFile, changedFiles)
+    doneSet = coordJournal.readJournal()[1]
+
+    while True:
+        changed = False
+
+        for step in list(stepList):
+            if not step.poll():
+                continue
+            finished(step)
+            changed = True
+
+            # the association file and the miRBase purge are complete
+            if step is createStep and step.status == 0 and hasAssociations():
+                startAssocload()
+
+        # createInputFiles.py lists its last files just before it exits
+        for fileName in reader.read():
+            if ('coordload', fileName) in doneSet:
+                print('Collection already loaded, skipping: %s' % fileName)
+                continue
+            stepList.append(coordloadStep(fileName))
+            changed = True
+
+        startCoordloads()
+
+        if not [s for s in stepList if s.isRunning()]:
+            break
+
+        if not changed:
+            time.sleep(POLL_SECONDS)
+
+    writeStatusFile()
+    return
+
+#
+# Main
+#
+if __name__ == '__main__':
+    metrics.writeAtExit()
+    run()
+    sys.exit(0)
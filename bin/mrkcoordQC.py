@@ -18,6 +18,14 @@
 #      MGD_DBUSER
 #      MGD_DBPASSWORDFILE
 #      TEMP_TABLE
+#      QC_ENGINE
+#      QC_QUERY_PARALLEL
+#      QC_VALIDATE_BLOCK
+#      MIRBASE_INDEX_FILE
+#      COORD_CACHE
+#      COORD_CACHE_FILE
+#      INPUT_FILE_BCP
+#      QC_WRITE_BCP
 #      INVALID_MARKER_RPT
 #      SEC_MARKER_RPT
 #	   INVALID_CHR_RPT
@@ -31,6 +39,7 @@
 #	   SOURCE_DISPLAY_RPT
 #	   BUILD_RPT
 #	   RPT_NAMES_RPT
+#      QC_SUMMARY_FILE
 #	   INPUT_FILE_LOAD
 #
 #      The following environment variable is set by the wrapper script:
@@ -53,8 +62,8 @@
 #
 #  Outputs:
 #
-#      - BCP file (${FILE_BCP}) for loading the coordinate file
-#        into a temp table
+#      - BCP file (${INPUT_FILE_BCP}) of the rows loaded into the temp
+#        table, only when ${QC_WRITE_BCP} is true (for debugging)
 #
 #      - QC report (${INVALID_MARKER_RPT})
 #      - QC report (${SEC_MARKER_RPT})
@@ -69,7 +78,13 @@
 #      - QC report (${SOURCE_DISPLAY_RPT})
 #      - QC report (${BUILD_RPT})
 #      - QC report (${RPT_NAMES_RPT})
+#      - A JSON-lines twin of each QC report (.jsonl) and a JSON summary
+#        of the reports (${QC_SUMMARY_FILE})
 #      - Load-ready input file (${INPUT_FILE_LOAD})
+#      - miRBase index (${MIRBASE_INDEX_FILE}), on a live run
+#      - Parsed-input cache (${COORD_CACHE_FILE}) of the input file and
+#        the load-ready file, on a live run with COORD_CACHE=true (see
+#        coordCache.py)
 #
 #  Exit Codes:
 #
@@ -79,11 +94,9 @@
 #
 #  Assumes:
 #
-#      This script assumes that the wrapper script has already created the
-#      tables in tempdb for loading the input records into. The table
-#      name is defined by the environment variable ${TEMP_TABLE}.
-#      The wrapper script will also take care of
-#      dropping the table after this script terminates.
+#      Nothing. The temp table for the input records is created by this
+#      script as an unlogged table named ${TEMP_TABLE}_<pid>_<time>, so
+#      concurrent runs do not share it, and dropped when it exits.
 #
 #  Implementation:
 #
@@ -92,11 +105,18 @@
 #      1) Validate the arguments to the script.
 #      2) Perform initialization steps.
 #      3) Open the input/output files.
-#      4) Load the records from the input file into the temp table.
-#      5) Generate the QC reports.
+#      4) Load the records from the input file into the temp table,
+#         streaming them into a COPY as they are read.
+#      5) Generate the QC reports. With QC_ENGINE=memory, steps 4 and 5
+#         use qcEngine.py: the checks run against lookups for the input
+#         MGI IDs instead of queries on the temp table. Otherwise, with
+#         QC_QUERY_PARALLEL > 1, the report queries that do not depend
+#         on each other run concurrently before the reports are written.
 #      6) Close the input/output files.
 #      7) If this is a "live" run, create the load-ready coordinate file
-#         from the coordinates that do not have any discrepancies.
+#         from the coordinates that do not have any discrepancies, and
+#         with COORD_CACHE=true the parsed-input cache createInputFiles.py
+#         reads instead of it.
 #
 #  Notes:  None
 #
@@ -113,10 +133,22 @@
 
 import sys
 import os
+import time
+import errno
+import array
+import atexit
+import signal
 import string
 import re
 import mgi_utils
 import db
+import qcEngine
+import coordDb
+import mirbaseIndex
+import coordCache
+import qcReports
+import coordMetrics
+import coordValidator
 
 #
 #  CONSTANTS
@@ -126,20 +158,37 @@ NL = '\n'
 
 USAGE = 'mrkcoordQC.py coordinate_file'
 
+# columns of the temp table
+TEMP_COLUMNS = ['mgiID', 'chromosome', 'startCoordinate', 'endCoordinate',
+    'strand', 'provider', 'display', 'mirbaseID', 'buildValue']
+
 #
 #  GLOBALS
 #
 user = os.environ['MGD_DBUSER']
 passwordFileName = os.environ['MGD_DBPASSWORDFILE']
 
-bcpCommand = os.environ['PG_DBUTILS'] + '/bin/bcpin.csh'
-
 liveRun = os.environ['LIVE_RUN']
 
 coordBCPFile = os.environ['INPUT_FILE_BCP']
-coordTempTable = os.environ['TEMP_TABLE']
+
+# true = also write the rows loaded into the temp table to the bcp file,
+# for debugging
+writeBCP = os.environ.get('QC_WRITE_BCP', 'false')
+# unique per run
+coordTempTable = '%s_%s_%s' % (os.environ['TEMP_TABLE'], os.getpid(), int(time.time()))
 coordLoadFile = os.environ['INPUT_FILE_LOAD']
 
+# sql or memory (see qcEngine.py)
+qcEngineMode = os.environ.get('QC_ENGINE', 'sql')
+
+# number of connections running the report queries at once (sql engine)
+queryParallel = int(os.environ.get('QC_QUERY_PARALLEL', '1'))
+
+# number of input records whose coordinates and strands are validated
+# at once (see coordValidator.py)
+validateBlockSize = int(os.environ.get('QC_VALIDATE_BLOCK', '50000'))
+
 invMrkRptFile = os.environ['INVALID_MARKER_RPT']
 secMrkRptFile = os.environ['SEC_MARKER_RPT']
 invChrRptFile =  os.environ['INVALID_CHR_RPT']
@@ -168,14 +217,17 @@ invChrList = ["' '"]
 
 timestamp = mgi_utils.date()
 
-errorCount = 0
-errorReportNames = []
+# the QC reports; each counts its own errors and warnings (see
+# qcReports.py)
+reports = qcReports.Registry(timestamp)
 
-warningCount = 0
-warningReportNames = []
+# JSON summary of the reports, for tools that read the results
+qcSummaryFile = os.environ.get('QC_SUMMARY_FILE', '')
+
+# timing and counts of each phase and report (see coordMetrics.py)
+metrics = coordMetrics.Metrics('mrkcoordQC')
 
 fatalErrorCount = 0
-coordErrorCount = 0
 
 # MGI IDs that did not pass muster and will be removed
 # from the load-ready file
@@ -192,6 +244,32 @@ mb2mgiInDbDict = {} # {mbID:[mgiID1, mgiID2: ...], ...}
 # MGI Ids in the input mapped to their miRBase associations
 mgi2mbInDbDict = {} # {mgiID:[symbol, mbID1, mbID2, ...], ...}
 
+# miRBase/marker associations in the database (see mirbaseIndex.py),
+# saved to ${MIRBASE_INDEX_FILE} on a live run for createInputFiles.py
+mirbaseIndexFile = os.environ.get('MIRBASE_INDEX_FILE', '')
+mirbaseIdx = None
+
+# byte offset of the end of the header line and of each input line, and
+# the MGI ID of each input line, recorded on a live run to create the
+# load-ready file (see createCoordLoadFile)
+headerEnd = 0
+lineEnds = array.array('q')
+lineMGIIDs = []
+
+# parsed-input cache (see coordCache.py) written on a live run for
+# createInputFiles.py when COORD_CACHE is true
+useCache = os.environ.get('COORD_CACHE', 'false')
+coordCacheFile = os.environ.get('COORD_CACHE_FILE', '')
+cacheWriter = None
+
+# false once os.copy_file_range is found not to work for these files
+useCopyFileRange = hasattr(os, 'copy_file_range')
+
+# input rows that would be loaded into the temp table, and the check
+# results, when QC_ENGINE=memory
+qcRows = []
+qcResults = {}
+
 #
 # Purpose: Validate the arguments to the script.
 # Returns: Nothing
@@ -223,7 +301,78 @@ def init ():
 
     db.set_sqlUser(user)
     db.set_sqlPasswordFromFile(passwordFileName)
+    db.useOneConnection(1)
+
+    metrics.instrumentDb(db)
+    metrics.writeAtExit()
+
+    return
+
+#
+# Purpose: Create the temp table for this run and have it dropped when the
+#          script exits.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Creates ${TEMP_TABLE}_<pid>_<time>. Indexes are created by
+#          indexTempTable() after the load.
+# Throws: Nothing
+#
+def createTempTable ():
+    print('Create the temp table: ' + coordTempTable)
+    sys.stdout.flush()
+
+    db.sql('''
+        create unlogged table %s (
+            mgiID text not null,
+            chromosome text null,
+            startCoordinate float null,
+            endCoordinate float null,
+            strand char(1) null,
+            provider text not null,
+            display text not null,
+            mirbaseID text null,
+            buildValue text not null
+        )
+        ''' % coordTempTable, None)
+    db.commit()
+
+    atexit.register(dropTempTable)
+
+    # sys.exit on SIGTERM so the table is dropped
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+    return
 
+#
+# Purpose: Index and analyze the temp table after it is loaded, so the
+#          report queries are planned with its statistics.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def indexTempTable ():
+    db.sql(['create index %s_idx_mgiID on %s (mgiID)' % (coordTempTable, coordTempTable),
+            'create index %s_idx_chromosome on %s (chromosome)' % (coordTempTable, coordTempTable),
+            'analyze %s' % coordTempTable], None)
+    db.commit()
+    return
+
+#
+# Purpose: Drop the temp table.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Rolls back the open transaction first, which may have been
+#          aborted by the error the script is exiting on
+# Throws: Nothing
+#
+def dropTempTable ():
+    print('Drop the temp table: ' + coordTempTable)
+    try:
+        db.rollback()
+        db.sql('drop table if exists %s' % coordTempTable, None)
+        db.commit()
+    except Exception as e:
+        print('Cannot drop the temp table: %s: %s' % (coordTempTable, e))
     return
 
 #
@@ -235,16 +384,13 @@ def init ():
 #
 def openFiles ():
     global fpCoord, fpCoordBCP
-    global fpInvMrkRpt, fpSecMrkRpt, fpInvChrRpt, fpChrDiscrepRpt
-    global fpInvCoordStrandRpt, fpNonMirnaMrkRpt, fpMirbaseDeleteRpt
-    global fpDupMirbaseIdRpt, fpMirbaseOtherMrkRpt, fpSourceDisplayRpt
-    global fpBuildRpt, fpRptNamesRpt, fpMirbaseInvalidIdRpt
+    global fpRptNamesRpt
 
     #
     # Open the input files.
     #
     try:
-        fpCoord = open(coordFile, 'r')
+        fpCoord = open(coordFile, 'rb')
     except:
         print('Cannot open input file: ' + coordFile)
         sys.exit(1)
@@ -252,75 +398,24 @@ def openFiles ():
     #
     # Open the output files.
     #
-    try:
-        fpCoordBCP = open(coordBCPFile, 'w')
-    except:
-        print('Cannot open output file: ' + coordBCPFile)
-        sys.exit(1)
+    fpCoordBCP = None
+    if writeBCP == 'true':
+        try:
+            fpCoordBCP = open(coordBCPFile, 'w')
+        except:
+            print('Cannot open output file: ' + coordBCPFile)
+            sys.exit(1)
 
     #
-    # Open the report files.
+    # Register the reports and make sure they can be written.
     #
-    try:
-        fpInvMrkRpt = open(invMrkRptFile, 'a')
-    except:
-        print('Cannot open report file: ' + invMrkRptFile)
-        sys.exit(1)
-    try:
-        fpSecMrkRpt = open(secMrkRptFile, 'a')
-    except:
-        print('Cannot open report file: ' + secMrkRptFile)
-        sys.exit(1)
-    try:
-        fpInvChrRpt = open(invChrRptFile, 'a')
-    except:
-        print('Cannot open report file: ' + invChrRptFile)
-        sys.exit(1)
-    try:
-        fpChrDiscrepRpt = open(chrDiscrepRptFile, 'a')
-    except:
-        print('Cannot open report file: ' + chrDiscrepRptFile)
-        sys.exit(1)
-    try:
-        fpInvCoordStrandRpt = open(invCoordStrandRptFile, 'a')
-    except:
-        print('Cannot  open report file: ' + invCoordStrandRptFile)
-        sys.exit(1)
-    try:
-        fpNonMirnaMrkRpt = open(nonMirnaMrkRptFile, 'a')
-    except:
-        print('Cannot  open report file: ' + nonMirnaMrkRptFile)
-        sys.exit(1)
-    try:
-        fpMirbaseDeleteRpt = open(mirbaseDeleteRptFile, 'a')
-    except:
-        print('Cannot  open report file: ' + mirbaseDeleteRptFile)
-        sys.exit(1)
-    try:
-        fpDupMirbaseIdRpt = open(dupMirbaseIdRptFile, 'a')
-    except:
-        print('Cannot  open report file: ' + dupMirbaseIdRptFile)
-        sys.exit(1)
-    try:
-        fpMirbaseOtherMrkRpt = open(mirbaseOtherMrkRptFile, 'a')
-    except:
-        print('Cannot  open report file: ' + mirbaseOtherMrkRptFile)
-        sys.exit(1)
-    try:
-        fpMirbaseInvalidIdRpt = open(mirbaseInvalidIdRptFile, 'w')
-    except:
-        print('Cannot  open report file: ' + mirbaseInvalidIdRptFile)
-        sys.exit(1)
-    try:
-        fpSourceDisplayRpt = open(sourceDisplayRptFile, 'a')
-    except:
-        print('Cannot  open report file: ' + sourceDisplayRptFile)
-        sys.exit(1)
-    try:
-        fpBuildRpt = open(buildRptFile, 'a')
-    except:
-        print('Cannot  open report file: ' + buildRptFile)
-        sys.exit(1)
+    registerReports()
+    for r in reports.reports.values():
+        try:
+            open(r.fileName, r.mode).close()
+        except:
+            print('Cannot open report file: ' + r.fileName)
+            sys.exit(1)
     try:
         fpRptNamesRpt = open(rptNamesFile, 'a')
     except:
@@ -329,65 +424,124 @@ def openFiles ():
     return
 
 #
-# Purpose: Close the files.
+# Purpose: Register the QC reports, declaring the columns of each.
 # Returns: Nothing
 # Assumes: Nothing
 # Effects: Nothing
 # Throws: Nothing
 #
+def registerReports ():
+
+    reports.add(qcReports.Report('invMarker', invMrkRptFile,
+        'Invalid Marker Report', 110,
+        [('mgiID', 'MGI ID', 12), ('name', 'Associated Object', 20),
+         ('status', 'Marker Status', 20), ('reason', 'Reason', 30)]))
+
+    reports.add(qcReports.Report('secMarker', secMrkRptFile,
+        'Secondary Marker Report', 108,
+        [('mgiID', 'Secondary MGI ID', 16), ('symbol', 'Marker Symbol', 50),
+         ('accID', 'Primary MGI ID', 16)]))
+
+    reports.add(qcReports.Report('invChr', invChrRptFile,
+        'Invalid Chromosome Report', 96,
+        [('mgiID', 'MGI ID', 20), ('symbol', 'Marker Symbol', 50),
+         ('chromosome', 'Invalid Chr', 10)],
+        rule = 20*'-' + '  ' + 50*'-' + '  ' + 10*'-' + '  '))
+
+    reports.add(qcReports.Report('chrDiscrep', chrDiscrepRptFile,
+        'Chromosome Discrepancy Report', 96,
+        [('load', 'Load?', 5), ('mgiID', 'MGI ID', 20),
+         ('symbol', 'Marker Symbol', 50), ('mChr', 'Marker Chr', 10),
+         ('fChr', 'Feature Chr', 10)],
+        rowFormat = '%(load)s    %(mgiID)-20s  %(symbol)-50s  %(mChr)-10s  %(fChr)-10s'))
+
+    reports.add(qcReports.Report('invCoordStrand', invCoordStrandRptFile,
+        'Invalid Coordinate and Strand Report', 110,
+        [('mgiID', 'MGI ID', 12), ('start', 'Start Coordinate', 20),
+         ('end', 'End Coordinate', 20), ('strand', 'Strand', 10),
+         ('provider', 'Provider', 20), ('reason', 'Reason', 30)]))
+
+    reports.add(qcReports.Report('nonMirna', nonMirnaMrkRptFile,
+        'Non-miRNA Marker Report', 108,
+        [('mgiID', 'MGI ID', 16), ('term', 'Feature Type', 50),
+         ('mirbaseID', 'miRBase ID', 16)]))
+
+    reports.add(qcReports.Report('mirbaseDelete', mirbaseDeleteRptFile,
+        'miRBase/Marker Deletion Report', 108,
+        [('mgiID', 'Input MGI ID', 16), ('symbol', 'Input Symbol', 16),
+         ('added', 'miRBase/Marker Associations To Be Added', 60),
+         ('deleted', 'miRBase/Marker Associations To Be Deleted', 60)]))
+
+    reports.add(qcReports.Report('dupMirbaseId', dupMirbaseIdRptFile,
+        'Duplicate miRBase ID Report', 108,
+        [('mirbaseID', 'Input miRBase ID', 16),
+         ('mgiIDs', 'Associated MGI IDs', 50)],
+        header = '%-16s  %-40s' % ('Input miRBase ID', 'Associated MGI IDs')))
+
+    reports.add(qcReports.Report('mirbaseOtherMrk', mirbaseOtherMrkRptFile,
+        'miRBase IDs in the Input Associated with Different Markers in MGI Report', 108,
+        [('mirbaseID', 'Input miRBase ID', 16),
+         ('inputMgiIDs', 'Input MGI IDs', 40),
+         ('dbMgiIDs', 'Database MGI IDs', 40)]))
+
+    # no title; written by the script, not cleared by the wrapper
+    reports.add(qcReports.Report('mirbaseInvalidId', mirbaseInvalidIdRptFile,
+        None, 0, [('mgiID', '', 0), ('mirbaseIDs', '', 0)],
+        rowFormat = '%(mgiID)s\t%(mirbaseIDs)s', header = '', rule = '',
+        mode = 'w'))
+
+    reports.add(qcReports.Report('sourceDisplay', sourceDisplayRptFile,
+        'Source/Display in Input, not in Database', 110,
+        [('sourceDisplay', '', 0)],
+        rowFormat = '%(sourceDisplay)s', header = '', rule = ''))
+
+    reports.add(qcReports.Report('build', buildRptFile,
+        'Build Report', 110,
+        [('build', 'Build Value Not in Database', 0)],
+        rowFormat = '%(build)s', rule = 30*'-'))
+
+    return
+
+#
+# Purpose: Close the files.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Writes the QC reports
+# Throws: Nothing
+#
 def closeFiles ():
-    global fpCoord, fpInvMrkRpt, fpSecMrkRpt, fpChrDiscrepRpt, fpInvChrRpt
-    global fpInvCoordStrandRpt, fpSourceDisplayRpt, fpBuildRpt
+    global fpCoord
 
     fpCoord.close()
-    fpInvMrkRpt.close()
-    fpSecMrkRpt.close()
-    fpInvChrRpt.close()
-    fpChrDiscrepRpt.close()
-    fpInvCoordStrandRpt.close()
-    fpNonMirnaMrkRpt.close()
-    fpMirbaseDeleteRpt.close()
-    fpDupMirbaseIdRpt.close()
-    fpMirbaseOtherMrkRpt.close()
-    fpMirbaseInvalidIdRpt.close()
-    fpSourceDisplayRpt.close()
-    fpBuildRpt.close()
+    with metrics.phase('writeReports'):
+        for r in reports.reports.values():
+            metrics.get(r.name).bytesWritten += r.flush()
     return
 
 #
-# Purpose: Load the data from the input files into the temp tables.
-#          This function also reports invalid start/end/strand as
-#          we can't load characters into the integer columns.
-# Returns: Nothing
+# Purpose: Read the records from the coordinate input file and perform
+#          the miRBase ID checks. Invalid miRBase IDs are reported here.
+# Returns: generator of (input line number, temp table column values)
+#          for the records that pass
 # Assumes: All columns exist
 # Effects: Nothing
 # Throws: Nothing
 #
+def parsedRecords ():
+    global fatalErrorCount
 
-def loadTempTables ():
-    global build, mb2mgiInInputDict, header, fpMirbaseInvalidIdRpt, fatalErrorCount
-
-    print('Create a bcp file from the coordinate input file')
-    sys.stdout.flush()
-
-    #
-    # Read each record from the coordinate input file, perform validation
-    # checks and write them to a bcp file.
-    #
-    
-    # set the global header value; remove any tabs, preserve newline
-    header = '%s\n' % fpCoord.readline().strip() 
-
-    tokens = header.split(';')
-    for t in tokens:
-        a = t.split('=')
-        if a[0].strip().lower() == 'build':
-            build = a[1].strip()
-    count = 1
-    writeInvcoordStrandHeader()
-    for line in fpCoord.readlines():
+    lineNum = 1
+    lineEnd = headerEnd
+    for rawLine in fpCoord:
+        lineNum += 1
+        line = rawLine.decode()
         tokens = re.split(TAB, line[:-1])
         mgiID = tokens[0].strip()
+
+        if liveRun == "1":
+            lineEnd += len(rawLine)
+            lineEnds.append(lineEnd)
+            lineMGIIDs.append(mgiID)
         chromosome = tokens[1].strip()
         startCoordinate = tokens[2].strip()
         endCoordinate = tokens[3].strip()
@@ -396,6 +550,15 @@ def loadTempTables ():
         display = tokens[6].strip()
         miRBaseID = tokens[7].strip()
 
+        if cacheWriter is not None:
+            # createInputFiles.py reads the last line whole, with or
+            # without a newline
+            if line.endswith(NL):
+                mbField = miRBaseID
+            else:
+                mbField = line.split(TAB)[7].strip()
+            cacheWriter.add(rawLine, mgiID, '%s~%s' % (source, display), mbField)
+
         badIdList = []
         if miRBaseID != '':
             for id in str.split(miRBaseID, ','):
@@ -406,7 +569,8 @@ def loadTempTables ():
             if badIdList:
                 # report, go to next line
                 print('bad MiRBase Ids: %s' % ', '.join(badIdList))
-                fpMirbaseInvalidIdRpt.write('%s%s%s%s' % (mgiID, TAB, ', '.join(badIdList,), NL))
+                reports['mirbaseInvalidId'].addRow(
+                    {'mgiID' : mgiID, 'mirbaseIDs' : ', '.join(badIdList)})
 
                 fatalErrorCount += 1
                 continue
@@ -414,80 +578,184 @@ def loadTempTables ():
         #print 'sourceDisplay: %s' % sourceDisplay
         if not sourceDisplay in sourceDisplayList:
             sourceDisplayList.append(sourceDisplay)
-        errors = createInvCoordStrandReport(mgiID, startCoordinate, endCoordinate, strand, source)
-        if errors != 0:
+
+        yield lineNum, [mgiID, chromosome, startCoordinate, endCoordinate,
+                        strand, source, display, miRBaseID, build]
+
+    metrics.get('loadTempTables').rowsIn = lineNum - 1
+
+#
+# Purpose: Validate the coordinates and strands of a block of records
+#          at once and report the invalid ones, in input order.
+# Returns: generator of the (input line number, record) pairs that pass
+# Assumes: Nothing
+# Effects: Writes each record that passes to the bcp file when
+#          ${QC_WRITE_BCP} is true
+# Throws: Nothing
+#
+def checkBlock (block):
+    masks = coordValidator.validate({
+        'start' : [r[2] for n, r in block],
+        'end' : [r[3] for n, r in block],
+        'strand' : [r[4] for n, r in block],
+        })
+
+    for (lineNum, record), mask in zip(block, masks):
+        if mask != 0:
+            createInvCoordStrandReport(record[0], record[2], record[3],
+                record[4], record[5], mask)
             continue
 
-        fpCoordBCP.write(mgiID + TAB + chromosome + TAB +
-                     startCoordinate + TAB + endCoordinate + TAB +
-                      strand + TAB + source + TAB + display + TAB +
-                      miRBaseID + TAB + build + NL)
-        count += 1
+        if fpCoordBCP:
+            fpCoordBCP.write(TAB.join(record) + NL)
 
-    writeInvcoordStrandFooter()
+        yield lineNum, record
 
-    #
-    # Close the bcp file.
-    #
-    fpCoordBCP.close()
+#
+# Purpose: Read and validate the records from the coordinate input file.
+#          Invalid miRBase IDs, coordinates and strands are reported here
+#          as we can't load characters into the integer columns.
+# Returns: generator of (input line number, temp table column values)
+#          for the records that pass
+# Assumes: All columns exist
+# Effects: The coordinates are validated ${QC_VALIDATE_BLOCK} records at
+#          a time
+# Throws: Nothing
+#
+def validRecords ():
+    block = []
+    for lineNum, record in parsedRecords():
+        block.append((lineNum, record))
+        if len(block) >= validateBlockSize:
+            yield from checkBlock(block)
+            block = []
+    yield from checkBlock(block)
 
-    #
-    # Load the temp tables with the input data.
-    #
-    print('Load the coordinate data into the temp table: ' + coordTempTable)
+#
+# Purpose: Load the data from the input files into the temp tables.
+#          The validated records are streamed into a COPY on a
+#          connection of their own while the input file is read.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Exits with 1 if the COPY fails, after reporting the input
+#          line it failed on.
+# Throws: Nothing
+#
 
-    bcpCmd = '%s %s %s %s "/" %s "\\t" "\\n" mgd' % \
-        (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), coordTempTable, coordBCPFile)
+def loadTempTables ():
+    global build, header, headerEnd, cacheWriter
 
-    print('bcp cmd = %s' % bcpCmd)
+    # set the global header value; remove any tabs, preserve newline
+    rawHeader = fpCoord.readline()
+    headerEnd = len(rawHeader)
+    if liveRun == "1" and useCache == 'true' and coordCacheFile != '':
+        cacheWriter = coordCache.Writer()
+    header = '%s\n' % rawHeader.decode().strip() 
+
+    tokens = header.split(';')
+    for t in tokens:
+        a = t.split('=')
+        if a[0].strip().lower() == 'build':
+            build = a[1].strip()
+    writeInvcoordStrandHeader()
+
+    if qcEngineMode == 'memory':
+        for lineNum, record in validRecords():
+            qcRows.append({'mgiID' : record[0], 'chromosome' : record[1],
+                'mirbaseID' : record[7]})
+        metrics.get('loadTempTables').rowsOut = len(qcRows)
+        writeInvcoordStrandFooter()
+        closeBCPFile()
+        return
+
+    createTempTable()
+
+    print('Load the coordinate data into the temp table: ' + coordTempTable)
     sys.stdout.flush()
 
-    rc = os.system(bcpCmd)
-    if rc != 0:
+    # input line number and MGI ID of each row copied, to report errors
+    copiedList = []
+
+    def copyRows():
+        for lineNum, record in validRecords():
+            copiedList.append((lineNum, record[0]))
+            # empty fields load as null, as they did with bcp
+            yield [v if v != '' else None for v in record]
+
+    conn = coordDb.connect()
+    try:
+        metrics.countSql()
+        count = coordDb.copyIn(conn.cursor(), coordTempTable, TEMP_COLUMNS, copyRows())
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        copyLine = coordDb.copyErrorLine(e)
+        if copyLine is not None and copyLine <= len(copiedList):
+            lineNum, mgiID = copiedList[copyLine - 1]
+            print('Cannot load input line %s (%s): %s' % (lineNum, mgiID, str(e).strip()))
+        else:
+            print('Cannot load the temp table: %s' % str(e).strip())
         closeFiles()
         sys.exit(1)
+    conn.close()
 
-    return
-
-def writeInvcoordStrandHeader():
-    print('Create the invalid coordinate and strand report')
-    fpInvCoordStrandRpt.write(str.center('Invalid Coordinate and Strand Report',110) + NL)
-    fpInvCoordStrandRpt.write(str.center('(' + timestamp + ')',110) + 2*NL)
-    fpInvCoordStrandRpt.write('%-12s  %-20s  %-20s  %-10s  %-20s  %-30s%s' %
-                     ('MGI ID','Start Coordinate','End Coordinate', 'Strand', 'Provider','Reason',NL))
-    fpInvCoordStrandRpt.write(12*'-' + '  ' + 20*'-' + '  ' + 20*'-' + '  ' + \
-                      10*'-' + '  ' + 20*'-' + '  ' + 30*'-' + NL)
-    return
+    print('Loaded %s rows into %s' % (count, coordTempTable))
+    metrics.get('loadTempTables').rowsOut = count
+    indexTempTable()
+    writeInvcoordStrandFooter()
+    closeBCPFile()
 
-def writeInvcoordStrandFooter():
-    fpInvCoordStrandRpt.write(NL + 'Number of Rows: ' + str(coordErrorCount) + NL)
     return
 
 #
-# Purpose: Create the invalid marker report.
+# Purpose: Close the bcp file, if one is written.
 # Returns: Nothing
 # Assumes: Nothing
 # Effects: Nothing
 # Throws: Nothing
 #
-def createInvMarkerReport ():
-    global errorCount, errorReportNames, badMGIIDs
+def closeBCPFile ():
+    if fpCoordBCP:
+        fpCoordBCP.close()
+    return
 
-    print('Create the invalid marker report')
-    fpInvMrkRpt.write(str.center('Invalid Marker Report',110) + NL)
-    fpInvMrkRpt.write(str.center('(' + timestamp + ')',110) + 2*NL)
-    fpInvMrkRpt.write('%-12s  %-20s  %-20s  %-30s%s' %
-                     ('MGI ID','Associated Object',
-                      'Marker Status','Reason',NL))
-    fpInvMrkRpt.write(12*'-' + '  ' +  20*'-' + '  ' + 20*'-' + '  ' + 30*'-' + NL)
+#
+# Purpose: Evaluate the database checks in memory (QC_ENGINE=memory).
+# Returns: Nothing
+# Assumes: loadTempTables() has collected the input rows
+# Effects: Sets global qcResults, read by the report functions in place
+#          of their queries, and mirbaseIdx, scoped to the input.
+# Throws: Nothing
+#
+def runQcEngine ():
+    global qcResults, mirbaseIdx
 
-    #
-    # Find any MGI IDs from the coordinate file that:
-    # 1) Do not exist in the database.
-    # 2) Exist for a non-marker object. (Exclude annotation evidence)
-    # 3) Exist for a marker, but the status is not official (withdrawn or reserved)
-    #
-    results = db.sql('''
+    print('Evaluate the QC checks in memory for %s rows' % len(qcRows))
+    sys.stdout.flush()
+
+    engine = qcEngine.MemoryEngine(qcRows)
+    metrics.countSql(engine.fetchLookups(list(mb2mgiInInputDict.keys())))
+    qcResults = engine.evaluate()
+
+    # the miRBase reports use the engine's index of the input's markers
+    # and miRBase IDs (createInputFiles.py only looks up input markers)
+    mirbaseIdx = engine.mirbaseIdx
+    if liveRun == "1" and mirbaseIndexFile != '':
+        mirbaseIdx.save(mirbaseIndexFile)
+    return
+
+#
+# Purpose: Build the report queries that do not depend on the results of
+#          another report.
+# Returns: dictionary of SQL keyed by report
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def reportQueries ():
+    return {
+        'invMarker' : '''
                 (
                 select tmp.mgiID,
                        null as name,
@@ -528,7 +796,138 @@ def createInvMarkerReport ():
                       m._Marker_Status_key = ms._Marker_Status_key 
                 )
                 order by mgiID
-                ''' % (coordTempTable, coordTempTable, coordTempTable), 'auto')
+                ''' % (coordTempTable, coordTempTable, coordTempTable),
+
+        'secMarker' : '''
+        select tmp.mgiID, m.symbol, a2.accID 
+        from %s tmp, ACC_Accession a1, ACC_Accession a2, MRK_Marker m
+        where tmp.mgiID = a1.accID 
+        and a1._MGIType_key = 2 
+        and a1._LogicalDB_key = 1 
+        and a1.preferred = 0 
+        and a1._Object_key = a2._Object_key 
+        and a2._MGIType_key = 2 
+        and a2._LogicalDB_key = 1 
+        and a2.preferred = 1 
+        and a2._Object_key = m._Marker_key
+        order by mgiID
+        ''' % (coordTempTable),
+
+        'invChr' : '''
+        select tc.mgiID, tc.chromosome, tc.mgiID, m.symbol
+        from %s tc, ACC_Accession a, MRK_Marker m
+        where tc.mgiID = a.accID
+        and a._MGIType_key = 2
+        and a._LogicalDB_key = 1
+        and a.preferred = 1
+        and a._Object_key = m._Marker_key
+        and tc.chromosome not in (select mc.chromosome
+                    from MRK_Chromosome mc
+                    where mc._Organism_key = 1
+                    and mc.chromosome != 'UN')
+        order by mgiID
+        ''' % (coordTempTable),
+
+        'nonMirna' : '''
+        select tc.mgiID, tc.mirbaseID, m.term 
+        from %s tc, ACC_Accession a, MRK_MCV_Cache m
+        where tc.mirbaseID like '%%MI%%'
+        and tc.mgiID = a.accID
+        and a._MGIType_key = 2
+        and a._LogicalDB_key = 1
+        and a.preferred = 1
+        and a._Object_key = m._Marker_key 
+        and m.qualifier = 'D'
+        and m.term != 'miRNA gene'
+        order by mgiID
+        ''' % (coordTempTable),
+
+        'inputMirbase' : '''select mgiID, mirbaseID from %s''' % coordTempTable,
+
+        'sourceDisplay' : '''select distinct name, abbreviation from MAP_Coord_Collection''',
+
+        'build' : '''select distinct version from MAP_Coordinate''',
+        }
+
+#
+# Purpose: Run the independent report queries at once on
+#          ${QC_QUERY_PARALLEL} connections that share one snapshot.
+# Returns: Nothing
+# Assumes: The temp table is loaded and committed
+# Effects: Sets global qcResults. The reports are still written one at
+#          a time, in the same order, from these results.
+# Throws: Nothing
+#
+def prefetchReports ():
+    global qcResults
+
+    queries = reportQueries()
+    print('Run %s report queries on %s connections' % (len(queries), queryParallel))
+    sys.stdout.flush()
+
+    metrics.countSql(len(queries))
+    qcResults = coordDb.snapshotQueries(queries, queryParallel)
+    return
+
+#
+# Purpose: Build the miRBase index once for the miRBase reports.
+# Returns: mirbaseIndex.MirbaseIndex
+# Assumes: Nothing
+# Effects: On a live run, saves the index to ${MIRBASE_INDEX_FILE} for
+#          createInputFiles.py
+# Throws: Nothing
+#
+def getMirbaseIndex ():
+    global mirbaseIdx
+
+    if mirbaseIdx is None:
+        mirbaseIdx = mirbaseIndex.build()
+        if liveRun == "1" and mirbaseIndexFile != '':
+            mirbaseIdx.save(mirbaseIndexFile)
+    return mirbaseIdx
+
+#
+# Purpose: Get the results of a report query: from the in-memory engine
+#          or the prefetch when they ran, else by running the query.
+# Returns: list of result rows
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def getResults (name):
+    if name in qcResults:
+        return qcResults[name]
+    return db.sql(reportQueries()[name], 'auto')
+
+def writeInvcoordStrandHeader():
+    print('Create the invalid coordinate and strand report')
+    return
+
+def writeInvcoordStrandFooter():
+    rpt = reports['invCoordStrand']
+    rpt.addFooter(NL + 'Number of Rows: ' + str(rpt.errors))
+    return
+
+#
+# Purpose: Create the invalid marker report.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def createInvMarkerReport ():
+    global badMGIIDs
+
+    print('Create the invalid marker report')
+    rpt = reports['invMarker']
+
+    #
+    # Find any MGI IDs from the coordinate file that:
+    # 1) Do not exist in the database.
+    # 2) Exist for a non-marker object. (Exclude annotation evidence)
+    # 3) Exist for a marker, but the status is not official (withdrawn or reserved)
+    #
+    results = getResults('invMarker')
 
     #
     # Write the records to the report.
@@ -550,8 +949,8 @@ def createInvMarkerReport ():
         else:
             reason = 'Marker status is invalid'
 
-        fpInvMrkRpt.write('%-12s  %-20s  %-20s  %-30s%s' %
-            (mgiID,  objectType, markerStatus, reason, NL))
+        rpt.addRow({'mgiID' : mgiID, 'name' : objectType,
+            'status' : markerStatus, 'reason' : reason})
 
         #
         # If this is a live run of the load, maintain a list of MGI IDs that
@@ -564,12 +963,8 @@ def createInvMarkerReport ():
                 badMGIIDs[mgiID] = ''
 
     numErrors = len(results)
-    fpInvMrkRpt.write(NL + 'Number of Rows: ' + str(numErrors) + NL)
-
-    errorCount += numErrors
-    if numErrors > 0:
-        if not invMrkRptFile in errorReportNames:
-            errorReportNames.append(invMrkRptFile + NL)
+    rpt.addFooter(NL + 'Number of Rows: ' + str(numErrors))
+    rpt.error(numErrors)
     return
 
 
@@ -581,34 +976,16 @@ def createInvMarkerReport ():
 # Throws: Nothing
 #
 def createSecMarkerReport ():
-    global errorCount, errorReportNames, badMGIIDs
+    global badMGIIDs
 
     print('Create the secondary marker report')
-    fpSecMrkRpt.write(str.center('Secondary Marker Report',108) + NL)
-    fpSecMrkRpt.write(str.center('(' + timestamp + ')',108) + 2*NL)
-    fpSecMrkRpt.write('%-16s  %-50s  %-16s%s' %
-                     ('Secondary MGI ID',
-                      'Marker Symbol','Primary MGI ID',NL))
-    fpSecMrkRpt.write(16*'-' + '  ' + 50*'-' + '  ' + 16*'-' + NL)
+    rpt = reports['secMarker']
 
     #
     # Find any MGI IDs from the coordinate file that are secondary IDs
     # for a marker.
     #
-    results = db.sql('''
-        select tmp.mgiID, m.symbol, a2.accID 
-        from %s tmp, ACC_Accession a1, ACC_Accession a2, MRK_Marker m
-        where tmp.mgiID = a1.accID 
-        and a1._MGIType_key = 2 
-        and a1._LogicalDB_key = 1 
-        and a1.preferred = 0 
-        and a1._Object_key = a2._Object_key 
-        and a2._MGIType_key = 2 
-        and a2._LogicalDB_key = 1 
-        and a2.preferred = 1 
-        and a2._Object_key = m._Marker_key
-        order by mgiID
-        ''' % (coordTempTable), 'auto')
+    results = getResults('secMarker')
 
     #
     # Write the records to the report.
@@ -616,7 +993,7 @@ def createSecMarkerReport ():
     for r in results:
         mgiID = r['mgiID']
 
-        fpSecMrkRpt.write('%-16s  %-50s  %-16s%s' % (mgiID, r['symbol'], r['accID'], NL))
+        rpt.addRow({'mgiID' : mgiID, 'symbol' : r['symbol'], 'accID' : r['accID']})
 
         #
         # If this is a live run of the load, maintain a list of MGI IDs that
@@ -629,12 +1006,8 @@ def createSecMarkerReport ():
                 badMGIIDs[mgiID] = ''
 
     numErrors = len(results)
-    fpSecMrkRpt.write(NL + 'Number of Rows: ' + str(numErrors) + NL)
-
-    errorCount += numErrors
-    if numErrors > 0:
-        if not secMrkRptFile in errorReportNames:
-            errorReportNames.append(secMrkRptFile + NL)
+    rpt.addFooter(NL + 'Number of Rows: ' + str(numErrors))
+    rpt.error(numErrors)
     return
 
 #
@@ -645,32 +1018,16 @@ def createSecMarkerReport ():
 # Throws: Nothing
 #
 def createInvChrReport ():
-    global errorCount, errorReportNames, invChrList, badMGIIDs
+    global invChrList, badMGIIDs
 
     print('Create the invalid chromosome report')
-    fpInvChrRpt.write(str.center('Invalid Chromosome Report',96) + NL)
-    fpInvChrRpt.write(str.center('(' + timestamp + ')',96) + 2*NL)
-    fpInvChrRpt.write('%-20s  %-50s  %-10s%s' % ('MGI ID', 'Marker Symbol', 'Invalid Chr', NL))
-    fpInvChrRpt.write(20*'-' + '  ' + 50*'-' + '  ' + 10*'-' + '  ' + NL)
+    rpt = reports['invChr']
 
     #
     # Find any cases where the feature chromosome is not a valid
     # mouse chromosome
     #
-    results = db.sql('''
-        select tc.mgiID, tc.chromosome, tc.mgiID, m.symbol
-        from %s tc, ACC_Accession a, MRK_Marker m
-        where tc.mgiID = a.accID
-        and a._MGIType_key = 2
-        and a._LogicalDB_key = 1
-        and a.preferred = 1
-        and a._Object_key = m._Marker_key
-        and tc.chromosome not in (select mc.chromosome
-                    from MRK_Chromosome mc
-                    where mc._Organism_key = 1
-                    and mc.chromosome != 'UN')
-        order by mgiID
-        ''' % (coordTempTable), 'auto')
+    results = getResults('invChr')
 
     #
     # Write the records to the report.
@@ -678,7 +1035,8 @@ def createInvChrReport ():
     for r in results:
         mgiID = r['mgiID']
         invChrList.append('"%s"' % r['chromosome'])
-        fpInvChrRpt.write('%-20s  %-50s  %-10s%s' % (mgiID, r['symbol'], r['chromosome'], NL))
+        rpt.addRow({'mgiID' : mgiID, 'symbol' : r['symbol'],
+            'chromosome' : r['chromosome']})
 
         #
         # If this is a live run of the load, maintain a list of MGI IDs that
@@ -691,12 +1049,8 @@ def createInvChrReport ():
                 badMGIIDs[mgiID] = ''
 
     numErrors = len(results)
-    fpInvChrRpt.write(NL + 'Number of Rows: ' + str(numErrors) + NL)
-
-    errorCount += numErrors
-    if numErrors > 0:
-        if not invChrRptFile in errorReportNames:
-            errorReportNames.append(invChrRptFile + NL)
+    rpt.addFooter(NL + 'Number of Rows: ' + str(numErrors))
+    rpt.error(numErrors)
     return
 
 #
@@ -707,33 +1061,32 @@ def createInvChrReport ():
 # Throws: Nothing
 #
 def createChrDiscrepReport ():
-    global errorCount, warningCount, errorReportNames, warningReportNames, invChrList
-    global badMGIIDs
+    global invChrList, badMGIIDs
 
     print('Create the chromosome discrepancy report')
-    fpChrDiscrepRpt.write(str.center('Chromosome Discrepancy Report',96) + NL)
-    fpChrDiscrepRpt.write(str.center('(' + timestamp + ')',96) + 2*NL)
-    fpChrDiscrepRpt.write('%-5s  %-20s  %-50s  %-10s  %-10s%s' % ('Load?', 'MGI ID', 'Marker Symbol', 'Marker Chr','Feature Chr',NL))
-    fpChrDiscrepRpt.write((5*'-' + '  ' + 20*'-' + '  ' + 50*'-' + '  ' + 10*'-' + '  ' + 10*'-' + NL))
+    rpt = reports['chrDiscrep']
 
     #
     # Find any cases where the marker in the coordinate file has
     # a different chromosome than the feature in the coordinate file
     #
-    
+
     # exclude invalid chromosomes
     ic =  ','.join(invChrList)
-    
-    results = db.sql('''
+
+    if 'chrDiscrep' in qcResults:
+        results = qcResults['chrDiscrep']
+    else:
+        results = db.sql('''
         select tc.mgiID, tc.chromosome as fChr, m.symbol, m.chromosome as mChr
-        from %s tc, ACC_Accession a, MRK_Marker m 
+        from %s tc, ACC_Accession a, MRK_Marker m
         where tc.chromosome not in (%s)
-        and tc.mgiID = a.accID 
-        and a._MGIType_key = 2 
-        and a._LogicalDB_key = 1 
-        and a.preferred = 1 
-        and a._Object_key = m._Marker_key 
-        and m.chromosome != tc.chromosome 
+        and tc.mgiID = a.accID
+        and a._MGIType_key = 2
+        and a._LogicalDB_key = 1
+        and a.preferred = 1
+        and a._Object_key = m._Marker_key
+        and m.chromosome != tc.chromosome
         order by mgiID
         ''' % (coordTempTable, ic), 'auto')
 
@@ -760,68 +1113,45 @@ def createChrDiscrepReport ():
             if mgiID not in badMGIIDs:
                 badMGIIDs[mgiID] = ''
 
-        fpChrDiscrepRpt.write('No    %-20s  %-50s  %-10s  %-10s%s' % (mgiID, r['symbol'], r['mChr'], r['fChr'], NL))
+        rpt.addRow({'load' : 'No', 'mgiID' : mgiID, 'symbol' : r['symbol'],
+            'mChr' : r['mChr'], 'fChr' : r['fChr']})
 
     numErrors = len(noloadResults)
 
     for r in xyResults:
 
-        fpChrDiscrepRpt.write('Yes    %-20s  %-50s  %-10s  %-10s%s' % (r['mgiID'], r['symbol'], r['mChr'], r['fChr'], NL))
+        rpt.addRow({'load' : 'Yes', 'mgiID' : r['mgiID'], 'symbol' : r['symbol'],
+            'mChr' : r['mChr'], 'fChr' : r['fChr']})
 
     numWarnings = len(xyResults)
 
-    fpChrDiscrepRpt.write(NL + 'Number of Rows Not Loaded: ' + str(numErrors) + NL)
-    fpChrDiscrepRpt.write(NL + 'Number of Rows Loaded: ' + str(numWarnings) + NL)
+    rpt.addFooter(NL + 'Number of Rows Not Loaded: ' + str(numErrors))
+    rpt.addFooter(NL + 'Number of Rows Loaded: ' + str(numWarnings))
 
-    errorCount += numErrors
-    warningCount += numWarnings
-
-    if numWarnings > 0:
-        if not chrDiscrepRptFile in warningReportNames:
-            #print('appending chrDiscrepRptFile to warningReportNames')
-            warningReportNames.append(chrDiscrepRptFile + NL)
-    if numErrors > 0:
-        if not chrDiscrepRptFile in errorReportNames:
-            #print('appending chrDiscrepRptFile to errorReportNames')
-            errorReportNames.append(chrDiscrepRptFile + NL)
+    rpt.warning(numWarnings)
+    rpt.error(numErrors)
 
     return
 
 #
-# Purpose: Create the invalid coordinate and strand report.
-# Returns: Nothing
-# Assumes: Nothing
+# Purpose: Write the reasons a record failed the coordinate and strand
+#          validation to the invalid coordinate and strand report.
+# Returns: number of errors
+# Assumes: 'mask' is a coordValidator reason bitmask
 # Effects: Nothing
 # Throws: Nothing
 #
-def createInvCoordStrandReport (mgiID, startCoordinate, endCoordinate, strand, source):
-    global errorCount, errorReportNames, coordErrorCount, badMGIIDs
+def createInvCoordStrandReport (mgiID, startCoordinate, endCoordinate, strand, source, mask):
+    global badMGIIDs
 
-    numErrors = 0    
-    if len(re.findall('[^0-9]',startCoordinate)) > 0:
-        numErrors += 1
-        reason = 'Invalid start coordinate'
-        fpInvCoordStrandRpt.write('%-12s  %-20s  %-20s  %-10s  %-20s  %-30s%s' %
-            (mgiID, startCoordinate, endCoordinate, strand, source, reason, NL))
+    rpt = reports['invCoordStrand']
 
-    if len(re.findall('[^0-9]',endCoordinate)) > 0:
-        numErrors += 1
-        reason = 'Invalid end coordinate'
-        fpInvCoordStrandRpt.write('%-12s  %-20s  %-20s  %-10s  %-20s  %-30s%s' %
-            (mgiID, startCoordinate, endCoordinate, strand, source, reason, NL))
-    # if start and end are valid check that start < end
-    if numErrors == 0:
-        if startCoordinate != '' and endCoordinate != '' and (int(startCoordinate) > int(endCoordinate)):
-            numErrors += 1
-            reason = 'Start coordinate > end coordinate'
-            fpInvCoordStrandRpt.write('%-12s  %-20s  %-20s  %-10s  %-20s  %-30s%s' %
-                (mgiID, startCoordinate, endCoordinate, strand, source, reason, NL))
-
-    if strand != '-' and strand != '+' and strand != '':
+    numErrors = 0
+    for reason in coordValidator.reasons(mask):
         numErrors += 1
-        reason = 'Invalid strand'
-        fpInvCoordStrandRpt.write('%-12s  %-20s  %-20s  %-10s  %-20s  %-30s%s' %
-            (mgiID, startCoordinate, endCoordinate, strand, source, reason, NL))
+        rpt.addRow({'mgiID' : mgiID, 'start' : startCoordinate,
+            'end' : endCoordinate, 'strand' : strand, 'provider' : source,
+            'reason' : reason})
 
     if numErrors > 0:
         #
@@ -834,11 +1164,7 @@ def createInvCoordStrandReport (mgiID, startCoordinate, endCoordinate, strand, s
             if mgiID not in badMGIIDs:
                 badMGIIDs[mgiID] = ''
 
-        if not invCoordStrandRptFile + '\n' in errorReportNames:
-            errorReportNames.append(invCoordStrandRptFile + NL)
-        
-    errorCount += numErrors
-    coordErrorCount += numErrors
+    rpt.error(numErrors)
 
     return numErrors
 
@@ -850,13 +1176,9 @@ def createInvCoordStrandReport (mgiID, startCoordinate, endCoordinate, strand, s
 # Throws: Nothing
 #
 def createNonMirnaMarkerReport ():
-    global errorCount, errorReportNames
 
     print('Create the non-miRNA marker report')
-    fpNonMirnaMrkRpt.write(str.center('Non-miRNA Marker Report',108) + NL)
-    fpNonMirnaMrkRpt.write(str.center('(' + timestamp + ')',108) + 2*NL)
-    fpNonMirnaMrkRpt.write('%-16s  %-50s  %-16s%s' % ('MGI ID','Feature Type','miRBase ID',NL))
-    fpNonMirnaMrkRpt.write(16*'-' + '  ' + 50*'-' + '  ' + 16*'-' + NL)
+    rpt = reports['nonMirna']
 
     #
     # Find any MGI IDs from the coordinate file that are supposed to be
@@ -864,39 +1186,21 @@ def createNonMirnaMarkerReport ():
     # "miRNA gene" feature type.
     #
     # we use tc.mirbaseID like "%MI%" because mirbaseID is a text field
-    #  and only like is allowed for a text field in the where clause 
+    #  and only like is allowed for a text field in the where clause
     #
     print(coordTempTable)
-    results = db.sql('''
-        select tc.mgiID, tc.mirbaseID, m.term 
-        from mrkcoord_temp tc, ACC_Accession a, MRK_MCV_Cache m
-        where tc.mirbaseID like '%MI%'
-        and tc.mgiID = a.accID
-        and a._MGIType_key = 2
-        and a._LogicalDB_key = 1
-        and a.preferred = 1
-        and a._Object_key = m._Marker_key 
-        and m.qualifier = 'D'
-        and m.term != 'miRNA gene'
-        order by mgiID
-        ''', 'auto')
+    results = getResults('nonMirna')
 
     #
     # Write the records to the report.
     #
     for r in results:
-        mgiID = r['mgiID']
-        mirbaseID = r['mirbaseID']
-        featureType = r['term']
-        fpNonMirnaMrkRpt.write('%-16s  %-50s  %-16s%s' % (mgiID, featureType, mirbaseID, NL))
+        rpt.addRow({'mgiID' : r['mgiID'], 'term' : r['term'],
+            'mirbaseID' : r['mirbaseID']})
 
     numErrors = len(results)
-    fpNonMirnaMrkRpt.write(NL + 'Number of Rows: ' + str(numErrors) + NL)
-
-    errorCount += numErrors
-    if numErrors > 0:
-        if not nonMirnaMrkRptFile in errorReportNames:
-            errorReportNames.append(nonMirnaMrkRptFile + NL)
+    rpt.addFooter(NL + 'Number of Rows: ' + str(numErrors))
+    rpt.error(numErrors)
     return
 
 #
@@ -907,37 +1211,19 @@ def createNonMirnaMarkerReport ():
 # Throws: Nothing
 #
 def createMirbaseDeleteReport ():
-    global errorCount, errorReportNames, mgi2mbInDbDict
+    global mgi2mbInDbDict
 
     print('Create the miRBase delete report')
-    fpMirbaseDeleteRpt.write(str.center('miRBase/Marker Deletion Report',108) + NL)
-    fpMirbaseDeleteRpt.write(str.center('(' + timestamp + ')',108) + 2*NL)
-    fpMirbaseDeleteRpt.write('%-16s  %-16s  %-60s  %-60s%s' % ('Input MGI ID','Input Symbol','miRBase/Marker Associations To Be Added', 'miRBase/Marker Associations To Be Deleted',NL))
-    fpMirbaseDeleteRpt.write(16*'-' + '  ' + 16*'-' + '  ' + 60*'-' + '  ' + 60*'-' + NL)
-
-    results = db.sql('''
-        select a.accid as mbId, m.accid as mgiId, mm.symbol
-        from ACC_Accession a, ACC_Accession m, MRK_Marker mm
-        where a._MGIType_key = 2
-        and a._LogicalDB_key = 83
-        and a._object_key = m._object_key
-        and m._mgitype_key = 2
-        and m._logicaldb_key = 1
-        and m.prefixPart = 'MGI:'
-        and m.preferred = 1
-        and a._object_key = mm._marker_key
-        ''', 'auto')
+    rpt = reports['mirbaseDelete']
 
-    for r in results:
-        mgiID = r['mgiID']
-        symbol = r['symbol']
-        mbID = r['mbID']
-        if mgiID not in mgi2mbInDbDict:
-             mgi2mbInDbDict[mgiID] = [symbol]
-        if mbID != None:
+    index = getMirbaseIndex()
+
+    for mgiID in index.byMgi:
+        mgi2mbInDbDict[mgiID] = [index.symbols[mgiID]]
+        for mbID, accessionKey in index.byMgi[mgiID]:
             mgi2mbInDbDict[mgiID].append(mbID)
-        
-    results = db.sql('''select mgiID, mirbaseID from %s''' % coordTempTable, 'auto')
+
+    results = getResults('inputMirbase')
 
     #
     # Write the records to the report.
@@ -981,14 +1267,11 @@ def createMirbaseDeleteReport ():
         #print 'addedMbID: %s' % addedMbID
         if deletedMbID:
             numErrors += 1
-            fpMirbaseDeleteRpt.write('%-16s  %-16s  %-60s  %-60s%s' % (inputMgiID, symbol, ', '.join(addedMbID), ', '.join(deletedMbID), NL))
-
-    fpMirbaseDeleteRpt.write(NL + 'Number of Rows: ' + str(numErrors) + NL)
+            rpt.addRow({'mgiID' : inputMgiID, 'symbol' : symbol,
+                'added' : ', '.join(addedMbID), 'deleted' : ', '.join(deletedMbID)})
 
-    errorCount += numErrors
-    if numErrors > 0:
-        if not mirbaseDeleteRptFile in errorReportNames:
-            errorReportNames.append(mirbaseDeleteRptFile + NL)
+    rpt.addFooter(NL + 'Number of Rows: ' + str(numErrors))
+    rpt.error(numErrors)
     return
 
 #
@@ -999,26 +1282,18 @@ def createMirbaseDeleteReport ():
 # Throws: Nothing
 #
 def createDupMirbaseIdReport():
-    global errorCount, errorReportNames
 
     print('Create the duplicate miRBase ID report')
-    fpDupMirbaseIdRpt.write(str.center('Duplicate miRBase ID Report',108) + NL)
-    fpDupMirbaseIdRpt.write(str.center('(' + timestamp + ')',108) + 2*NL)
-    fpDupMirbaseIdRpt.write('%-16s  %-40s%s' % ('Input miRBase ID', 'Associated MGI IDs', NL))
-    fpDupMirbaseIdRpt.write(16*'-' + '  ' + 50*'-' + NL)
+    rpt = reports['dupMirbaseId']
 
     numErrors = 0
     for mbId in list(mb2mgiInInputDict.keys()):
         mgiIdList = mb2mgiInInputDict[mbId]
         if len(mgiIdList) > 1:
-            fpDupMirbaseIdRpt.write('%-16s  %-50s%s' % (mbId, ','.join(mgiIdList), NL ) )
+            rpt.addRow({'mirbaseID' : mbId, 'mgiIDs' : ','.join(mgiIdList)})
             numErrors += 1
-    fpDupMirbaseIdRpt.write(NL + 'Number of Rows: ' + str(numErrors) + NL)
-
-    errorCount += numErrors
-    if numErrors > 0:
-        if not dupMirbaseIdRptFile in errorReportNames:
-            errorReportNames.append(dupMirbaseIdRptFile + NL)
+    rpt.addFooter(NL + 'Number of Rows: ' + str(numErrors))
+    rpt.error(numErrors)
     return
 
 #
@@ -1029,39 +1304,20 @@ def createDupMirbaseIdReport():
 # Throws: Nothing
 #
 def createMirbaseOtherMrkReport():
-    global errorCount, errorReportNames
 
     print('Create the miRBase ID associated with other marker report')
+    rpt = reports['mirbaseOtherMrk']
 
-    results = db.sql('''
-        select a.accid as mbId, m.accid as mgiId
-        from ACC_Accession a, ACC_Accession m
-        where a._MGIType_key = 2
-        and a._LogicalDB_key = 83
-        and a._object_key = m._object_key
-        and m._mgitype_key = 2
-        and m._logicaldb_key = 1
-        and m.prefixPart = 'MGI:'
-        and m.preferred = 1
-        ''', 'auto')
+    index = getMirbaseIndex()
+
+    for mbID in index.byMb:
+        mb2mgiInDbDict[mbID] = list(index.byMb[mbID])
 
-    for r in results:
-        mbID = r['mbID']
-        mgiID = r['mgiID']
-        if mbID not in mb2mgiInDbDict:
-            mb2mgiInDbDict[mbID] = []
-        mb2mgiInDbDict[mbID].append(mgiID)
-
-    fpMirbaseOtherMrkRpt.write(str.center('miRBase IDs in the Input Associated with Different Markers in MGI Report',108) + NL)
-    fpMirbaseOtherMrkRpt.write(str.center('(' + timestamp + ')',108) + 2*NL)
-    fpMirbaseOtherMrkRpt.write('%-16s  %-40s  %-40s%s' % ('Input miRBase ID','Input MGI IDs', 'Database MGI IDs',NL))
-    fpMirbaseOtherMrkRpt.write(16*'-' + '  ' + 40*'-' + '  ' + 40*'-' + NL)
- 
     numErrors = 0
     for mbID in list(mb2mgiInInputDict.keys()):
         #
         #  get input mgiIDs associated with mbID
-        # 
+        #
 
         mgiIdInInputList = mb2mgiInInputDict[mbID]
 
@@ -1103,14 +1359,12 @@ def createMirbaseOtherMrkReport():
             #
             for id in diffSet:
                 dbData.append(id)
-            
-            fpMirbaseOtherMrkRpt.write('%-16s  %-40s  %-40s%s' % (mbID, ', '.join(inputData), ', '.join(dbData), NL))
 
-    errorCount += numErrors
-    fpMirbaseOtherMrkRpt.write(NL + 'Number of Rows: ' + str(numErrors) + NL)
-    if numErrors > 0:
-        if not mirbaseOtherMrkRptFile in errorReportNames:
-            errorReportNames.append(mirbaseOtherMrkRptFile + NL)
+            rpt.addRow({'mirbaseID' : mbID, 'inputMgiIDs' : ', '.join(inputData),
+                'dbMgiIDs' : ', '.join(dbData)})
+
+    rpt.addFooter(NL + 'Number of Rows: ' + str(numErrors))
+    rpt.error(numErrors)
     return
 
 #
@@ -1121,28 +1375,25 @@ def createMirbaseOtherMrkReport():
 # Throws: Nothing
 #
 def createSourceDisplayReport():
-    global errorCount
 
     print('Create the source display report')
-    fpSourceDisplayRpt.write(str.center('Source/Display in Input, not in Database',110) + NL)
-    fpSourceDisplayRpt.write(str.center('(' + timestamp + ')',110) + 2*NL)
+    rpt = reports['sourceDisplay']
 
     dbSourceList = []
     newSource = 0
-    results = db.sql('''select distinct name, abbreviation from MAP_Coord_Collection''', 'auto')
+    results = getResults('sourceDisplay')
     for r in results:
         dbSourceList.append('%s/%s' % (r['name'], r['abbreviation']))
     #print 'dbSourceList: %s' % dbSourceList
     #print 'sourceDisplayList: %s' % sourceDisplayList
     for s in sourceDisplayList:
         if s not in dbSourceList:
-            fpSourceDisplayRpt.write('%s%s' % (s, NL))
+            rpt.addRow({'sourceDisplay' : s})
             newSource += 1
     if newSource != 0:
-        errorReportNames.append(sourceDisplayRptFile + NL)
-        errorCount += 1
+        rpt.error(1)
     else:
-        fpSourceDisplayRpt.write('No new source/display in input' + NL)
+        rpt.addFooter('No new source/display in input')
     return
 
 
@@ -1155,64 +1406,131 @@ def createSourceDisplayReport():
 # Throws: Nothing
 #
 def createBuildReport():
-    global errorCount
 
     print('Create the build report')
-    fpBuildRpt.write(str.center('Build Report',110) + NL)
-    fpBuildRpt.write(str.center('(' + timestamp + ')',110) + 2*NL)
+    rpt = reports['build']
 
-    fpBuildRpt.write('Build Value Not in Database' + NL)
-    fpBuildRpt.write(30*'-' + NL)
-    results = db.sql('''select distinct version from MAP_Coordinate''', 'auto')
+    results = getResults('build')
     dbBuildList = []
     for r in results:
         dbBuildList.append(r['version'])
     if build not in dbBuildList:
-        fpBuildRpt.write(build + NL)
-        errorReportNames.append(buildRptFile + NL)
-        errorCount += 1
+        rpt.addRow({'build' : build})
+        rpt.error(1)
     return
 
+#
+# Purpose: Write the JSON summary of the QC reports.
+# Returns: Nothing
+# Assumes: The reports have been written
+# Effects: Nothing
+# Throws: Nothing
+#
+def writeSummary ():
+    if qcSummaryFile == '':
+        return
+
+    reports.writeSummary(qcSummaryFile, {
+        'inputFile' : coordFile,
+        'liveRun' : liveRun == '1',
+        'fatalErrorCount' : fatalErrorCount,
+        'rejectedMGIIDs' : len(badMGIIDs),
+        })
+    return
+
+
+#
+# Purpose: Copy 'count' bytes at 'offset' of the input file to the end
+#          of the load-ready file.
+# Returns: Nothing
+# Assumes: Both files are open in binary mode
+# Effects: Uses os.copy_file_range, so the kernel copies the bytes, and
+#          falls back to read/write where it is not supported.
+# Throws: IOError if the input file is shorter than expected
+#
+def copyRange (fpSrc, fpDest, offset, count):
+    global useCopyFileRange
+
+    if useCopyFileRange:
+        fpDest.flush()
+        try:
+            while count > 0:
+                copied = os.copy_file_range(fpSrc.fileno(), fpDest.fileno(),
+                    count, offset)
+                if copied == 0:
+                    raise IOError('Input file changed: ' + coordFile)
+                offset += copied
+                count -= copied
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                    errno.EOPNOTSUPP, errno.EPERM):
+                raise
+            useCopyFileRange = False
+
+    fpSrc.seek(offset)
+    while count > 0:
+        data = fpSrc.read(min(count, 1024 * 1024))
+        if not data:
+            raise IOError('Input file changed: ' + coordFile)
+        fpDest.write(data)
+        count -= len(data)
+    return
 
 #
 # Purpose: Create the "load-ready" coordinate file from input records that
 #          were not rejected by QC checks.
 # Returns: Nothing
-# Assumes: Nothing
-# Effects: Nothing
+# Assumes: The offsets and MGI IDs of the input lines were recorded
+#          while the input file was read
+# Effects: Copies each run of accepted lines as one byte range, without
+#          reading the lines again. Writes the parsed-input cache when
+#          COORD_CACHE is true.
 # Throws: Nothing
 #
 def createCoordLoadFile ():
-    global fatalErrorCount
     try:
-        fpCoord = open(coordFile, 'r')
+        fpCoord = open(coordFile, 'rb')
     except:
         print('Cannot open input file: ' + coordFile)
         sys.exit(1)
 
     try:
-        fpLoadFile = open(coordLoadFile, 'w')
+        fpLoadFile = open(coordLoadFile, 'wb')
     except:
         print('Cannot open output file: ' + coordLoadFile)
         sys.exit(1)
     
-    # remove header line - use global header with tabs removed
-    junk = fpCoord.readline()
-    fpLoadFile.write(header)
-    for line in fpCoord.readlines():
-        tokens = re.split(TAB, line[:-1])
-        mgiID = tokens[0].strip()
+    # skip header line - use global header with tabs removed
+    fpLoadFile.write(header.encode())
 
-        #
-        # Only write the input record to the load file if the MGI ID was
-        # not added to the dictionary of rejected MGI IDs.
-        #
-        if mgiID not in badMGIIDs:
-            fpLoadFile.write(line)
+    #
+    # Only write the input record to the load file if the MGI ID was
+    # not added to the dictionary of rejected MGI IDs.
+    #
+    rangeStart = None
+    lineStart = headerEnd
+    for mgiID, lineEnd in zip(lineMGIIDs, lineEnds):
+        if mgiID in badMGIIDs:
+            if rangeStart is not None:
+                copyRange(fpCoord, fpLoadFile, rangeStart, lineStart - rangeStart)
+                rangeStart = None
+        elif rangeStart is None:
+            rangeStart = lineStart
+        lineStart = lineEnd
+    if rangeStart is not None:
+        copyRange(fpCoord, fpLoadFile, rangeStart, lineStart - rangeStart)
 
     fpCoord.close()
     fpLoadFile.close()
 
+    # the same rows, parsed, for createInputFiles.py
+    if cacheWriter is not None:
+        lineStarts = array.array('q', [headerEnd])
+        lineStarts.extend(lineEnds[:-1])
+        cacheWriter.save(coordCacheFile, coordFile, coordLoadFile,
+            lineStarts[:len(lineMGIIDs)],
+            [mgiID not in badMGIIDs for mgiID in lineMGIIDs])
 
 #
 # Main
@@ -1220,35 +1538,50 @@ def createCoordLoadFile ():
 checkArgs()
 init()
 openFiles()
-loadTempTables() # also reports invalid coords and strand
-createInvMarkerReport()
-createSecMarkerReport()
-createInvChrReport()
-createChrDiscrepReport()
-createNonMirnaMarkerReport()
-createMirbaseDeleteReport()
-createDupMirbaseIdReport()
-createMirbaseOtherMrkReport()
-createSourceDisplayReport()
-createBuildReport()
+with metrics.phase('loadTempTables'):
+    loadTempTables() # also reports invalid coords and strand
+if qcEngineMode == 'memory':
+    with metrics.phase('qcEngine'):
+        runQcEngine()
+elif queryParallel > 1:
+    with metrics.phase('prefetchReports'):
+        prefetchReports()
+for name, createReport in [
+        ('invMarker', createInvMarkerReport),
+        ('secMarker', createSecMarkerReport),
+        ('invChr', createInvChrReport),
+        ('chrDiscrep', createChrDiscrepReport),
+        ('nonMirna', createNonMirnaMarkerReport),
+        ('mirbaseDelete', createMirbaseDeleteReport),
+        ('dupMirbaseId', createDupMirbaseIdReport),
+        ('mirbaseOtherMrk', createMirbaseOtherMrkReport),
+        ('sourceDisplay', createSourceDisplayReport),
+        ('build', createBuildReport)]:
+    with metrics.phase(name) as p:
+        createReport()
+        p.rowsOut = len(reports[name].rows)
 closeFiles()
 
 if liveRun == "1":
-    createCoordLoadFile()
+    with metrics.phase('loadFile') as p:
+        createCoordLoadFile()
+        p.rowsOut = len([m for m in lineMGIIDs if m not in badMGIIDs])
+        p.bytesWritten = os.path.getsize(coordLoadFile)
 
 # always display the source/display report name
 #fpRptNamesRpt.write(sourceDisplayRptFile + NL)
 print('fatalErrorCount: %s' % fatalErrorCount)
+writeSummary()
 if fatalErrorCount > 0:
    print('Invalid MiRBase ID see %s' % mirbaseInvalidIdRptFile)
    sys.exit(3)
-if errorCount > 0:
-    names = ''.join(errorReportNames )
+if reports.errorCount() > 0:
+    names = ''.join([r.fileName + NL for r in reports.errorReports])
     fpRptNamesRpt.write('Reports with Errors: ' + NL )
     fpRptNamesRpt.write(names)
     RC=2
-if warningCount > 0:
-    names = str.join('', warningReportNames)
+if reports.warningCount() > 0:
+    names = ''.join([r.fileName + NL for r in reports.warningReports])
     fpRptNamesRpt.write('Reports with Warnings: ' + NL )
     fpRptNamesRpt.write(names)
     RC=2
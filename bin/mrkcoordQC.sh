@@ -56,12 +56,10 @@
 #      ) Source the configuration files to establish the environment.
 #      ) Verify that the input file exists.
 #      ) Initialize the report files.
-#      ) Clean up the input file by removing blank lines, Ctrl-M, etc.
-#      ) Generate the sanity report.
-#      ) Create temp tables for the input data.
-#      ) Load the input files into temp tables.
-#      ) Call mrkcoordQC.py to generate the QC reports.
-#      ) Drop the temp tables.
+#      ) Call sanityCheck.py to clean up the input file (remove blank
+#        lines, Ctrl-M, etc.) and generate the sanity report, in one pass.
+#      ) Call mrkcoordQC.py to load the input file into a temp table of
+#        its own and generate the QC reports.
 #
 #  Notes:  None
 #
@@ -160,7 +158,11 @@ then
     SOURCE_DISPLAY_RPT=${CURRENTDIR}/`basename ${SOURCE_DISPLAY_RPT}`
     BUILD_RPT=${CURRENTDIR}/`basename ${BUILD_RPT}`
     RPT_NAMES_RPT=${CURRENTDIR}/`basename ${RPT_NAMES_RPT}`
+    QC_SUMMARY_FILE=${CURRENTDIR}/`basename ${QC_SUMMARY_FILE}`
     MIRBASE_INVALID_ID_RPT=${CURRENTDIR}/`basename ${MIRBASE_INVALID_ID_RPT}`
+
+    # curator runs are not part of the load's metrics
+    METRICS_DIR=""
 fi
 
 #
@@ -173,7 +175,7 @@ touch ${LOG}
 #
 # Initialize the report files to make sure the current user can write to them.
 #
-RPT_LIST="${SANITY_RPT} ${INVALID_MARKER_RPT} ${SEC_MARKER_RPT} ${INVALID_CHR_RPT} ${CHR_DISCREP_RPT} ${INVALID_COORD_STRAND_RPT} ${NON_MIRNA_MARKER_RPT} ${MIRBASE_DELETE_RPT} ${MIRBASE_DUP_RPT} ${MIRBASE_OTHER_MKR_RPT} ${SOURCE_DISPLAY_RPT} ${BUILD_RPT} ${RPT_NAMES_RPT}"
+RPT_LIST="${SANITY_RPT} ${INVALID_MARKER_RPT} ${SEC_MARKER_RPT} ${INVALID_CHR_RPT} ${CHR_DISCREP_RPT} ${INVALID_COORD_STRAND_RPT} ${NON_MIRNA_MARKER_RPT} ${MIRBASE_DELETE_RPT} ${MIRBASE_DUP_RPT} ${MIRBASE_OTHER_MKR_RPT} ${SOURCE_DISPLAY_RPT} ${BUILD_RPT} ${RPT_NAMES_RPT} ${QC_SUMMARY_FILE}"
 
 for i in ${RPT_LIST}
 do
@@ -181,208 +183,29 @@ do
 done
 
 #
-# Convert the input file into a QC-ready version that can be used to
-# run the sanity/QC reports against. This involves doing the following:
-# 1) Extract columns 1 thru 8
-# 2) Extract only lines that have alphanumerics (excludes blank lines)
-# 3) Remove any Ctrl-M characters (dos2unix)
-# 4) Extract only lines that do not begin with '#'
-#
-cat ${INPUT_FILE} | cut -d'	' -f1-8 | grep '[0-9A-Za-z]' | grep -v '^#' > ${INPUT_FILE_QC}
-dos2unix ${INPUT_FILE_QC} ${INPUT_FILE_QC} 2>/dev/null
-
-#
-# FUNCTION: Write invalid header in an input file
-#           to the sanity report.
-#
-checkHeader ()
-{
-    FILE=$1    # The input file to check
-    REPORT=$2  # The sanity report to write to
-    echo "Invalid Header" >> ${REPORT}
-    echo "---------------" >> ${REPORT}
-    header=`head -1 ${INPUT_FILE}`
-    if [ "`head -1 ${INPUT_FILE} | grep -i '^build='`" = "" ]
-    then
-	echo ${header} >> ${REPORT}
-	return 1
-    else
-	return 0
-    fi
-}
-
-#
-# FUNCTION: Check for duplicate lines in an input file and write the lines
-#           to the sanity report.
-#
-checkDupLines ()
-{
-    FILE=$1    # The input file to check
-    REPORT=$2  # The sanity report to write to
-
-    echo "" >> ${REPORT}
-    echo "" >> ${REPORT}
-    echo "Duplicate Lines" >> ${REPORT}
-    echo "---------------" >> ${REPORT}
-    sort ${FILE} | uniq -d > ${TMP_FILE}
-    cat ${TMP_FILE} >> ${REPORT}
-    if [ `cat ${TMP_FILE} | wc -l` -eq 0 ]
-    then
-        return 0
-    else
-        return 1
-    fi
-}
-
-#
-# FUNCTION: Check for a duplicated field in an input file and write the field
-#           value to the sanity report.
-#
-checkDupFields ()
-{
-    FILE=$1         # The input file to check
-    REPORT=$2       # The sanity report to write to
-    FIELD_NUM=$3    # The field number to check
-    FIELD_NAME=$4   # The field name to show on the sanity report
-
-    echo "" >> ${REPORT}
-    echo "" >> ${REPORT}
-    echo "Duplicate ${FIELD_NAME}" >> ${REPORT}
-    echo "------------------------------" >> ${REPORT}
-    cut -d'	' -f${FIELD_NUM} ${FILE} | sort | uniq -d > ${TMP_FILE}
-    cat ${TMP_FILE} >> ${REPORT}
-    if [ `cat ${TMP_FILE} | wc -l` -eq 0 ]
-    then
-        return 0
-    else
-        return 1
-    fi
-}
-
-#
-# FUNCTION: Check for lines with missing columns and data in input file and
-#           write the line numbers to the sanity report.
-#
-checkColumns ()
-{   
-    FILE=$1         # The input file to check
-    REPORT=$2       # The sanity report to write to
-    NUM_COLUMNS=$3  # The number of columns expected in each input record
-
-    echo "" >> ${REPORT}
-    echo "" >> ${REPORT}
-    echo "Lines With Missing Columns or Data" >> ${REPORT}
-    echo "-----------------------------------" >> ${REPORT}
-    ${PYTHON} ${MRKCOORDLOAD}/bin/checkColumns.py ${FILE} ${NUM_COLUMNS} > ${TMP_FILE}
-    cat ${TMP_FILE} >> ${REPORT} 
-    if [ `cat ${TMP_FILE} | wc -l` -eq 0 ]
-    then
-        return 0
-    else
-        return 1
-    fi
-}
-
-#
-# FUNCTION: Check the MGI ID column for data that does not start with 'MGI:'
-#           and write the field value to the sanity report.
-#
-checkMGIIDS ()
-{
-    FILE=$1         # The input file to check
-    REPORT=$2       # The sanity report to write to
-
-    echo "" >> ${REPORT}
-    echo "" >> ${REPORT}
-    echo "Bad MGI ID" >> ${REPORT}
-    echo "---------------" >> ${REPORT}
-    # get the first column excluding the header which contains '='
-    cat ${FILE} | grep -v '=' | grep -i -v '^MGI:' > ${TMP_FILE}
-    cat ${TMP_FILE} >> ${REPORT}
-    if [ `cat ${TMP_FILE} | wc -l` -eq 0 ]
-    then
-        return 0
-    else
-        return 1
-    fi
-}
-
-#
-# FUNCTION: Check an input file to make sure it has a minimum number of lines.
-#
-checkLineCount ()
-{
-    FILE=$1        # The input file to check
-    REPORT=$2      # The sanity report to write to
-    NUM_LINES=$3   # The minimum number of lines expected in the input file
-    REPORT=$2       # The sanity report to write to
-
-    COUNT=`cat ${FILE} | wc -l | sed 's/ //g'`
-
-    if [ ${COUNT} -lt ${NUM_LINES} ]
-    then
-        echo "" >> ${REPORT}
-        echo "" >> ${REPORT}
-        echo "**** WARNING ****" >> ${REPORT}
-        echo "${FILE} has ${COUNT} lines." >> ${REPORT}
-        echo "Expecting at least ${NUM_LINES} lines." >> ${REPORT}
-        echo ""  >> ${REPORT}
-        return 1
-    else
-        return 0
-    fi
-}
-
-#
-# Run sanity checks on the gene model input file.
+# Run sanity checks on the input file. This also converts the input file
+# into a QC-ready version that can be used to run the QC reports against
+# (columns 1 thru 8 of the lines that have alphanumerics and do not begin
+# with '#', without Ctrl-M characters).
 #
 echo "" >> ${LOG}
 date >> ${LOG}
 echo "Run sanity checks on the input file" >> ${LOG}
 FILE_ERROR=0
 
-# e4g-115/comment this out
-#checkLineCount ${INPUT_FILE_QC} ${SANITY_RPT} ${FILE_MINIMUM_SIZE} ${SANITY_RPT}
-#if [ $? -ne 0 ]
-#then
-#    FILE_ERROR=1
-#fi
-
-checkHeader ${INPUT_FILE_QC} ${SANITY_RPT}
-if [ $? -ne 0 ]
-then
-    FILE_ERROR=1
-fi
-
-checkDupLines ${INPUT_FILE_QC} ${SANITY_RPT}
-if [ $? -ne 0 ]
-then
-    FILE_ERROR=1
-fi
-
-checkDupFields ${INPUT_FILE_QC} ${SANITY_RPT} 1 "MGI IDs"
-if [ $? -ne 0 ]
-then
-    FILE_ERROR=1
-fi
-
-checkColumns ${INPUT_FILE_QC} ${SANITY_RPT} ${MRKCOORD_FILE_COLUMNS}
-if [ $? -ne 0 ]
+${PYTHON} ${SANITY_CHECK} ${INPUT_FILE} >> ${LOG} 2>&1
+STAT=$?
+if [ ${STAT} -eq 2 ]
 then
+    echo "Sanity errors detected. See ${SANITY_RPT}" | tee -a ${LOG}
     FILE_ERROR=1
-fi
-
-checkMGIIDS ${INPUT_FILE_QC} ${SANITY_RPT}
-if [ $? -ne 0 ]
+elif [ ${STAT} -ne 0 ]
 then
+    echo "An error occurred while running the sanity checks" | tee -a ${LOG}
+    echo "See log file (${LOG})"
     FILE_ERROR=1
 fi
 
-if [ ${FILE_ERROR} -ne 0 ]
-then
-    echo "Sanity errors detected. See ${SANITY_RPT}" | tee -a ${LOG}
-fi
-
 #
 # If the input file had sanity errors, remove the QC-ready files and
 # skip the QC reports.
@@ -393,35 +216,6 @@ then
     exit 1
 fi
 
-#
-# Create temp tables for the input data.
-#
-
-echo "" >> ${LOG}
-date >> ${LOG}
-echo "Create temp tables for the input data" >> ${LOG}
-cat - <<EOSQL | psql -h${MGD_DBSERVER} -d${MGD_DBNAME} -U mgd_dbo -e  >> ${LOG}
-
-create table ${TEMP_TABLE} (
-    mgiID text not null,
-    chromosome text null,
-    startCoordinate float null,
-    endCoordinate float null,
-    strand char(1) null,
-    provider text not null,
-    display text not null,
-    mirbaseID text null,
-    buildValue text not null
-);
-
-create index tmp_idx_mgiID on ${TEMP_TABLE} (mgiID);
-
-create index tmp_idx_chromosome on ${TEMP_TABLE} (chromosome);
-
-grant all on ${TEMP_TABLE} to public;
-
-EOSQL
-
 #
 # Generate the QC reports.
 #
@@ -451,23 +245,14 @@ else
 fi
 cat ${RPT_NAMES_RPT} | tee -a ${LOG}
 
-#
-# Drop the temp tables.
-#
-echo "" >> ${LOG}
-date >> ${LOG}
-echo "Drop the temp tables" >> ${LOG}
-cat - <<EOSQL | psql -h${MGD_DBSERVER} -d${MGD_DBNAME} -U mgd_dbo -e  >> ${LOG}
-
-drop table ${TEMP_TABLE};
-
-EOSQL
-
 date >> ${LOG}
 
 #
-# Remove the bcp files.
+# Remove the bcp files, unless they were written for debugging.
 #
-rm -f ${INPUT_FILE_BCP} 
+if [ "${QC_WRITE_BCP}" != "true" ]
+then
+    rm -f ${INPUT_FILE_BCP} 
+fi
 
 exit ${RC}
@@ -6,7 +6,13 @@
 #
 # Usage:
 #
-#     mrkcoordload.sh
+#     mrkcoordload.sh [--resume]
+#
+#     --resume: continue a run that failed part of the way. The stages
+#               recorded in the checkpoint journal (${COORD_JOURNAL_FILE})
+#               for the same input file - QC, createInputFiles.py, each
+#               collection coordload, the association load - are not run
+#               again, and the output directory is not cleaned.
 #
 
 cd `dirname $0`/..
@@ -17,11 +23,16 @@ LOG=`pwd`/createInputFiles.log
 rm -rf ${LOG}
 
 RUNTYPE=live
+Usage="Usage: mrkcoordload.sh [--resume]"
 
 #
 #  Verify the argument(s) to the shell script.
 #
-if [ $# -ne 0 ]
+RESUME=""
+if [ $# -eq 1 -a "$1" = "--resume" ]
+then
+    RESUME=--resume
+elif [ $# -ne 0 ]
 then
     echo ${Usage} | tee -a ${LOG}
     exit 1
@@ -82,6 +93,22 @@ fi
 # need to create it first - we'll check it later
 #
 
+#
+# FUNCTION: Add the name of each collection in ${COORD_FILES} to
+#           MAIL_LOADNAME, for the mail sent by shutDown. The coordloads
+#           run in child processes, so the names are added here.
+#
+setMailLoadName ()
+{
+    for f in `cat ${COORD_FILES}`
+    do
+        suffix=`basename $f | cut -d. -f2`
+        COORD_COLLECTION_NAME=`echo $suffix | cut -d~ -f1 | sed 's/\_/ /g'`
+        MAIL_LOADNAME="${COORD_COLLECTION_NAME}, ${MAIL_LOADNAME}"
+    done
+    export MAIL_LOADNAME
+}
+
 #####################################
 #
 # Main
@@ -94,9 +121,13 @@ fi
 preload ${OUTPUTDIR}
 
 #
-# rm all files/dirs from OUTPUTDIR
+# rm all files/dirs from OUTPUTDIR; a resumed run needs the output of
+# the stages it does not run again
 #
-cleanDir ${OUTPUTDIR}
+if [ "${RESUME}" = "" ]
+then
+    cleanDir ${OUTPUTDIR}
+fi
 
 #
 # There should be a "lastrun" file in the input directory that was created
@@ -119,24 +150,63 @@ then
 fi
 
 #
-# Generate the sanity/QC reports
+# Even if the input file was touched, the load does not need to be run
+# when no collection's content fingerprint changed since the last load.
 #
-echo "" >> ${LOG_DIAG}
-date >> ${LOG_DIAG}
-echo "Generate the sanity/QC reports" | tee -a ${LOG_DIAG}
-${LOAD_QC_SH} ${INPUT_FILE_DEFAULT} ${RUNTYPE} 2>&1 >> ${LOG_DIAG}
-STAT=$?
-checkStatus ${STAT} "QC reports"
-if [ ${STAT} -eq 1 ]
+if [ "${COORD_FINGERPRINT_FILE}" != "" ]
 then
-    shutDown
-    exit 1
+    echo "" >> ${LOG_DIAG}
+    date >> ${LOG_DIAG}
+    echo "Compare the collection fingerprints" | tee -a ${LOG_DIAG}
+    ${PYTHON} ${MRKCOORDLOAD}/bin/coordFingerprint.py check ${INPUT_FILE_DEFAULT} >> ${LOG_DIAG} 2>&1
+    STAT=$?
+    if [ ${STAT} -eq 2 ]
+    then
+        echo "Input file content has not changed - skipping load" | tee -a ${LOG_PROC}
+        touch ${LASTRUN_FILE}
+        # set STAT for shutdown
+        STAT=0
+        echo 'shutting down'
+        shutDown
+        exit 0
+    fi
+    checkStatus ${STAT} "coordFingerprint.py check"
 fi
-if [ ${STAT} -eq 3 ]
+
+#
+# Start the checkpoint journal of the run; with --resume the journal of
+# the failed run is kept if it is for the same input file content
+#
+JOURNAL="${PYTHON} ${MRKCOORDLOAD}/bin/coordJournal.py"
+${JOURNAL} start ${INPUT_FILE_DEFAULT} ${RESUME} >> ${LOG_DIAG} 2>&1
+STAT=$?
+checkStatus ${STAT} "coordJournal.py start"
+
+#
+# Generate the sanity/QC reports
+#
+if ${JOURNAL} check qc
 then
-    echo "Invalid MiRBase ID: see ${MIRBASE_INVALID_ID_RPT}" 
-    shutDown
-    exit 1
+    echo "QC reports already done - skipping" | tee -a ${LOG_DIAG} ${LOG_PROC}
+else
+    echo "" >> ${LOG_DIAG}
+    date >> ${LOG_DIAG}
+    echo "Generate the sanity/QC reports" | tee -a ${LOG_DIAG}
+    ${LOAD_QC_SH} ${INPUT_FILE_DEFAULT} ${RUNTYPE} 2>&1 >> ${LOG_DIAG}
+    STAT=$?
+    checkStatus ${STAT} "QC reports"
+    if [ ${STAT} -eq 1 ]
+    then
+        shutDown
+        exit 1
+    fi
+    if [ ${STAT} -eq 3 ]
+    then
+        echo "Invalid MiRBase ID: see ${MIRBASE_INVALID_ID_RPT}" 
+        shutDown
+        exit 1
+    fi
+    ${JOURNAL} done qc
 fi
 
 # get the coordinate version
@@ -166,71 +236,118 @@ done
 IFS=$save
 
 #
-# create input files
+# create the input files, then load the collections and the miRBase
+# associations: with ${COORD_PIPELINE}, mrkcoordPipeline.py runs the steps
+# as soon as their input is ready and writes the status of each step to
+# ${COORD_PIPELINE_STATUS}; otherwise they run one after another. Steps
+# done according to the journal are skipped; runCoordload.sh records
+# each collection it loads.
 #
-echo "`date`" >> ${LOG_DIAG}
-echo 'Running createInputFiles.py' >> ${LOG_DIAG}
-${PYTHON} ${MRKCOORDLOAD}/bin/createInputFiles.py
-STAT=$?
-checkStatus ${STAT} "${MRKCOORDLOAD}/bin/createInputFiles.py"
-
-echo "`date`" >> ${LOG_DIAG}
-echo 'Done Running createInputFiles.py' >> ${LOG_DIAG}
+export CONFIG_LOAD JOBKEY COORD_VERSION MAX_PARALLEL_COORDLOADS
 
-#
-# for each input file:
-# add collection name to the environment
-# run the coordload
-#
-
-for f in `cat ${COORD_FILES}`
-do
-    # these env variable names expected by java coordload
-    # replace '_' with ' ' e.g. NCBI_UniSTS -> NCBI UniSTS
-    suffix=`echo $f | cut -d. -f2`
-    collection=`echo $suffix | cut -d~ -f1`
-    abbrev=`echo $suffix | cut -d~ -f2`
-    COORD_COLLECTION_NAME=`echo $collection | sed 's/\_/ /g'`
-    export COORD_COLLECTION_NAME
-    COORD_COLLECTION_ABBREV=`echo $abbrev | sed 's/\_/ /g'`
-    export COORD_COLLECTION_ABBREV
-
-    INFILE_NAME=$f
-    export INFILE_NAME
-    if [ ! -r ${INFILE_NAME} ]
+if [ "${COORD_PIPELINE}" = "true" ]
+then
+    echo "" >> ${LOG_DIAG}
+    echo "`date`" >> ${LOG_DIAG}
+    echo "Running mrkcoordPipeline.py" | tee -a ${LOG_DIAG} ${LOG_PROC}
+    ${PYTHON} ${MRKCOORDLOAD}/bin/mrkcoordPipeline.py >> ${LOG_DIAG} 2>&1
+    STAT=$?
+    if [ -r ${COORD_FILES} ]
     then
-        # set STAT for endJobStream.py
-        STAT=1
-        checkStatus ${STAT} "Cannot read from input file: ${INFILE_NAME}"
+        setMailLoadName
     fi
-    
-    MAIL_LOADNAME="${COORD_COLLECTION_NAME}, ${MAIL_LOADNAME}"
-    export MAIL_LOADNAME
+    checkStatus ${STAT} "${MRKCOORDLOAD}/bin/mrkcoordPipeline.py"
+
+    # one line per step: step, exit status, duration, message
+    save=$IFS
+    IFS='
+'
+    for l in `cat ${COORD_PIPELINE_STATUS}`
+    do
+        IFS=$save
+        STEP=`echo "$l" | cut -f1`
+        STAT=`echo "$l" | cut -f2`
+        DURATION=`echo "$l" | cut -f3`
+        MSG=`echo "$l" | cut -f4`
+        echo "${STEP}: exit status ${STAT}, ${DURATION} seconds" | tee -a ${LOG_DIAG} ${LOG_PROC}
+        checkStatus ${STAT} "${MSG}"
+    done
+    IFS=$save
+elif ${JOURNAL} check createInputFiles
+then
+    echo "createInputFiles.py already done - skipping" | tee -a ${LOG_DIAG} ${LOG_PROC}
+else
+    echo "`date`" >> ${LOG_DIAG}
+    echo 'Running createInputFiles.py' >> ${LOG_DIAG}
+    ${PYTHON} ${MRKCOORDLOAD}/bin/createInputFiles.py
+    STAT=$?
+    checkStatus ${STAT} "${MRKCOORDLOAD}/bin/createInputFiles.py"
 
-    echo "" >> ${LOG_DIAG}
     echo "`date`" >> ${LOG_DIAG}
-    echo "Running ${COORD_COLLECTION_NAME} mrkcoordload" | tee -a ${LOG_DIAG} ${LOG_PROC}
-    ${JAVA} ${JAVARUNTIMEOPTS} -classpath ${CLASSPATH} \
-        -DCONFIG=${CONFIG_MASTER},${CONFIG_LOAD} \
-	-DCOORD_COLLECTION_NAME="${COORD_COLLECTION_NAME}" \
-	-DCOORD_COLLECTION_ABBREV="${COORD_COLLECTION_ABBREV}" \
-	-DINFILE_NAME=${INFILE_NAME} \
-	-DCOORD_VERSION="${COORD_VERSION}" \
-        -DJOBKEY=${JOBKEY} ${DLA_START}
+    echo 'Done Running createInputFiles.py' >> ${LOG_DIAG}
 
-    STAT=$?
-    checkStatus ${STAT} "${COORD_COLLECTION_NAME} mrkcoordload java load"
-done
+    #
+    # only load the collections whose fingerprint changed
+    #
+    if [ "${COORD_FINGERPRINT_FILE}" != "" ]
+    then
+        ${PYTHON} ${MRKCOORDLOAD}/bin/coordFingerprint.py filter ${INPUT_FILE_DEFAULT} >> ${LOG_DIAG} 2>&1
+        STAT=$?
+        checkStatus ${STAT} "coordFingerprint.py filter"
+    fi
+    ${JOURNAL} done createInputFiles
+fi
 
-# If there are mirbase associations load them
-if [ `cat ${MIRBASE_ASSOC_FILE} | wc -l` -gt 1 ]
+if [ "${COORD_PIPELINE}" != "true" ]
 then
+
+    #
+    # run the coordload for each input file, at most ${MAX_PARALLEL_COORDLOADS}
+    # at a time; runCoordload.sh adds the collection name to the environment
+    # and writes the exit status and duration of each load to a status file
+    #
+    setMailLoadName
     echo "" >> ${LOG_DIAG}
     echo "`date`" >> ${LOG_DIAG}
-    echo "Running association load" | tee -a ${LOG_DIAG} ${LOG_PROC}
-    ${ASSOCLOADER_SH} ${CONFIG_LOAD} ${ASSOCLOADCONFIG} >> ${LOG_DIAG}
-    STAT=$?
-    checkStatus ${STAT} "${ASSOCLOADER_SH}"
+    echo "Running the coordloads, ${MAX_PARALLEL_COORDLOADS} at a time" | tee -a ${LOG_DIAG} ${LOG_PROC}
+    PENDING_FILES=${OUTPUTDIR}/pendingCoordFiles.txt
+    ${JOURNAL} pending ${COORD_FILES} > ${PENDING_FILES} 2>> ${LOG_DIAG}
+    cat ${PENDING_FILES} | xargs -r -n 1 -P ${MAX_PARALLEL_COORDLOADS} ${MRKCOORDLOAD}/bin/runCoordload.sh
+
+    for f in `cat ${PENDING_FILES}`
+    do
+        suffix=`basename $f | cut -d. -f2`
+        COORD_COLLECTION_NAME=`echo $suffix | cut -d~ -f1 | sed 's/\_/ /g'`
+        STATUS_FILE=${OUTPUTDIR}/`basename $f`.status
+
+        # no status file - the load did not run or did not finish
+        if [ ! -r ${STATUS_FILE} ]
+        then
+            STAT=1
+            checkStatus ${STAT} "${COORD_COLLECTION_NAME} mrkcoordload java load did not complete"
+        fi
+
+        STAT=`cut -f1 ${STATUS_FILE}`
+        DURATION=`cut -f2 ${STATUS_FILE}`
+        MSG=`cut -f3 ${STATUS_FILE}`
+        echo "${COORD_COLLECTION_NAME} mrkcoordload: exit status ${STAT}, ${DURATION} seconds (see ${LOGDIR}/mrkcoordload.${suffix}.log)" | tee -a ${LOG_DIAG} ${LOG_PROC}
+        checkStatus ${STAT} "${MSG}"
+    done
+
+    # If there are mirbase associations load them
+    if ${JOURNAL} check assocload
+    then
+        echo "Association load already done - skipping" | tee -a ${LOG_DIAG} ${LOG_PROC}
+    elif [ `cat ${MIRBASE_ASSOC_FILE} | wc -l` -gt 1 ]
+    then
+        echo "" >> ${LOG_DIAG}
+        echo "`date`" >> ${LOG_DIAG}
+        echo "Running association load" | tee -a ${LOG_DIAG} ${LOG_PROC}
+        ${ASSOCLOADER_SH} ${CONFIG_LOAD} ${ASSOCLOADCONFIG} >> ${LOG_DIAG}
+        STAT=$?
+        checkStatus ${STAT} "${ASSOCLOADER_SH}"
+        ${JOURNAL} done assocload
+    fi
 fi
 
 #
@@ -239,6 +356,12 @@ fi
 if [ ${STAT} = 0 ]
 then
     touch ${LASTRUN_FILE}
+
+    # store the fingerprints of the collections that were loaded
+    if [ "${COORD_FINGERPRINT_FILE}" != "" ]
+    then
+        ${PYTHON} ${MRKCOORDLOAD}/bin/coordFingerprint.py save ${INPUT_FILE_DEFAULT} >> ${LOG_DIAG} 2>&1
+    fi
 fi
 
 # If reloading gene models, remove lastrun so that the snpcacheload will run from the Pipeline
@@ -0,0 +1,295 @@
+#
+#  qcEngine.py
+###########################################################################
+#
+#  Purpose:
+#
+#      In-memory evaluation of the mrkcoordQC.py database checks.
+#
+#      Instead of loading the input into the temp table and running one
+#      multi-join query per report, the engine fetches compact lookups
+#      for only the MGI IDs in the input, then evaluates every check
+#      in a single pass over the parsed rows. Each lookup is prepared
+#      once on a pool connection and run per chunk of IDs, which are
+#      passed as a parameter. The miRBase reports use an index from
+#      mirbaseIndex.py that, like the lookups, only holds the markers
+#      of the input MGI IDs and of the input miRBase IDs; the SQL
+#      reports read the index of every marker with a miRBase ID. The
+#      results have the same columns and order as the report queries,
+#      so mrkcoordQC.py writes identical reports from either.
+#
+#  Usage:
+#
+#      engine = qcEngine.MemoryEngine(rows)
+#      engine.fetchLookups(mbIDs)
+#      results = engine.evaluate()
+#      engine.mirbaseIdx       -> mirbaseIndex.MirbaseIndex
+#
+#      where rows are the input rows that passed the parse-time checks,
+#      as dictionaries with the temp table column names (mgiID,
+#      chromosome, mirbaseID, ...)
+#
+#  Notes:
+#
+#      The chromosome discrepancy check skips every row whose chromosome
+#      is not a valid mouse chromosome, which is what the SQL query means
+#      to do with its list of invalid chromosomes.
+#
+###########################################################################
+
+import coordDb
+import mirbaseIndex
+
+# number of IDs per lookup query
+LOOKUP_CHUNK = 10000
+
+# temp table of the input MGI IDs and miRBase IDs, on the pool
+# connection of the lookups
+MIRBASE_ID_TABLE = 'qc_mirbase_ids'
+
+class MemoryEngine:
+
+    def __init__(self, rows):
+        self.rows = rows
+
+        # {accID: [accession row, ...]} for every logical DB
+        self.accDict = {}
+
+        # {_Marker_key: marker row}
+        self.markerDict = {}
+
+        # {secondary MGI ID: [{'accID': preferred MGI ID, 'symbol': ...}]}
+        self.secondaryDict = {}
+
+        # {MGI ID: [MCV term, ...]} for qualifier 'D'
+        self.mcvDict = {}
+
+        # valid mouse chromosomes
+        self.chromosomes = set()
+
+        # miRBase/marker associations of the input MGI IDs and miRBase IDs
+        self.mirbaseIdx = None
+
+    #
+    # Purpose: Fetch the lookups for the MGI IDs in the input rows, and
+    #          the miRBase index of those and of the miRBase IDs 'mbIDs'.
+    # Returns: number of queries run
+    # Effects: one prepared statement per lookup, run once per chunk of
+    #          LOOKUP_CHUNK IDs, on one pool connection
+    #
+    def fetchLookups(self, mbIDs = ()):
+        mgiIDs = set()
+        mirnaMgiIDs = set()
+        for r in self.rows:
+            mgiIDs.add(r['mgiID'])
+            if 'MI' in r['mirbaseID']:
+                mirnaMgiIDs.add(r['mgiID'])
+
+        queries = []
+
+        queries.append(('chromosome', '''
+            select chromosome
+            from MRK_Chromosome
+            where _Organism_key = 1
+            and chromosome != 'UN'
+            ''', None))
+
+        queries.append(('accession', '''
+            select a.accID, a._MGIType_key, a._LogicalDB_key, a.preferred,
+                a._Object_key, t.name
+            from ACC_Accession a, ACC_MGIType t
+            where a.accID = any(%s)
+            and a._MGIType_key = t._MGIType_key
+            ''', mgiIDs))
+
+        queries.append(('marker', '''
+            select m._Marker_key, m.symbol, m.chromosome,
+                m._Marker_Status_key, ms.status
+            from ACC_Accession a, MRK_Marker m, MRK_Status ms
+            where a.accID = any(%s)
+            and a._MGIType_key = 2
+            and a._LogicalDB_key = 1
+            and a._Object_key = m._Marker_key
+            and m._Marker_Status_key = ms._Marker_Status_key
+            ''', mgiIDs))
+
+        queries.append(('secondary', '''
+            select a1.accID as mgiID, m.symbol, a2.accID
+            from ACC_Accession a1, ACC_Accession a2, MRK_Marker m
+            where a1.accID = any(%s)
+            and a1._MGIType_key = 2
+            and a1._LogicalDB_key = 1
+            and a1.preferred = 0
+            and a1._Object_key = a2._Object_key
+            and a2._MGIType_key = 2
+            and a2._LogicalDB_key = 1
+            and a2.preferred = 1
+            and a2._Object_key = m._Marker_key
+            ''', mgiIDs))
+
+        queries.append(('mcv', '''
+            select a.accID, m.term
+            from ACC_Accession a, MRK_MCV_Cache m
+            where a.accID = any(%s)
+            and a._MGIType_key = 2
+            and a._LogicalDB_key = 1
+            and a.preferred = 1
+            and a._Object_key = m._Marker_key
+            and m.qualifier = 'D'
+            ''', mirnaMgiIDs))
+
+        # hand each result set to the lookup it belongs to
+        count = 0
+        with coordDb.pool().connection() as conn:
+            for name, cmd, ids in queries:
+                if ids is None:
+                    self.addLookup(name, coordDb.query(conn, cmd))
+                    count += 1
+                    continue
+
+                lookup = coordDb.Statement(conn, cmd)
+                for chunk in coordDb.chunks(sorted(ids), LOOKUP_CHUNK):
+                    self.addLookup(name, lookup.query((chunk,)))
+                    count += 1
+                lookup.close()
+
+            count += self.fetchMirbaseIndex(conn, mgiIDs | set(mbIDs))
+
+        return count
+
+    #
+    # Purpose: Build the miRBase index of the markers of 'accIDs' (MGI
+    #          IDs and miRBase IDs), which are staged in a temp table.
+    # Returns: number of queries run
+    # Effects: sets self.mirbaseIdx; the temp table is dropped when 'conn'
+    #          is given back to the pool (rollback)
+    #
+    def fetchMirbaseIndex(self, conn, accIDs):
+        accIDs = sorted(accIDs)
+        coordDb.execute(conn, 'create temporary table %s (accID text primary key)' % \
+            MIRBASE_ID_TABLE)
+        coordDb.executeMany(conn, 'insert into %s values (%%s)' % MIRBASE_ID_TABLE,
+            [(i,) for i in accIDs], LOOKUP_CHUNK)
+        coordDb.execute(conn, 'analyze %s' % MIRBASE_ID_TABLE)
+
+        # a marker of an input MGI ID keeps all of its miRBase IDs, and an
+        # input miRBase ID all of its markers, as in the whole index
+        self.mirbaseIdx = mirbaseIndex.build('', '''
+            and (exists (select 1 from %s i where i.accID = a2.accid)
+                or exists (select 1 from %s i where i.accID = a1.accid))
+            ''' % (MIRBASE_ID_TABLE, MIRBASE_ID_TABLE), conn)
+
+        return 3 + (len(accIDs) + LOOKUP_CHUNK - 1) // LOOKUP_CHUNK
+
+    #
+    # Purpose: Add the results of one lookup query.
+    # Returns: Nothing
+    #
+    def addLookup(self, name, results):
+        for r in results:
+            if name == 'chromosome':
+                self.chromosomes.add(r['chromosome'])
+            elif name == 'accession':
+                self.accDict.setdefault(r['accID'], []).append(r)
+            elif name == 'marker':
+                self.markerDict[r['_Marker_key']] = r
+            elif name == 'secondary':
+                self.secondaryDict.setdefault(r['mgiID'], []).append(r)
+            elif name == 'mcv':
+                self.mcvDict.setdefault(r['accID'], []).append(r['term'])
+        return
+
+    #
+    # Purpose: Find the markers for which 'mgiID' is the preferred MGI ID.
+    # Returns: list of marker rows
+    #
+    def preferredMarkers(self, mgiID):
+        markers = []
+        for a in self.accDict.get(mgiID, []):
+            if a['_MGIType_key'] == 2 and a['_LogicalDB_key'] == 1 \
+                    and a['preferred'] == 1 \
+                    and a['_Object_key'] in self.markerDict:
+                markers.append(self.markerDict[a['_Object_key']])
+        return markers
+
+    #
+    # Purpose: Evaluate the invalid marker check for one MGI ID.
+    # Returns: list of (mgiID, object type, marker status) rows
+    #
+    def invalidMarker(self, mgiID):
+        accList = self.accDict.get(mgiID, [])
+
+        # 1) MGI ID does not exist in the database
+        if not accList:
+            return [(mgiID, None, None)]
+
+        rows = set()
+        mgiAcc = [a for a in accList if a['_LogicalDB_key'] == 1]
+        isMarker = [a for a in mgiAcc if a['_MGIType_key'] == 2]
+
+        # 2) MGI ID exists for a non-marker object (exclude annotation
+        #    evidence)
+        if not isMarker:
+            for a in mgiAcc:
+                if a['_MGIType_key'] not in (2, 25):
+                    rows.add((mgiID, a['name'], None))
+
+        # 3) marker status is not official
+        for a in isMarker:
+            m = self.markerDict.get(a['_Object_key'])
+            if m is not None and m['_Marker_Status_key'] != 1:
+                rows.add((mgiID, a['name'], m['status']))
+
+        return sorted(rows, key = lambda r: (r[1] or '', r[2] or ''))
+
+    #
+    # Purpose: Evaluate every check in one pass over the rows.
+    # Returns: dictionary of result lists keyed by report, each row a
+    #          dictionary with the columns of the report query
+    #
+    def evaluate(self):
+        results = {
+            'invMarker' : [],
+            'secMarker' : [],
+            'invChr' : [],
+            'chrDiscrep' : [],
+            'nonMirna' : [],
+            'inputMirbase' : [],
+            }
+
+        for r in self.rows:
+            mgiID = r['mgiID']
+            chromosome = r['chromosome']
+            mirbaseID = r['mirbaseID']
+
+            for id, name, status in self.invalidMarker(mgiID):
+                results['invMarker'].append(
+                    {'mgiID' : id, 'name' : name, 'status' : status})
+
+            for s in self.secondaryDict.get(mgiID, []):
+                results['secMarker'].append(
+                    {'mgiID' : mgiID, 'symbol' : s['symbol'], 'accID' : s['accID']})
+
+            for m in self.preferredMarkers(mgiID):
+                if chromosome not in self.chromosomes:
+                    results['invChr'].append({'mgiID' : mgiID,
+                        'chromosome' : chromosome, 'symbol' : m['symbol']})
+                elif m['chromosome'] != chromosome:
+                    results['chrDiscrep'].append({'mgiID' : mgiID,
+                        'fChr' : chromosome, 'symbol' : m['symbol'],
+                        'mChr' : m['chromosome']})
+
+            if 'MI' in mirbaseID:
+                for term in self.mcvDict.get(mgiID, []):
+                    if term != 'miRNA gene':
+                        results['nonMirna'].append({'mgiID' : mgiID,
+                            'mirbaseID' : mirbaseID, 'term' : term})
+
+            results['inputMirbase'].append(
+                {'mgiID' : mgiID, 'mirbaseID' : mirbaseID})
+
+        # the report queries order by MGI ID
+        for name in ('invMarker', 'secMarker', 'invChr', 'chrDiscrep', 'nonMirna'):
+            results[name].sort(key = lambda r: r['mgiID'])
+
+        return results
@@ -0,0 +1,259 @@
+'''
+  Module: qcReports.py
+
+  Purpose: Registry of the QC reports written by mrkcoordQC.py
+
+  Usage:
+        import qcReports
+
+        registry = qcReports.Registry(timestamp)
+        rpt = registry.add(qcReports.Report('invMarker', fileName,
+            'Invalid Marker Report', 110,
+            [('mgiID', 'MGI ID', 12), ('reason', 'Reason', 30)]))
+
+        rpt.addRow({'mgiID' : mgiID, 'reason' : reason})
+        rpt.addFooter('Number of Rows: %s' % n)
+        rpt.error(n)
+
+        registry.flush()
+        registry.writeSummary(fileName, {...})
+
+  Assumes:
+        Each report declares its columns once, as (key, label, width).
+        The fixed-width header, rule and row lines of the legacy report
+        are built from them unless a report overrides them.
+
+        Rows and footer lines are kept in memory until flush(), which
+        writes each report once: the legacy fixed-width report and a
+        JSON-lines twin with one object per row (the report file name
+        with .jsonl in place of .rpt).
+
+        The registry counts the errors and warnings of every report and
+        keeps the reports that have them in the order they first had one.
+
+  History:
+
+  10/17/2026	Initial development
+
+'''
+
+import os
+import json
+
+NL = '\n'
+
+class Report:
+
+    def __init__(self, name, fileName, title, width, columns,
+            rowFormat = None, header = None, rule = None, mode = 'a'):
+        self.name = name
+        self.fileName = fileName
+
+        # centered title and timestamp lines; None = no title
+        self.title = title
+        self.width = width
+
+        # [(key, label, width), ...]
+        self.columns = columns
+
+        columnFormat = '  '.join(['%%(%s)-%ss' % (key, w) \
+            for key, label, w in columns])
+        if rowFormat is None:
+            rowFormat = columnFormat
+        self.rowFormat = rowFormat
+
+        # header and rule lines; '' = none
+        if header is None:
+            header = columnFormat % dict([(key, label) \
+                for key, label, w in columns])
+        self.header = header
+        if rule is None:
+            rule = '  '.join([w * '-' for key, label, w in columns])
+        self.rule = rule
+
+        # 'a' = the wrapper truncates the report before the run
+        self.mode = mode
+
+        self.rows = []
+        self.footer = []
+        self.errors = 0
+        self.warnings = 0
+        self.registry = None
+
+    #
+    # Purpose: Add a row.
+    # Returns: Nothing
+    # Assumes: 'row' has a value for each key in the row format
+    #
+    def addRow(self, row):
+        self.rows.append(row)
+        return
+
+    #
+    # Purpose: Add a line to write after the rows.
+    # Returns: Nothing
+    #
+    def addFooter(self, line):
+        self.footer.append(line)
+        return
+
+    #
+    # Purpose: Count errors found by the report.
+    # Returns: Nothing
+    #
+    def error(self, count = 1):
+        if count > 0:
+            self.errors += count
+            self.registry.noteError(self)
+        return
+
+    #
+    # Purpose: Count warnings found by the report.
+    # Returns: Nothing
+    #
+    def warning(self, count = 1):
+        if count > 0:
+            self.warnings += count
+            self.registry.noteWarning(self)
+        return
+
+    #
+    # Purpose: Name of the JSON-lines twin of the report.
+    # Returns: file name
+    #
+    def jsonFileName(self):
+        root, ext = os.path.splitext(self.fileName)
+        if ext == '.rpt':
+            return root + '.jsonl'
+        return self.fileName + '.jsonl'
+
+    #
+    # Purpose: Render the legacy report.
+    # Returns: string
+    #
+    def render(self):
+        lines = []
+        if self.title is not None:
+            lines.append(str.center(self.title, self.width) + NL)
+            lines.append(str.center('(' + self.registry.timestamp + ')',
+                self.width) + 2 * NL)
+        if self.header != '':
+            lines.append(self.header + NL)
+        if self.rule != '':
+            lines.append(self.rule + NL)
+        rowFormat = self.rowFormat + NL
+        for row in self.rows:
+            lines.append(rowFormat % row)
+        for line in self.footer:
+            lines.append(line + NL)
+        return ''.join(lines)
+
+    #
+    # Purpose: Write the legacy report and its JSON-lines twin.
+    # Returns: number of characters written
+    #
+    def flush(self):
+        text = self.render()
+        fp = open(self.fileName, self.mode)
+        fp.write(text)
+        fp.close()
+
+        jsonText = ''.join([json.dumps(row, default = str) + NL \
+            for row in self.rows])
+        fp = open(self.jsonFileName(), 'w')
+        fp.write(jsonText)
+        fp.close()
+        return len(text) + len(jsonText)
+
+class Registry:
+
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+        # {name: Report} in the order the reports were added
+        self.reports = {}
+
+        # reports with errors/warnings, in the order they first had one
+        self.errorReports = []
+        self.warningReports = []
+
+    #
+    # Purpose: Add a report to the registry.
+    # Returns: the report
+    #
+    def add(self, report):
+        report.registry = self
+        self.reports[report.name] = report
+        return report
+
+    def __getitem__(self, name):
+        return self.reports[name]
+
+    def noteError(self, report):
+        if report not in self.errorReports:
+            self.errorReports.append(report)
+        return
+
+    def noteWarning(self, report):
+        if report not in self.warningReports:
+            self.warningReports.append(report)
+        return
+
+    #
+    # Purpose: Total errors of all reports.
+    # Returns: integer
+    #
+    def errorCount(self):
+        return sum([r.errors for r in self.reports.values()])
+
+    #
+    # Purpose: Total warnings of all reports.
+    # Returns: integer
+    #
+    def warningCount(self):
+        return sum([r.warnings for r in self.reports.values()])
+
+    #
+    # Purpose: Write every report.
+    # Returns: Nothing
+    #
+    def flush(self):
+        for report in self.reports.values():
+            report.flush()
+        return
+
+    #
+    # Purpose: Write a JSON summary of the reports.
+    # Returns: Nothing
+    # Assumes: 'extra' holds any other values to include
+    #
+    def writeSummary(self, fileName, extra = None):
+        if extra is None:
+            extra = {}
+
+        summary = {
+            'timestamp' : self.timestamp,
+            'errorCount' : self.errorCount(),
+            'warningCount' : self.warningCount(),
+            'reportsWithErrors' : [r.fileName for r in self.errorReports],
+            'reportsWithWarnings' : [r.fileName for r in self.warningReports],
+            'reports' : [],
+            }
+        summary.update(extra)
+        for r in self.reports.values():
+            summary['reports'].append({
+                'name' : r.name,
+                'file' : r.fileName,
+                'jsonFile' : r.jsonFileName(),
+                'rows' : len(r.rows),
+                'errors' : r.errors,
+                'warnings' : r.warnings,
+                })
+
+        tmpFileName = '%s.%s' % (fileName, os.getpid())
+        fp = open(tmpFileName, 'w')
+        json.dump(summary, fp, indent = 2)
+        fp.write(NL)
+        fp.close()
+        os.replace(tmpFileName, fileName)
+        return
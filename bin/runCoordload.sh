@@ -0,0 +1,197 @@
+#!/bin/sh
+#
+#  runCoordload.sh
+###########################################################################
+#
+#  Purpose:
+#
+#      Run the java coordload, or the fast load for collections of at most
+#      ${COORD_FASTLOAD_MAX_ROWS} rows, for a single collection file
+#      created by createInputFiles.py. mrkcoordload.sh starts one of these per
+#      collection, up to ${MAX_PARALLEL_COORDLOADS} at a time.
+#
+#  Usage:
+#
+#      runCoordload.sh  coordload_file
+#
+#  Env Vars:
+#
+#      The configuration file is sourced and the following are exported
+#      by mrkcoordload.sh:
+#
+#      CONFIG_LOAD
+#      COORD_VERSION
+#      JOBKEY
+#
+#      Files listed in ${COORD_DELTA_FILES} are loaded in
+#      reload_by_object mode instead of ${COORD_LOAD_MODE}. Once such a
+#      load has succeeded, the features of markers no longer in the file
+#      (<coordload_file>.delete) are deleted by coordDelta.py; a failed
+#      load deletes nothing (see coordDelta.py for the recovery).
+#
+#  Outputs:
+#
+#      - Log of the java coordload (${LOGDIR}/mrkcoordload.<suffix>.log)
+#
+#      - Status file (${OUTPUTDIR}/<coordload_file name>.status) with
+#        the tab-delimited exit status, duration in seconds and message,
+#        read back by mrkcoordload.sh for checkStatus
+#
+#      - A successful load is recorded in the checkpoint journal
+#        (${COORD_JOURNAL_FILE}, see coordJournal.py)
+#
+#      - Metrics of the load (${METRICS_DIR}), written by coordMetrics.py
+#        which runs the fast load or the java coordload as a phase of the
+#        collection
+#
+#  Exit Codes:
+#
+#      0:  Successful completion, or failure when loads run in parallel
+#      255:  The load failed and loads are running one at a time; this
+#            stops xargs from starting the remaining collections
+#
+###########################################################################
+
+USAGE='Usage: runCoordload.sh  coordload_file'
+
+if [ $# -ne 1 ]
+then
+    echo ${USAGE}; exit 1
+fi
+
+INFILE_NAME=$1
+export INFILE_NAME
+
+# these env variable names expected by java coordload
+# replace '_' with ' ' e.g. NCBI_UniSTS -> NCBI UniSTS
+suffix=`basename ${INFILE_NAME} | cut -d. -f2`
+collection=`echo $suffix | cut -d~ -f1`
+abbrev=`echo $suffix | cut -d~ -f2`
+COORD_COLLECTION_NAME=`echo $collection | sed 's/\_/ /g'`
+export COORD_COLLECTION_NAME
+COORD_COLLECTION_ABBREV=`echo $abbrev | sed 's/\_/ /g'`
+export COORD_COLLECTION_ABBREV
+
+LOG=${LOGDIR}/mrkcoordload.${suffix}.log
+rm -f ${LOG}
+touch ${LOG}
+
+STATUS_FILE=${OUTPUTDIR}/`basename ${INFILE_NAME}`.status
+rm -f ${STATUS_FILE}
+
+#
+# FUNCTION: Write the exit status, duration and message to the status file
+#           and exit.
+#
+writeStatus ()
+{
+    RC=$1      # exit status of the load
+    MSG=$2     # message for checkStatus
+
+    END=`date +%s`
+    echo "${RC}	`expr ${END} - ${START}`	${MSG}" > ${STATUS_FILE}
+
+    # a resumed run (mrkcoordload.sh --resume) does not load it again
+    if [ ${RC} -eq 0 ]
+    then
+        ${PYTHON} ${MRKCOORDLOAD}/bin/coordJournal.py done coordload ${INFILE_NAME}
+    fi
+
+    if [ ${RC} -ne 0 -a ${MAX_PARALLEL_COORDLOADS} -le 1 ]
+    then
+        exit 255
+    fi
+    exit 0
+}
+
+#
+# FUNCTION: After a successful load of a delta file, delete the features
+#           of the markers no longer in it (see coordDelta.py). Sets STAT.
+#
+deleteDropped ()
+{
+    if [ ${STAT} -eq 0 -a -r ${INFILE_NAME}.delete ]
+    then
+        echo "`date`" >> ${LOG}
+        echo "Deleting the features of markers no longer in ${INFILE_NAME}" >> ${LOG}
+        ${PYTHON} ${MRKCOORDLOAD}/bin/coordDelta.py delete ${INFILE_NAME} >> ${LOG} 2>&1
+        STAT=$?
+    fi
+}
+
+START=`date +%s`
+
+if [ ! -r ${INFILE_NAME} ]
+then
+    writeStatus 1 "Cannot read from input file: ${INFILE_NAME}"
+fi
+
+#
+# When collections load in parallel each one gets its own DLA logs, bcp
+# directory and repeat file so the loads do not write over each other.
+#
+DLA_OVERRIDES=""
+if [ ${MAX_PARALLEL_COORDLOADS} -gt 1 ]
+then
+    COLLECTION_OUTPUTDIR=${OUTPUTDIR}/${suffix}
+    mkdir -p ${COLLECTION_OUTPUTDIR}
+    DLA_OVERRIDES="-DLOG_PROC=${LOGDIR}/mrkcoordload.${suffix}.proc.log \
+	-DLOG_DIAG=${LOGDIR}/mrkcoordload.${suffix}.diag.log \
+	-DLOG_CUR=${LOGDIR}/mrkcoordload.${suffix}.cur.log \
+	-DLOG_VAL=${LOGDIR}/mrkcoordload.${suffix}.val.log \
+	-DMGD_BCP_PATH=${COLLECTION_OUTPUTDIR} \
+	-DRADAR_BCP_PATH=${COLLECTION_OUTPUTDIR} \
+	-DCOORD_REPEAT_FILE=${COLLECTION_OUTPUTDIR}/coordrepeats.out"
+fi
+
+#
+# A file reduced to its changed markers by createInputFiles.py replaces
+# the features of those markers only.
+#
+LOAD_MODE=${COORD_LOAD_MODE}
+if [ "${COORD_DELTA_FILES}" != "" -a -r "${COORD_DELTA_FILES}" ]
+then
+    if grep -qx "${INFILE_NAME}" ${COORD_DELTA_FILES}
+    then
+        LOAD_MODE=reload_by_object
+    fi
+fi
+
+#
+# Small collections are loaded directly by coordFastLoad.py; it exits
+# with 2 when the collection needs the java coordload after all.
+#
+ROWS=`cat ${INFILE_NAME} | wc -l`
+if [ ${COORD_FASTLOAD_MAX_ROWS:-0} -gt 0 -a ${ROWS} -le ${COORD_FASTLOAD_MAX_ROWS:-0} ]
+then
+    echo "`date`" >> ${LOG}
+    echo "Running ${COORD_COLLECTION_NAME} fast load (${LOAD_MODE}, ${ROWS} rows)" >> ${LOG}
+    ${PYTHON} ${MRKCOORDLOAD}/bin/coordMetrics.py run coordFastLoad ${suffix} fastload ${INFILE_NAME} \
+        ${PYTHON} ${MRKCOORDLOAD}/bin/coordFastLoad.py ${INFILE_NAME} ${LOAD_MODE} >> ${LOG} 2>&1
+    STAT=$?
+    echo "`date`" >> ${LOG}
+    if [ ${STAT} -ne 2 ]
+    then
+        deleteDropped
+        writeStatus ${STAT} "${COORD_COLLECTION_NAME} mrkcoordload fast load"
+    fi
+    echo "Fast load not possible, running the java coordload" >> ${LOG}
+fi
+
+echo "`date`" >> ${LOG}
+echo "Running ${COORD_COLLECTION_NAME} mrkcoordload (${LOAD_MODE})" >> ${LOG}
+${PYTHON} ${MRKCOORDLOAD}/bin/coordMetrics.py run coordload ${suffix} java ${INFILE_NAME} \
+    ${JAVA} ${JAVARUNTIMEOPTS} -classpath ${CLASSPATH} \
+    -DCONFIG=${CONFIG_MASTER},${CONFIG_LOAD} \
+    -DCOORD_COLLECTION_NAME="${COORD_COLLECTION_NAME}" \
+    -DCOORD_COLLECTION_ABBREV="${COORD_COLLECTION_ABBREV}" \
+    -DINFILE_NAME=${INFILE_NAME} \
+    -DCOORD_VERSION="${COORD_VERSION}" \
+    -DCOORD_LOAD_MODE=${LOAD_MODE} \
+    ${DLA_OVERRIDES} \
+    -DJOBKEY=${JOBKEY} ${DLA_START} >> ${LOG} 2>&1
+STAT=$?
+echo "`date`" >> ${LOG}
+
+deleteDropped
+writeStatus ${STAT} "${COORD_COLLECTION_NAME} mrkcoordload java load"
@@ -0,0 +1,331 @@
+#
+#  sanityCheck.py
+###########################################################################
+#
+#  Purpose:
+#
+#      This script runs the sanity checks on a marker coordinate load
+#      input file and creates the QC-ready version of the file, in one
+#      pass over the input.
+#
+#  Usage:
+#
+#      sanityCheck.py <path to input file>
+#
+#  Env Vars:
+#
+#      The following environment variables are set by the configuration
+#      files that are sourced by the wrapper script:
+#
+#      INPUT_FILE_QC
+#      SANITY_RPT
+#      MRKCOORD_FILE_COLUMNS
+#      SANITY_MAX_KEYS
+#
+#  Inputs:
+#
+#      - Coordinate input file (see mrkcoordQC.py)
+#
+#  Outputs:
+#
+#      - QC-ready input file (${INPUT_FILE_QC}): columns 1 thru 8 of the
+#        lines that have alphanumerics and do not begin with '#', without
+#        Ctrl-M line endings
+#
+#      - Sanity report (${SANITY_RPT}) with these sections:
+#
+#        Invalid Header - the first line of the input file does not
+#            begin with 'build='
+#        Duplicate Lines
+#        Duplicate MGI IDs - first column
+#        Lines With Missing Columns or Data - fewer than
+#            ${MRKCOORD_FILE_COLUMNS} columns, or a required column is
+#            empty (strand is optional); the header line is not checked
+#        Bad MGI ID - lines without '=' that do not begin with 'MGI:'
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An exception occurred
+#      2:  Sanity errors detected in the input file
+#
+#  Assumes:  Nothing
+#
+#  Implementation:
+#
+#      This replaces the cut/grep/dos2unix pipeline and the checkHeader,
+#      checkDupLines, checkDupFields, checkColumns and checkMGIIDS shell
+#      functions of mrkcoordQC.sh, which each read the file again.
+#      Duplicates are found with hash sets. When a set holds more than
+#      ${SANITY_MAX_KEYS} values, its values are spilled to temporary
+#      partition files by hash and each partition is checked on its own
+#      at the end. Duplicates are reported in code point order. The
+#      shell functions ran 'sort | uniq -d' in the locale of the load,
+#      so the order is the same as theirs only where that locale
+#      collates as the C locale does.
+#
+#      The minimum line count check (${FILE_MINIMUM_SIZE}) stays disabled
+#      (e4g-115).
+#
+#  Notes:  None
+#
+###########################################################################
+
+import sys
+import os
+import re
+import shutil
+import tempfile
+
+#
+#  CONSTANTS
+#
+TAB = '\t'
+NL = '\n'
+
+USAGE = 'sanityCheck.py input_file'
+
+# the input is checked as bytes would be; any byte that is not UTF-8 is
+# written back out unchanged
+ENCODING = 'utf-8'
+ERRORS = 'surrogateescape'
+
+# number of partition files a spilled duplicate set is split into
+NUM_PARTITIONS = 64
+
+# a line must have one of these to be kept (grep '[0-9A-Za-z]')
+ALNUM = re.compile('[0-9A-Za-z]')
+
+#
+#  GLOBALS
+#
+qcFile = os.environ['INPUT_FILE_QC']
+sanityRptFile = os.environ['SANITY_RPT']
+numColumns = int(os.environ['MRKCOORD_FILE_COLUMNS'])
+
+# number of values a duplicate set holds in memory before it spills
+maxKeys = int(os.environ.get('SANITY_MAX_KEYS', '2000000'))
+
+inputFile = None
+
+# report lines of each check
+invalidHeader = []
+missingColumns = []
+badMGIIDs = []
+
+#
+# Finds the values added more than once. The values are kept in a hash
+# set until there are more than 'maxKeys' of them, then written to
+# partition files by hash so each partition can be checked in memory.
+#
+class DupFinder:
+
+    def __init__(self, maxKeys):
+        self.maxKeys = maxKeys
+        self.seen = set()
+        self.dups = set()
+        self.spillDir = None
+        self.spillFiles = None
+
+    #
+    # Purpose: Add a value.
+    # Returns: Nothing
+    #
+    def add(self, value):
+        if self.spillFiles is not None:
+            self.spillFiles[hash(value) % NUM_PARTITIONS].write(value + NL)
+        elif value in self.seen:
+            self.dups.add(value)
+        else:
+            self.seen.add(value)
+            if len(self.seen) > self.maxKeys:
+                self.spill()
+        return
+
+    #
+    # Purpose: Move the values seen so far to the partition files.
+    # Returns: Nothing
+    #
+    def spill(self):
+        self.spillDir = tempfile.mkdtemp(prefix = 'sanityCheck.')
+        self.spillFiles = []
+        for i in range(NUM_PARTITIONS):
+            self.spillFiles.append(open(os.path.join(self.spillDir, str(i)),
+                'w', encoding = ENCODING, errors = ERRORS, newline = NL))
+        for value in self.seen:
+            self.spillFiles[hash(value) % NUM_PARTITIONS].write(value + NL)
+        self.seen = set()
+        return
+
+    #
+    # Purpose: Find the duplicates, checking each partition file if the
+    #          values were spilled.
+    # Returns: sorted list of the values added more than once
+    # Effects: Removes the partition files
+    #
+    def duplicates(self):
+        if self.spillFiles is not None:
+            try:
+                for fp in self.spillFiles:
+                    fp.close()
+                    fp = open(fp.name, 'r', encoding = ENCODING, errors = ERRORS,
+                        newline = NL)
+                    seen = set()
+                    for value in fp:
+                        if value in seen:
+                            self.dups.add(value[:-1])
+                        else:
+                            seen.add(value)
+                    fp.close()
+            finally:
+                shutil.rmtree(self.spillDir, ignore_errors = True)
+            self.spillFiles = None
+        return sorted(self.dups)
+
+dupLines = DupFinder(maxKeys)
+dupMGIIDs = DupFinder(maxKeys)
+
+#
+# Purpose: Validate the arguments to the script.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Sets global variables.
+# Throws: Nothing
+#
+def checkArgs ():
+    global inputFile
+
+    if len(sys.argv) != 2:
+        print(USAGE)
+        sys.exit(1)
+
+    inputFile = sys.argv[1]
+    return
+
+#
+# Purpose: Check the header, the first line of the input file.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def checkHeader (line):
+    line = line.rstrip(NL)
+    if not line.lower().startswith('build='):
+        # as the shell echoed it, unquoted
+        invalidHeader.append(' '.join(re.split('[ \t\n]+', line.strip(' \t\n'))))
+    return
+
+#
+# Purpose: Run the checks on one line of the QC-ready file.
+# Returns: Nothing
+# Assumes: 'lineNum' is the line number in the QC-ready file
+# Effects: Nothing
+# Throws: Nothing
+#
+def checkLine (lineNum, line):
+    dupLines.add(line)
+    dupMGIIDs.add(line.split(TAB, 1)[0])
+
+    # the first line is the header
+    if lineNum > 1:
+        columns = line.split(TAB)
+        columns[-1] = columns[-1].strip()
+        if len(columns) < numColumns:
+            missingColumns.append('Missing Column(s) on line %s: %s' % (lineNum, columns))
+        # strand is optional
+        elif columns[0] == '' or columns[1] == '' or columns[2] == '' or \
+                columns[3] == '' or columns[5] == '' or columns[6] == '':
+            missingColumns.append('Missing Data in required column on line %s: %s' % (lineNum, columns))
+
+    if '=' not in line and not line[:4].lower() == 'mgi:':
+        badMGIIDs.append(line)
+    return
+
+#
+# Purpose: Read the input file, write the QC-ready file and run the
+#          checks on each line.
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: Exits with 1 if a file cannot be opened
+# Throws: Nothing
+#
+def readInput ():
+    try:
+        fpInput = open(inputFile, 'r', encoding = ENCODING, errors = ERRORS, newline = NL)
+    except:
+        print('Cannot open input file: ' + inputFile)
+        sys.exit(1)
+
+    try:
+        fpQC = open(qcFile, 'w', encoding = ENCODING, errors = ERRORS, newline = NL)
+    except:
+        print('Cannot open QC-ready file: ' + qcFile)
+        sys.exit(1)
+
+    header = None
+    lineNum = 0
+    for line in fpInput:
+        if header is None:
+            header = line
+        if line.endswith(NL):
+            line = line[:-1]
+
+        # columns 1 thru 8 (cut -f1-8)
+        line = TAB.join(line.split(TAB, 8)[:8])
+
+        # blank lines and comments
+        if not ALNUM.search(line) or line.startswith('#'):
+            continue
+
+        # Ctrl-M line ending (dos2unix)
+        if line.endswith('\r'):
+            line = line[:-1]
+
+        fpQC.write(line + NL)
+        lineNum += 1
+        checkLine(lineNum, line)
+
+    fpInput.close()
+    fpQC.close()
+
+    checkHeader(header or '')
+    return
+
+#
+# Purpose: Write the sanity report.
+# Returns: number of lines reported
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+def writeReport ():
+    sections = [
+        ('Invalid Header', '---------------', invalidHeader),
+        ('Duplicate Lines', '---------------', dupLines.duplicates()),
+        ('Duplicate MGI IDs', '------------------------------', dupMGIIDs.duplicates()),
+        ('Lines With Missing Columns or Data', '-----------------------------------', missingColumns),
+        ('Bad MGI ID', '---------------', badMGIIDs),
+        ]
+
+    fpRpt = open(sanityRptFile, 'w', encoding = ENCODING, errors = ERRORS, newline = NL)
+    numErrors = 0
+    for i, (title, underline, lines) in enumerate(sections):
+        if i > 0:
+            fpRpt.write(NL + NL)
+        fpRpt.write(title + NL + underline + NL)
+        for line in lines:
+            fpRpt.write(line + NL)
+        numErrors += len(lines)
+    fpRpt.close()
+
+    return numErrors
+
+#
+# Main
+#
+checkArgs()
+readInput()
+if writeReport() > 0:
+    sys.exit(2)
+sys.exit(0)